@@ -0,0 +1,172 @@
+"""
+Benchmark: búsqueda por recorrido completo vs índice invertido con trigramas
+Genera catálogos sintéticos de distintos tamaños y consultas con errores de
+dedo (letra faltante, cambiada, sobrante, transpuesta o sin tilde). Para cada
+camino reporta recall@5 (el platillo buscado aparece entre los 5 primeros)
+y la latencia por consulta.
+
+El recorrido reproduce en memoria la lógica de
+DatabaseManager.buscar_items_por_texto antes del índice, así que su latencia
+no incluye la consulta a MySQL que hacía en cada llamada.
+
+Uso:
+    python benchmarks/bench_busqueda_difusa.py --tamanos 100,1000,5000 --consultas 500
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+import unicodedata
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.menu_search import IndiceMenu
+
+PLATOS = ['Pizza', 'Pasta', 'Lasaña', 'Ensalada', 'Sopa', 'Tacos', 'Hamburguesa',
+          'Risotto', 'Crepa', 'Quesadilla', 'Enchiladas', 'Tiramisú', 'Brownie',
+          'Empanada', 'Torta', 'Burrito', 'Ceviche', 'Tostada', 'Pozole', 'Flan']
+ESTILOS = ['Carbonara', 'Boloñesa', 'Margarita', 'Hawaiana', 'César', 'Azteca',
+           'Napolitana', 'Mediterránea', 'Ranchera', 'Suprema', 'Norteña', 'Verde',
+           'Roja', 'Cremosa', 'Picante', 'Clásica', 'Especial', 'Campestre',
+           'Marinera', 'Poblana', 'Jalisciense', 'Oaxaqueña', 'Yucateca', 'Veracruzana']
+EXTRAS = ['Champiñones', 'Chorizo', 'Camarón', 'Pollo', 'Res', 'Jamón', 'Tocino',
+          'Aguacate', 'Chipotle', 'Queso', 'Espinaca', 'Trufa', 'Salmón', 'Pesto',
+          'Albahaca', 'Frijol', 'Elote', 'Nopales', 'Piña', 'Mole']
+INGREDIENTES = ['Tomate', 'Cebolla', 'Ajo', 'Cilantro', 'Mozzarella', 'Parmesano',
+                'Crema', 'Limón', 'Chile', 'Lechuga', 'Huevo', 'Mantequilla']
+LETRAS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def normalizar(texto):
+    texto = texto.lower()
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', texto)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+def generar_catalogo(num_items, rng):
+    """Snapshot sintético con la misma forma que MenuSnapshot"""
+    combinaciones = [(p, e, x) for p in PLATOS for e in ESTILOS for x in EXTRAS]
+    rng.shuffle(combinaciones)
+
+    por_categoria = {}
+    for item_id, (plato, estilo, extra) in enumerate(combinaciones[:num_items], 1):
+        item = MappingProxyType({
+            'id': item_id,
+            'codigo': f"item_{item_id}",
+            'nombre': f"{plato} {estilo} con {extra}",
+            'descripcion': f"{plato} estilo {estilo.lower()}",
+            'precio': 100,
+            'disponible': True,
+            'ingredientes': tuple(rng.sample(INGREDIENTES, 4)),
+        })
+        por_categoria.setdefault(plato, []).append(item)
+
+    return tuple(
+        MappingProxyType({
+            'categoria': MappingProxyType({'nombre': plato.lower(), 'nombre_display': plato}),
+            'items': tuple(items)
+        })
+        for plato, items in por_categoria.items()
+    )
+
+
+def con_error(palabra, rng):
+    """Aplicar un error de dedo aleatorio a una palabra"""
+    palabra = palabra.lower()
+    if normalizar(palabra) != palabra and rng.random() < 0.3:
+        return normalizar(palabra)
+
+    i = rng.randrange(1, len(palabra) - 1)
+    tipo = rng.choice(['falta', 'cambia', 'sobra', 'transpone'])
+    if tipo == 'falta':
+        return palabra[:i] + palabra[i + 1:]
+    if tipo == 'cambia':
+        return palabra[:i] + rng.choice(LETRAS) + palabra[i + 1:]
+    if tipo == 'sobra':
+        return palabra[:i] + rng.choice(LETRAS) + palabra[i:]
+    return palabra[:i - 1] + palabra[i] + palabra[i - 1] + palabra[i + 1:]
+
+
+def generar_consultas(catalogo, num_consultas, rng):
+    """[(texto, item_id esperado)] con un error en cada palabra significativa"""
+    items = [item for cat_data in catalogo for item in cat_data['items']]
+    consultas = []
+    for _ in range(num_consultas):
+        item = rng.choice(items)
+        palabras = [
+            con_error(p, rng) if len(p) >= 5 else p.lower()
+            for p in item['nombre'].split() if p != 'con'
+        ]
+        consultas.append((' '.join(palabras), item['id']))
+    return consultas
+
+
+def buscar_recorrido(items, texto):
+    """Lógica anterior de buscar_items_por_texto sobre los items ya leídos"""
+    palabras_busqueda = normalizar(texto).split()
+    resultados = []
+    for item in items:
+        nombre_normalizado = normalizar(item['nombre'])
+        descripcion_normalizada = normalizar(item.get('descripcion', ''))
+        coincidencias = sum(
+            1 for palabra in palabras_busqueda
+            if palabra in nombre_normalizado or palabra in descripcion_normalizada
+        )
+        if coincidencias > 0:
+            resultados.append((coincidencias, item))
+    resultados.sort(key=lambda x: x[0], reverse=True)
+    return [item for _, item in resultados[:5]]
+
+
+def medir(buscar, consultas):
+    """Retorna (recall@5, ms promedio, ms p95)"""
+    aciertos = 0
+    tiempos = []
+    for texto, esperado in consultas:
+        inicio = time.perf_counter()
+        resultados = buscar(texto)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if any(r['id'] == esperado for r in resultados):
+            aciertos += 1
+
+    tiempos.sort()
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    return aciertos / len(consultas), sum(tiempos) / len(tiempos), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', default='100,1000,5000')
+    parser.add_argument('--consultas', type=int, default=500)
+    parser.add_argument('--semilla', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} | {'recall recorrido':>16} | {'ms prom':>8} | {'ms p95':>7} | "
+          f"{'recall índice':>13} | {'ms prom':>8} | {'ms p95':>7} | {'ms construir':>12}")
+    print("-" * 100)
+
+    for tamano in [int(t) for t in args.tamanos.split(',')]:
+        rng = random.Random(args.semilla)
+        catalogo = generar_catalogo(tamano, rng)
+        consultas = generar_consultas(catalogo, args.consultas, rng)
+        items = [dict(item) for cat_data in catalogo for item in cat_data['items']]
+
+        inicio = time.perf_counter()
+        indice = IndiceMenu()
+        indice.actualizar(catalogo)
+        ms_construir = (time.perf_counter() - inicio) * 1000
+
+        r_scan, prom_scan, p95_scan = medir(lambda t: buscar_recorrido(items, t), consultas)
+        r_ind, prom_ind, p95_ind = medir(lambda t: indice.buscar(t), consultas)
+
+        print(f"{len(items):>6} | {r_scan:>16.1%} | {prom_scan:>8.3f} | {p95_scan:>7.3f} | "
+              f"{r_ind:>13.1%} | {prom_ind:>8.3f} | {p95_ind:>7.3f} | {ms_construir:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
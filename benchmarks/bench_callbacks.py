@@ -0,0 +1,145 @@
+"""
+Benchmark: despacho de callbacks del bot con if/elif vs codec + tabla
+Compara, para cada tipo de botón inline, el costo de interpretar el
+callback_data y llegar al método que lo atiende:
+
+    if/elif + split    forma anterior de callback_handler: una cadena de
+                       data == / data.startswith() y split("_") por posición
+    codec + tabla      forma actual: decodificar() de bot/callback_codec.py
+                       y un diccionario acción -> método
+
+También muestra el tamaño del callback_data (Telegram acepta hasta 64
+bytes) y si la forma anterior recupera bien los argumentos: con códigos de
+item como "pasta_trufa" el split los corta.
+
+No usa la BD ni Telegram.
+
+Uso:
+    python benchmarks/bench_callbacks.py --repeticiones 200000
+"""
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.callback_codec import codificar, decodificar
+
+# Categoría e item de ejemplo: código con guion bajo y ids de una BD ya crecida
+CATEGORIA, CATEGORIA_ID = 'principales', 12
+ITEM, ITEM_ID = 'pasta_trufa', 48731
+
+# (tipo, callback_data anterior, acción y args actuales, args esperados del handler)
+CASOS = [
+    ('menu_principal', 'menu_principal', ('menu_principal',), ()),
+    ('ver_menu', 'ver_menu', ('ver_menu',), ()),
+    ('categoria', f'menu_{CATEGORIA}', ('categoria', CATEGORIA_ID), (CATEGORIA,)),
+    ('item', f'item_{CATEGORIA}_{ITEM}', ('item', ITEM_ID), (CATEGORIA, ITEM)),
+    ('hacer_pedido', 'hacer_pedido', ('hacer_pedido',), ()),
+    ('tipo_pedido', 'order_type_delivery', ('tipo_pedido', 'delivery'), ('delivery',)),
+    ('agregar_item', f'add_to_order_{CATEGORIA}_{ITEM}_2', ('agregar_item', ITEM_ID, 2), (CATEGORIA, ITEM, '2')),
+    ('categoria_pedido', f'order_{CATEGORIA}', ('categoria_pedido', CATEGORIA_ID), (CATEGORIA,)),
+    ('ver_pedido', 'ver_pedido', ('ver_pedido',), ()),
+    ('finalizar_pedido', 'finalizar_pedido', ('finalizar_pedido',), ()),
+    ('reservaciones', 'reservaciones', ('reservaciones',), ()),
+    ('nueva_reservacion', 'new_reservation', ('nueva_reservacion',), ()),
+    ('consultar_reservacion', 'check_reservation', ('consultar_reservacion',), ()),
+    ('quejas', 'quejas', ('quejas',), ()),
+    ('tipo_queja', 'suggestion_general', ('tipo_queja', 'general'), ('suggestion_general',)),
+    ('contacto', 'contacto', ('contacto',), ()),
+    ('ayuda', 'ayuda', ('ayuda',), ()),
+]
+
+
+def _atender(*args):
+    return args
+
+
+def despachar_anterior(data):
+    """Copia de la cadena de callback_handler antes del codec (sin llamadas a Telegram)"""
+    if data == "menu_principal":
+        return _atender()
+    elif data == "ver_menu":
+        return _atender()
+    elif data.startswith("menu_"):
+        return _atender(data.replace("menu_", ""))
+    elif data.startswith("item_"):
+        parts = data.split("_")
+        return _atender(parts[1], parts[2])
+    elif data == "hacer_pedido":
+        return _atender()
+    elif data.startswith("order_type_"):
+        return _atender(data.replace("order_type_", ""))
+    elif data.startswith("add_to_order_"):
+        parts = data.split("_")
+        return _atender(parts[3], parts[4], parts[5])
+    elif data.startswith("order_"):
+        return _atender(data.replace("order_", ""))
+    elif data == "ver_pedido":
+        return _atender()
+    elif data == "finalizar_pedido":
+        return _atender()
+    elif data == "reservaciones":
+        return _atender()
+    elif data == "new_reservation":
+        return _atender()
+    elif data == "check_reservation":
+        return _atender()
+    elif data == "quejas":
+        return _atender()
+    elif data.startswith("complaint_") or data.startswith("suggestion_"):
+        return _atender(data)
+    elif data == "contacto":
+        return _atender()
+    elif data == "ayuda":
+        return _atender()
+
+
+RUTAS = {codificado[0]: _atender for _, _, codificado, _ in CASOS}
+
+
+def despachar_actual(data):
+    """Lo que hace callback_handler ahora (sin llamadas a Telegram)"""
+    accion, args = decodificar(data)
+    return RUTAS[accion](*args)
+
+
+def medir(funcion, data, repeticiones):
+    """Nanosegundos promedio por llamada"""
+    inicio = time.perf_counter_ns()
+    for _ in range(repeticiones):
+        funcion(data)
+    return (time.perf_counter_ns() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'tipo':>22} | {'if/elif ns':>10} {'bytes':>5} {'args ok':>7} | {'codec ns':>8} {'bytes':>5}")
+    print("-" * 72)
+
+    total_anterior = total_actual = 0.0
+    for tipo, data_anterior, codificado, esperados in CASOS:
+        data_actual = codificar(*codificado)
+        assert decodificar(data_actual) == (codificado[0], tuple(codificado[1:]))
+        correcto = despachar_anterior(data_anterior) == esperados
+
+        ns_anterior = medir(despachar_anterior, data_anterior, args.repeticiones)
+        ns_actual = medir(despachar_actual, data_actual, args.repeticiones)
+        total_anterior += ns_anterior
+        total_actual += ns_actual
+
+        print(f"{tipo:>22} | {ns_anterior:>10.0f} {len(data_anterior.encode()):>5} "
+              f"{'sí' if correcto else 'NO':>7} | {ns_actual:>8.0f} {len(data_actual.encode()):>5}")
+
+    print("-" * 72)
+    print(f"{'promedio':>22} | {total_anterior / len(CASOS):>10.0f} {'':>5} {'':>7} | "
+          f"{total_actual / len(CASOS):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: carga del menú con consultas N+1 vs carga en bloque
+Crea un restaurante temporal con menús de distintos tamaños, mide los viajes
+a la base de datos y el tiempo de pared de cada camino, y lo elimina al final.
+
+Uso:
+    python benchmarks/bench_carga_menu.py --tamanos 10,60,250,1000 --latencia-ms 0.5
+
+--latencia-ms agrega una espera artificial por consulta para simular la
+latencia de red de producción cuando la BD es local.
+Requiere la misma configuración de BD (.env) que el resto del sistema.
+"""
+
+import sys
+import os
+import io
+import time
+import argparse
+from contextlib import contextmanager, redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.database_multirestaurante as dbm
+from database.database_multirestaurante import DatabaseManager
+
+_get_db_cursor_original = dbm.get_db_cursor
+
+
+class ContadorCursor:
+    """Cursor que cuenta viajes a la BD y simula latencia por consulta"""
+
+    viajes = 0
+    latencia = 0.0
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        ContadorCursor.viajes += 1
+        if ContadorCursor.latencia:
+            time.sleep(ContadorCursor.latencia)
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        ContadorCursor.viajes += 1
+        if ContadorCursor.latencia:
+            time.sleep(ContadorCursor.latencia)
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@contextmanager
+def get_db_cursor_contado(dictionary=True):
+    with _get_db_cursor_original(dictionary) as (cursor, conn):
+        yield ContadorCursor(cursor), conn
+
+
+def crear_restaurante_sintetico(num_items, ingredientes_por_item=4):
+    """Crear un restaurante temporal con num_items items"""
+    with _get_db_cursor_original() as (cursor, conn):
+        slug = f"bench-menu-{num_items}-{int(time.time() * 1000)}"
+        cursor.execute("""
+            INSERT INTO restaurantes (slug, nombre_restaurante, estado)
+            VALUES (%s, %s, 'inactivo')
+        """, (slug, f"Benchmark {num_items}"))
+        restaurante_id = cursor.lastrowid
+
+        num_categorias = max(1, min(12, num_items // 8))
+        categoria_ids = []
+        for orden in range(num_categorias):
+            cursor.execute("""
+                INSERT INTO categorias_menu (restaurante_id, nombre, nombre_display, orden)
+                VALUES (%s, %s, %s, %s)
+            """, (restaurante_id, f"cat_{orden}", f"Categoría {orden}", orden))
+            categoria_ids.append(cursor.lastrowid)
+
+        for i in range(num_items):
+            cursor.execute("""
+                INSERT INTO items_menu
+                (restaurante_id, categoria_id, codigo, nombre, descripcion, precio, tiempo_preparacion)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                restaurante_id, categoria_ids[i % num_categorias], f"item_{i}",
+                f"Platillo {i}", "Descripción de prueba", 100 + i % 50, "10-15 min"
+            ))
+            item_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO ingredientes (item_id, nombre, alergeno, orden)
+                VALUES (%s, %s, %s, %s)
+            """, [(item_id, f"Ingrediente {n}", False, n) for n in range(ingredientes_por_item)])
+
+        conn.commit()
+        return restaurante_id
+
+
+def eliminar_restaurante(restaurante_id):
+    with _get_db_cursor_original() as (cursor, conn):
+        cursor.execute("DELETE FROM restaurantes WHERE id = %s", (restaurante_id,))
+        conn.commit()
+
+
+def carga_legacy(restaurante_id):
+    """Camino anterior de _load_menu_from_db: categoría -> items -> ingredientes"""
+    for categoria in DatabaseManager.get_categorias_menu(restaurante_id):
+        for item in DatabaseManager.get_items_por_categoria(restaurante_id, categoria['id']):
+            DatabaseManager.get_ingredientes_item(item['id'])
+
+
+def carga_en_bloque(restaurante_id):
+    DatabaseManager.get_catalogo_completo(restaurante_id)
+
+
+def medir(funcion, restaurante_id, repeticiones):
+    """Retorna (viajes por carga, ms promedio por carga)"""
+    ContadorCursor.viajes = 0
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeticiones):
+            funcion(restaurante_id)
+    transcurrido = time.perf_counter() - inicio
+    return ContadorCursor.viajes // repeticiones, transcurrido * 1000 / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', default='10,60,250,1000')
+    parser.add_argument('--latencia-ms', type=float, default=0.0)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    ContadorCursor.latencia = args.latencia_ms / 1000
+    dbm.get_db_cursor = get_db_cursor_contado
+
+    print(f"{'items':>7} | {'viajes N+1':>10} | {'ms N+1':>9} | {'viajes bloque':>13} | {'ms bloque':>9}")
+    print("-" * 60)
+
+    for tamano in [int(t) for t in args.tamanos.split(',')]:
+        restaurante_id = crear_restaurante_sintetico(tamano)
+        try:
+            viajes_legacy, ms_legacy = medir(carga_legacy, restaurante_id, args.repeticiones)
+            viajes_bloque, ms_bloque = medir(carga_en_bloque, restaurante_id, args.repeticiones)
+            print(f"{tamano:>7} | {viajes_legacy:>10} | {ms_legacy:>9.1f} | {viajes_bloque:>13} | {ms_bloque:>9.1f}")
+        finally:
+            eliminar_restaurante(restaurante_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark: estadísticas del día con DATE(columna) vs rango indexado
+Llena tablas temporales (bench_pedidos, bench_reservaciones) con un
+historial creciente de pedidos sintéticos, manteniendo constante la
+cantidad de pedidos de hoy, y mide la consulta del dashboard en tres
+variantes:
+
+    DATE() sin índice       forma anterior, solo con índice por restaurante
+    DATE() con índice       forma anterior con el índice compuesto
+    rango con índice        rango sobre la columna (como la reconciliación)
+
+También muestra las filas que MySQL estima examinar (EXPLAIN).
+Las tablas se eliminan al final.
+
+Uso:
+    python benchmarks/bench_estadisticas_hoy.py --historial 10000,100000,1000000
+
+Requiere la misma configuración de BD (.env) que el resto del sistema.
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database_multirestaurante import DatabaseManager, get_db_cursor
+
+LOTE_INSERT = 5000
+
+CONSULTA_DATE = """
+    SELECT COUNT(*) as total, COALESCE(SUM(total), 0) as suma
+    FROM bench_pedidos
+    {indice}
+    WHERE restaurante_id = %s AND DATE(fecha_pedido) = %s
+"""
+
+CONSULTA_RANGO = """
+    SELECT COUNT(*) as total, COALESCE(SUM(total), 0) as suma
+    FROM bench_pedidos
+    WHERE restaurante_id = %s
+      AND fecha_pedido >= %s AND fecha_pedido < %s
+"""
+
+CONSULTA_RESERVACIONES_DATE = """
+    SELECT COUNT(*) as total FROM bench_reservaciones
+    {indice}
+    WHERE restaurante_id = %s AND DATE(fecha_reservacion) = %s
+"""
+
+CONSULTA_RESERVACIONES = """
+    SELECT COUNT(*) as total FROM bench_reservaciones
+    WHERE restaurante_id = %s AND fecha_reservacion = %s
+"""
+
+
+def crear_tablas():
+    with get_db_cursor() as (cursor, conn):
+        cursor.execute("DROP TABLE IF EXISTS bench_pedidos")
+        cursor.execute("DROP TABLE IF EXISTS bench_reservaciones")
+        # Columnas relevantes de pedidos/reservaciones más relleno para un
+        # tamaño de fila parecido al real
+        cursor.execute("""
+            CREATE TABLE bench_pedidos (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                restaurante_id INT NOT NULL,
+                fecha_pedido DATETIME NOT NULL,
+                total DECIMAL(10,2) NOT NULL,
+                estado VARCHAR(20) NOT NULL,
+                notas VARCHAR(200),
+                INDEX idx_restaurante (restaurante_id),
+                INDEX idx_restaurante_fecha (restaurante_id, fecha_pedido)
+            ) ENGINE=InnoDB
+        """)
+        cursor.execute("""
+            CREATE TABLE bench_reservaciones (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                restaurante_id INT NOT NULL,
+                fecha_reservacion DATE NOT NULL,
+                numero_personas INT NOT NULL,
+                notas VARCHAR(200),
+                INDEX idx_restaurante (restaurante_id),
+                INDEX idx_restaurante_fecha (restaurante_id, fecha_reservacion)
+            ) ENGINE=InnoDB
+        """)
+        conn.commit()
+
+
+def eliminar_tablas():
+    with get_db_cursor() as (cursor, conn):
+        cursor.execute("DROP TABLE IF EXISTS bench_pedidos")
+        cursor.execute("DROP TABLE IF EXISTS bench_reservaciones")
+        conn.commit()
+
+
+def insertar_historial(cantidad, restaurantes, pedidos_por_dia, desde_dia):
+    """
+    Insertar pedidos (y una reservación por cada 5) en días anteriores a hoy,
+    empezando desde_dia días atrás. Retorna el siguiente día libre.
+    """
+    por_dia = restaurantes * pedidos_por_dia
+    dia = desde_dia
+    insertados = 0
+    hoy = datetime.combine(date.today(), datetime.min.time())
+    relleno = 'x' * 80
+
+    with get_db_cursor() as (cursor, conn):
+        while insertados < cantidad:
+            pedidos = []
+            reservaciones = []
+            while len(pedidos) < LOTE_INSERT and insertados < cantidad:
+                fecha = hoy - timedelta(days=dia)
+                for n in range(min(por_dia, cantidad - insertados)):
+                    momento = fecha + timedelta(seconds=random.randrange(86400))
+                    restaurante_id = 1 + n % restaurantes
+                    pedidos.append((restaurante_id, momento, 50 + n % 400, 'entregado', relleno))
+                    if n % 5 == 0:
+                        reservaciones.append((restaurante_id, momento.date(), 2 + n % 6, relleno))
+                    insertados += 1
+                dia += 1
+
+            cursor.executemany("""
+                INSERT INTO bench_pedidos (restaurante_id, fecha_pedido, total, estado, notas)
+                VALUES (%s, %s, %s, %s, %s)
+            """, pedidos)
+            if reservaciones:
+                cursor.executemany("""
+                    INSERT INTO bench_reservaciones (restaurante_id, fecha_reservacion, numero_personas, notas)
+                    VALUES (%s, %s, %s, %s)
+                """, reservaciones)
+            conn.commit()
+
+        cursor.execute("ANALYZE TABLE bench_pedidos, bench_reservaciones")
+        cursor.fetchall()
+    return dia
+
+
+def insertar_hoy(restaurantes, pedidos_por_dia):
+    hoy = datetime.combine(date.today(), datetime.min.time())
+    ahora_seg = max(1, int((datetime.now() - hoy).total_seconds()))
+    with get_db_cursor() as (cursor, conn):
+        cursor.executemany("""
+            INSERT INTO bench_pedidos (restaurante_id, fecha_pedido, total, estado, notas)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [
+            (1 + n % restaurantes, hoy + timedelta(seconds=random.randrange(ahora_seg)),
+             50 + n % 400, 'confirmado', None)
+            for n in range(restaurantes * pedidos_por_dia)
+        ])
+        cursor.executemany("""
+            INSERT INTO bench_reservaciones (restaurante_id, fecha_reservacion, numero_personas, notas)
+            VALUES (%s, %s, %s, %s)
+        """, [(1 + n % restaurantes, hoy.date(), 4, None) for n in range(restaurantes * pedidos_por_dia // 5)])
+        conn.commit()
+
+
+def medir(consulta_pedidos, params_pedidos, consulta_reservaciones, params_reservaciones, repeticiones):
+    """Retorna (ms promedio de las dos consultas, filas estimadas por EXPLAIN)"""
+    with get_db_cursor() as (cursor, conn):
+        filas = 0
+        for consulta, params in ((consulta_pedidos, params_pedidos),
+                                 (consulta_reservaciones, params_reservaciones)):
+            cursor.execute("EXPLAIN " + consulta, params)
+            filas += sum(int(row['rows'] or 0) for row in cursor.fetchall())
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            cursor.execute(consulta_pedidos, params_pedidos)
+            cursor.fetchall()
+            cursor.execute(consulta_reservaciones, params_reservaciones)
+            cursor.fetchall()
+        return (time.perf_counter() - inicio) * 1000 / repeticiones, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--historial', default='10000,100000,1000000',
+                        help='Tamaños acumulados del historial de pedidos')
+    parser.add_argument('--restaurantes', type=int, default=20)
+    parser.add_argument('--pedidos-por-dia', type=int, default=60,
+                        help='Pedidos por restaurante por día (también los de hoy)')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    hoy = date.today()
+    inicio, fin = DatabaseManager.rango_del_dia(hoy)
+    restaurante_id = 1
+
+    variantes = [
+        ('DATE() sin índice',
+         CONSULTA_DATE.format(indice='USE INDEX (idx_restaurante)'), (restaurante_id, hoy),
+         CONSULTA_RESERVACIONES_DATE.format(indice='USE INDEX (idx_restaurante)'), (restaurante_id, hoy)),
+        ('DATE() con índice',
+         CONSULTA_DATE.format(indice=''), (restaurante_id, hoy),
+         CONSULTA_RESERVACIONES_DATE.format(indice=''), (restaurante_id, hoy)),
+        ('rango con índice',
+         CONSULTA_RANGO, (restaurante_id, inicio, fin),
+         CONSULTA_RESERVACIONES, (restaurante_id, hoy)),
+    ]
+
+    crear_tablas()
+    try:
+        insertar_hoy(args.restaurantes, args.pedidos_por_dia)
+        print(f"{'historial':>10} | " + " | ".join(f"{nombre:>24}" for nombre, *_ in variantes))
+        print(f"{'':>10} | " + " | ".join(f"{'ms':>10} {'filas exam.':>13}" for _ in variantes))
+        print("-" * (13 + 27 * len(variantes)))
+
+        total = 0
+        siguiente_dia = 1
+        for tamano in sorted(int(t) for t in args.historial.split(',')):
+            siguiente_dia = insertar_historial(tamano - total, args.restaurantes,
+                                               args.pedidos_por_dia, siguiente_dia)
+            total = tamano
+
+            columnas = []
+            for _, consulta_p, params_p, consulta_r, params_r in variantes:
+                ms, filas = medir(consulta_p, params_p, consulta_r, params_r, args.repeticiones)
+                columnas.append(f"{ms:>10.2f} {filas:>13}")
+            print(f"{total:>10} | " + " | ".join(columnas))
+    finally:
+        eliminar_tablas()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Codificación de callback_data de los botones inline
+Antes cada botón llevaba un texto como "add_to_order_principales_pasta_trufa_2"
+que el handler separaba con split("_") por posición: un código de item con
+guion bajo movía los campos, "order_" y "order_type_" dependían del orden de
+los elif y un nombre largo podía pasar los 64 bytes que acepta Telegram.
+
+Ahora el payload es:
+
+    <versión><acción>[:<arg>]...        p. ej. "1a:kk:2"  (agregar 2 del item 740)
+
+- versión: un dígito; los botones de versiones anteriores (o de antes de
+  este formato) se reconocen y no se confunden con los nuevos.
+- acción: un carácter (ver ACCIONES).
+- args: enteros no negativos en base 36, solo [0-9a-z] (ids de
+  categoría/item, cantidades), o textos cortos sin ':' (tipo de pedido,
+  tipo de queja).
+
+decodificar() se llama una vez por callback y el handler despacha la acción
+con un diccionario (ver RestaurantMessageHandlers.callback_handler).
+"""
+
+import re
+
+VERSION = '1'
+SEPARADOR = ':'
+# Límite de Telegram para callback_data
+MAX_BYTES = 64
+# int(valor, 36) también acepta '-1', '+x', '1_0' o espacios: se valida antes
+_ENTERO_BASE36 = re.compile('[0-9a-z]+')
+
+# acción -> (código, tipos de los argumentos)
+ACCIONES = {
+    'menu_principal': ('m', ()),
+    'ver_menu': ('v', ()),
+    'categoria': ('c', (int,)),
+    'item': ('i', (int,)),
+    'hacer_pedido': ('p', ()),
+    'tipo_pedido': ('t', (str,)),
+    'categoria_pedido': ('o', (int,)),
+    'item_pedido': ('j', (int,)),
+    'agregar_item': ('a', (int, int)),
+    'ver_pedido': ('r', ()),
+    'finalizar_pedido': ('f', ()),
+    'cancelar_pedido': ('x', ()),
+    'reservaciones': ('R', ()),
+    'nueva_reservacion': ('n', ()),
+    'consultar_reservacion': ('k', ()),
+    'modificar_reservacion': ('M', ()),
+    'cancelar_reservacion': ('X', ()),
+    'quejas': ('q', ()),
+    'tipo_queja': ('Q', (str,)),
+    'contacto': ('C', ()),
+    'ayuda': ('h', ()),
+}
+
+_POR_PREFIJO = {VERSION + codigo: (accion, tipos) for accion, (codigo, tipos) in ACCIONES.items()}
+
+# Botones sin parámetros de mensajes enviados antes de este formato; los de
+# categorías e items usaban códigos y se piden de nuevo desde el menú
+LEGADO = {
+    'menu_principal': ('menu_principal', ()),
+    'ver_menu': ('ver_menu', ()),
+    'hacer_pedido': ('hacer_pedido', ()),
+    'ver_pedido': ('ver_pedido', ()),
+    'finalizar_pedido': ('finalizar_pedido', ()),
+    'cancelar_pedido': ('cancelar_pedido', ()),
+    'reservaciones': ('reservaciones', ()),
+    'new_reservation': ('nueva_reservacion', ()),
+    'check_reservation': ('consultar_reservacion', ()),
+    'modify_reservation': ('modificar_reservacion', ()),
+    'cancel_reservation': ('cancelar_reservacion', ()),
+    'quejas': ('quejas', ()),
+    'contacto': ('contacto', ()),
+    'ayuda': ('ayuda', ()),
+}
+for _tipo in ('takeaway', 'delivery', 'restaurant'):
+    LEGADO[f'order_type_{_tipo}'] = ('tipo_pedido', (_tipo,))
+for _tipo in ('food', 'service', 'time', 'hygiene', 'price', 'facilities', 'queja', 'comentario'):
+    LEGADO[f'complaint_{_tipo}'] = ('tipo_queja', (_tipo,))
+for _tipo in ('general', 'sugerencia'):
+    LEGADO[f'suggestion_{_tipo}'] = ('tipo_queja', (_tipo,))
+
+# Payloads completos que se resuelven con una sola búsqueda: las acciones
+# sin argumentos (la mayoría de los botones) y los del formato anterior
+_DIRECTOS = dict(LEGADO)
+_DIRECTOS.update({VERSION + codigo: (accion, ()) for accion, (codigo, tipos) in ACCIONES.items() if not tipos})
+
+
+def _base36(numero):
+    if numero < 0:
+        raise ValueError(f"Argumento negativo en callback_data: {numero}")
+    digitos = '0123456789abcdefghijklmnopqrstuvwxyz'
+    texto = ''
+    while True:
+        numero, resto = divmod(numero, 36)
+        texto = digitos[resto] + texto
+        if not numero:
+            return texto
+
+
+def codificar(accion, *args):
+    """callback_data de una acción; ValueError si los argumentos no son válidos o no caben"""
+    codigo, tipos = ACCIONES[accion]
+    if len(args) != len(tipos):
+        raise ValueError(f"La acción {accion} espera {len(tipos)} argumento(s)")
+
+    partes = [VERSION + codigo]
+    for valor, tipo in zip(args, tipos):
+        if tipo is int:
+            partes.append(_base36(int(valor)))
+        else:
+            valor = str(valor)
+            if SEPARADOR in valor:
+                raise ValueError(f"'{SEPARADOR}' no se permite en callback_data: {valor!r}")
+            partes.append(valor)
+
+    data = SEPARADOR.join(partes)
+    if len(data.encode('utf-8')) > MAX_BYTES:
+        raise ValueError(f"callback_data de {accion} excede {MAX_BYTES} bytes")
+    return data
+
+
+def decodificar(data):
+    """(acción, args) del callback_data, o None si no se reconoce (botón de un menú anterior)"""
+    resultado = _DIRECTOS.get(data)
+    if resultado is not None or not data or data[0] != VERSION:
+        return resultado
+
+    partes = data.split(SEPARADOR)
+    definicion = _POR_PREFIJO.get(partes[0])
+    if definicion is None or len(partes) - 1 != len(definicion[1]):
+        return None
+
+    accion, tipos = definicion
+    args = []
+    for valor, tipo in zip(partes[1:], tipos):
+        if tipo is int:
+            if not _ENTERO_BASE36.fullmatch(valor):
+                return None
+            valor = int(valor, 36)
+        args.append(valor)
+    return accion, tuple(args)
@@ -0,0 +1,215 @@
+"""
+Almacén de conversaciones del bot de Telegram
+Reemplaza los diccionarios user_states, user_orders y user_reservations de
+RestaurantMenuSystem y waiting_for_input de RestaurantMessageHandlers, que
+nunca se limpiaban y se perdían al reiniciar.
+
+Cada usuario de cada restaurante tiene un solo registro compacto
+(EstadoUsuario) con esos cuatro campos. Los registros expiran tras
+BOT_ESTADO_TTL segundos sin actividad y, al llegar a BOT_ESTADO_MAX, se
+descarta el usado hace más tiempo (LRU). Si el registro expirado o
+descartado tenía un pedido a medias, el pedido se cancela en la BD para que
+no quede 'pendiente' para siempre. El TTL, el LRU y la limpieza en segundo
+plano son los de database/expiring_store.py, igual que en las sesiones del
+chat web.
+
+Backends:
+    memoria - dentro del proceso; al detener el bot se cancelan los pedidos a medias
+    sqlite  - archivo en disco: al reiniciar, las conversaciones siguen donde estaban
+
+Configuración por variables de entorno:
+    BOT_ESTADO_BACKEND   memoria | sqlite   (default: memoria)
+    BOT_ESTADO_TTL       segundos de inactividad antes de expirar (default: 7200)
+    BOT_ESTADO_MAX       registros máximos en el almacén (default: 20000)
+    BOT_ESTADO_DB        ruta del archivo SQLite (default: bot/conversaciones.sqlite3)
+"""
+
+import os
+
+from database.database_multirestaurante import DatabaseManager
+from database.expiring_store import ExpiringStore, MemoryExpiringStore, SQLiteExpiringStore
+
+BOT_ESTADO_BACKEND = os.getenv('BOT_ESTADO_BACKEND', 'memoria')
+BOT_ESTADO_TTL = int(os.getenv('BOT_ESTADO_TTL', 7200))
+BOT_ESTADO_MAX = int(os.getenv('BOT_ESTADO_MAX', 20000))
+BOT_ESTADO_DB = os.getenv(
+    'BOT_ESTADO_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'conversaciones.sqlite3')
+)
+
+
+class EstadoUsuario:
+    """
+    Conversación de un usuario con un restaurante:
+        estado      paso del flujo (None equivale a "inicio")
+        pedido      pedido en curso {pedido_id, numero_pedido, tipo_pedido, items}
+        reservacion datos de la reservación que se está capturando
+        esperando   texto que se espera del usuario {type, step, ...}
+    """
+
+    __slots__ = ('estado', 'pedido', 'reservacion', 'esperando')
+    CAMPOS = __slots__
+
+    def __init__(self, estado=None, pedido=None, reservacion=None, esperando=None):
+        self.estado = estado
+        self.pedido = pedido
+        self.reservacion = reservacion
+        self.esperando = esperando
+
+    def vacio(self):
+        return all(getattr(self, campo) is None for campo in self.CAMPOS)
+
+    def a_tupla(self):
+        return tuple(getattr(self, campo) for campo in self.CAMPOS)
+
+    @classmethod
+    def de_tupla(cls, valores):
+        return cls(*valores)
+
+
+def cancelar_pedido_abandonado(clave, registro):
+    """Acción por defecto al expirar o descartar una conversación con pedido a medias"""
+    if registro.pedido and registro.pedido.get('pedido_id'):
+        if DatabaseManager.cancelar_pedido_abandonado(registro.pedido['pedido_id']):
+            print(f"🗑️ Pedido {registro.pedido.get('numero_pedido')} cancelado: conversación abandonada")
+
+
+class ConversationStore(ExpiringStore):
+    """
+    Interfaz común. Las claves son (restaurante_id, user_id).
+
+    Los registros que se leen del almacén pueden ser copias (backend SQLite),
+    así que los cambios se hacen con actualizar() o modificar() y no
+    modificando lo leído. Los handlers de TeleBot corren en varios hilos: los
+    dos toman el lock de la clave, así que dos mensajes del mismo usuario no
+    se pisan los cambios.
+    """
+
+    def get(self, restaurante_id, user_id):
+        return self._leer((restaurante_id, user_id))
+
+    def guardar(self, restaurante_id, user_id, registro):
+        clave = (restaurante_id, user_id)
+        with self._lock_clave(clave):
+            self._escribir(clave, registro)
+
+    def borrar(self, restaurante_id, user_id):
+        clave = (restaurante_id, user_id)
+        with self._lock_clave(clave):
+            self._quitar(clave)
+
+    def modificar(self, restaurante_id, user_id, funcion):
+        """
+        Leer, cambiar y guardar el registro del usuario como una sola operación:
+        funcion(registro) modifica el EstadoUsuario (uno nuevo si no había).
+        Retorna el registro guardado.
+        """
+        clave = (restaurante_id, user_id)
+        with self._lock_clave(clave):
+            registro = self._leer(clave) or EstadoUsuario()
+            funcion(registro)
+            if registro.vacio():
+                self._quitar(clave)
+            else:
+                self._escribir(clave, registro)
+        return registro
+
+    def actualizar(self, restaurante_id, user_id, **campos):
+        """Cambiar campos del registro del usuario (None borra el campo)"""
+        def asignar(registro):
+            for campo, valor in campos.items():
+                setattr(registro, campo, valor)
+        self.modificar(restaurante_id, user_id, asignar)
+
+
+class MemoryConversationStore(MemoryExpiringStore, ConversationStore):
+    """
+    Registros en un OrderedDict del proceso. Al cerrar se descartan todos:
+    sus pedidos a medias ya no se podrían terminar.
+    """
+
+    def __init__(self, ttl=BOT_ESTADO_TTL, max_registros=BOT_ESTADO_MAX,
+                 al_descartar=cancelar_pedido_abandonado):
+        super().__init__(ttl, max_registros, al_descartar)
+
+
+class SQLiteConversationStore(SQLiteExpiringStore, ConversationStore):
+    """
+    Registros serializados con pickle (como tupla, sin nombres de campos) en
+    un archivo SQLite en modo WAL; sobreviven a reinicios del bot.
+    """
+
+    TABLA = 'conversaciones'
+    COLUMNAS_CLAVE = (('restaurante_id', 'INTEGER'), ('user_id', 'INTEGER'))
+
+    def __init__(self, ruta=BOT_ESTADO_DB, ttl=BOT_ESTADO_TTL, max_registros=BOT_ESTADO_MAX,
+                 al_descartar=cancelar_pedido_abandonado):
+        super().__init__(ruta, ttl, max_registros, al_descartar)
+
+    def _serializar(self, registro):
+        return super()._serializar(registro.a_tupla())
+
+    def _deserializar(self, datos):
+        return EstadoUsuario.de_tupla(super()._deserializar(datos))
+
+
+class VistaConversaciones:
+    """
+    Un campo de las conversaciones de un restaurante con la forma de un
+    diccionario por user_id, para el código que usaba los dicts originales.
+    Los valores leídos pueden ser copias: para cambiarlos hay que asignarlos,
+    o usar modificar() si el valor nuevo depende del anterior.
+    """
+
+    __slots__ = ('store', 'restaurante_id', 'campo')
+
+    def __init__(self, store, restaurante_id, campo):
+        self.store = store
+        self.restaurante_id = restaurante_id
+        self.campo = campo
+
+    def get(self, user_id, default=None):
+        registro = self.store.get(self.restaurante_id, user_id)
+        valor = getattr(registro, self.campo) if registro is not None else None
+        return default if valor is None else valor
+
+    def __getitem__(self, user_id):
+        valor = self.get(user_id)
+        if valor is None:
+            raise KeyError(user_id)
+        return valor
+
+    def __setitem__(self, user_id, valor):
+        self.store.actualizar(self.restaurante_id, user_id, **{self.campo: valor})
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __delitem__(self, user_id):
+        self.store.actualizar(self.restaurante_id, user_id, **{self.campo: None})
+
+    def modificar(self, user_id, funcion):
+        """Reemplazar el valor por funcion(valor actual o None) sin perder cambios concurrentes"""
+        def aplicar(registro):
+            setattr(registro, self.campo, funcion(getattr(registro, self.campo)))
+        return getattr(self.store.modificar(self.restaurante_id, user_id, aplicar), self.campo)
+
+    def pop(self, user_id, default=None):
+        valor = self.get(user_id, default)
+        del self[user_id]
+        return valor
+
+
+def crear_conversation_store(backend=BOT_ESTADO_BACKEND):
+    """Crear el almacén configurado por BOT_ESTADO_BACKEND"""
+    if backend == 'sqlite':
+        print(f"💾 Conversaciones del bot en SQLite: {BOT_ESTADO_DB}")
+        return SQLiteConversationStore()
+
+    if backend != 'memoria':
+        print(f"⚠️ BOT_ESTADO_BACKEND '{backend}' desconocido, usando memoria")
+    return MemoryConversationStore()
+
+
+# Instancia global
+conversaciones = crear_conversation_store()
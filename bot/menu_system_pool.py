@@ -0,0 +1,135 @@
+"""
+Pool de sistemas de menú por restaurante
+Con el runner multi-restaurante (bot/tenant_runner.py) cada bot tenía su
+RestaurantMenuSystem creado al arrancar, con el menú completo cargado
+aunque el restaurante no recibiera un mensaje en horas.
+
+Este pool crea el sistema de menú de un restaurante cuando llega su primer
+mensaje (el menú mismo se carga al primer uso) y mantiene los cargados en
+orden LRU. Se desaloja el usado hace más tiempo cuando:
+
+- la memoria estimada de todos supera BOT_MENU_POOL_MB,
+- hay más de BOT_MENU_POOL_MAX restaurantes cargados, o
+- lleva BOT_MENU_INACTIVO_SEG sin mensajes.
+
+Las conversaciones en curso (estados, pedidos y reservaciones a medias) no
+viven en el sistema de menú sino en bot/conversation_store.py, así que
+desalojar un restaurante no las pierde. Los usados en los últimos
+EN_USO_SEG segundos no se desalojan: un handler puede estar atendiéndolos.
+
+Configuración por variables de entorno:
+    BOT_MENU_POOL_MB         memoria estimada máxima de los menús cargados (default: 64)
+    BOT_MENU_POOL_MAX        restaurantes cargados a la vez (default: 200)
+    BOT_MENU_INACTIVO_SEG    segundos sin mensajes antes de desalojar (default: 1800)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from bot.restaurant_menu_system import RestaurantMenuSystem
+
+BOT_MENU_POOL_MB = float(os.getenv('BOT_MENU_POOL_MB', 64))
+BOT_MENU_POOL_MAX = int(os.getenv('BOT_MENU_POOL_MAX', 200))
+BOT_MENU_INACTIVO_SEG = float(os.getenv('BOT_MENU_INACTIVO_SEG', 1800))
+
+# Un restaurante usado hace menos de esto no se desaloja aunque sobre memoria
+EN_USO_SEG = 60
+# Cada cuántos segundos se buscan restaurantes inactivos
+REVISION_SEG = 30
+
+
+class _MenuCargado:
+    """Sistema de menú de un restaurante y su último uso"""
+
+    __slots__ = ('menu_system', 'ultimo_uso')
+
+    def __init__(self, menu_system):
+        self.menu_system = menu_system
+        self.ultimo_uso = time.monotonic()
+
+    def tamano(self):
+        return self.menu_system.tamano_menu
+
+
+class MenuSystemPool:
+    """RestaurantMenuSystem por restaurante_id, creados al primer uso y desalojados por LRU"""
+
+    def __init__(self, memoria_mb=BOT_MENU_POOL_MB, max_restaurantes=BOT_MENU_POOL_MAX,
+                 inactivo_seg=BOT_MENU_INACTIVO_SEG):
+        self.memoria_max = int(memoria_mb * 1024 * 1024)
+        self.max_restaurantes = max_restaurantes
+        self.inactivo_seg = inactivo_seg
+        self._cargados = OrderedDict()  # restaurante_id -> _MenuCargado, del menos al más reciente
+        self._lock = threading.RLock()
+        self._ultima_revision = time.monotonic()
+        self.stats = {'hits': 0, 'creados': 0, 'desalojados': 0}
+
+    def get(self, restaurante_id, restaurante=None):
+        """Sistema de menú del restaurante, creándolo si no está cargado (restaurante: su fila, para los textos)"""
+        with self._lock:
+            cargado = self._cargados.get(restaurante_id)
+            if cargado is not None:
+                cargado.ultimo_uso = time.monotonic()
+                self._cargados.move_to_end(restaurante_id)
+                self.stats['hits'] += 1
+                self._revisar_inactivos()
+                return cargado.menu_system
+
+            menu_system = RestaurantMenuSystem(restaurante_id, restaurante=restaurante)
+            self._cargados[restaurante_id] = _MenuCargado(menu_system)
+            self.stats['creados'] += 1
+            self._aplicar_limites()
+            return menu_system
+
+    def desalojar(self, restaurante_id):
+        """Soltar el sistema de menú de un restaurante (se vuelve a crear en su próximo mensaje)"""
+        with self._lock:
+            if self._cargados.pop(restaurante_id, None) is None:
+                return False
+            self.stats['desalojados'] += 1
+            return True
+
+    def _aplicar_limites(self):
+        """Desalojar desde el menos reciente hasta quedar dentro de la memoria y el máximo"""
+        en_uso = time.monotonic() - EN_USO_SEG
+        memoria = self.memoria_estimada()
+        for restaurante_id, cargado in list(self._cargados.items()):
+            if len(self._cargados) <= self.max_restaurantes and memoria <= self.memoria_max:
+                break
+            if cargado.ultimo_uso > en_uso:
+                # El resto es aún más reciente
+                break
+            memoria -= cargado.tamano()
+            self.desalojar(restaurante_id)
+        self._revisar_inactivos()
+
+    def _revisar_inactivos(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < REVISION_SEG:
+            return
+        self._ultima_revision = ahora
+        limite = ahora - self.inactivo_seg
+        for restaurante_id, cargado in list(self._cargados.items()):
+            if cargado.ultimo_uso > limite:
+                break
+            self.desalojar(restaurante_id)
+
+    def memoria_estimada(self):
+        with self._lock:
+            return sum(cargado.tamano() for cargado in self._cargados.values())
+
+    def get_metricas(self):
+        with self._lock:
+            metricas = dict(self.stats)
+            metricas.update({
+                'cargados': len(self._cargados),
+                'memoria_estimada_kb': self.memoria_estimada() // 1024,
+                'memoria_max_kb': self.memoria_max // 1024,
+            })
+        return metricas
+
+
+# Instancia global
+pool_menus = MenuSystemPool()
@@ -0,0 +1,323 @@
+"""
+Despachador de notificaciones de Telegram en segundo plano
+El request del chat solo arma el texto y lo encola; un pequeño pool de
+hilos hace el envío, respetando los límites de Telegram, con reintentos
+y backoff exponencial.
+
+- Límite por chat: Telegram permite ~20 mensajes por minuto en un grupo
+  y ~1 por segundo en un chat; límite global de ~30 por segundo por bot.
+  Si un envío excede el límite, se reprograma en lugar de bloquear un hilo.
+- Las alertas "new_message" que llegan en ráfaga se juntan en un solo
+  resumen por restaurante. Si el resumen pasa el límite de Telegram
+  (MAX_CARACTERES_MENSAJE) se envía en varias partes, cortando entre mensajes.
+
+Configuración por variables de entorno:
+    NOTIF_WORKERS            hilos de envío (default: 2)
+    NOTIF_MAX_INTENTOS       intentos antes de descartar (default: 5)
+    NOTIF_VENTANA_RESUMEN    segundos para juntar alertas de mensajes (default: 5)
+"""
+
+import atexit
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telebot
+
+from bot.telegram_client_pool import telegram_clients
+
+NOTIF_WORKERS = int(os.getenv('NOTIF_WORKERS', 2))
+NOTIF_MAX_INTENTOS = int(os.getenv('NOTIF_MAX_INTENTOS', 5))
+NOTIF_VENTANA_RESUMEN = float(os.getenv('NOTIF_VENTANA_RESUMEN', 5))
+
+# Límites de Telegram
+MENSAJES_POR_MINUTO_GRUPO = 20
+SEGUNDOS_ENTRE_MENSAJES_CHAT = 1.0
+MENSAJES_POR_SEGUNDO_BOT = 30
+MAX_CARACTERES_MENSAJE = 4096
+
+# Tipos que se agrupan en un resumen
+TIPOS_AGRUPABLES = {'new_message'}
+
+
+def _partir_resumen(encabezado, textos, limite=MAX_CARACTERES_MENSAJE):
+    """Partes de hasta limite caracteres, cortando entre textos; uno que no cabe solo se corta"""
+    piezas = []
+    for texto in textos:
+        piezas.extend(texto[i:i + limite] for i in range(0, max(len(texto), 1), limite))
+
+    partes = []
+    actual = encabezado
+    for pieza in piezas:
+        if actual and len(actual) + 2 + len(pieza) > limite:
+            partes.append(actual)
+            actual = pieza
+        else:
+            actual = f"{actual}\n\n{pieza}" if actual else pieza
+    if actual:
+        partes.append(actual)
+    return partes
+
+
+class _Cubeta:
+    """Token bucket: capacidad tokens que se recargan a razon tokens/segundo"""
+
+    __slots__ = ('capacidad', 'razon', 'tokens', 'actualizado')
+
+    def __init__(self, capacidad, razon):
+        self.capacidad = capacidad
+        self.razon = razon
+        self.tokens = float(capacidad)
+        self.actualizado = time.monotonic()
+
+    def espera(self, ahora):
+        """Segundos hasta que haya un token disponible (0 si ya lo hay)"""
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.razon)
+        self.actualizado = ahora
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.razon
+
+    def consumir(self):
+        self.tokens -= 1
+
+
+class _Notificacion:
+    __slots__ = ('restaurante_id', 'tipo', 'texto', 'intentos')
+
+    def __init__(self, restaurante_id, tipo, texto):
+        self.restaurante_id = restaurante_id
+        self.tipo = tipo
+        self.texto = texto
+        self.intentos = 0
+
+
+class NotificationDispatcher:
+    """Bandeja de salida de notificaciones con envío diferido"""
+
+    def __init__(self, workers=NOTIF_WORKERS, max_intentos=NOTIF_MAX_INTENTOS,
+                 ventana_resumen=NOTIF_VENTANA_RESUMEN, clientes=telegram_clients):
+        self.workers = workers
+        self.max_intentos = max_intentos
+        self.ventana_resumen = ventana_resumen
+        self.clientes = clientes
+
+        self._executor = None
+        self._agenda = []                   # heap de (cuando, secuencia, notificacion)
+        self._secuencia = itertools.count()
+        self._condicion = threading.Condition()
+        self._hilo_agenda = None
+        self._detenido = False
+
+        self._resumenes = {}                # restaurante_id -> [textos]
+        self._limites_lock = threading.Lock()
+        self._cubetas_chat = {}             # chat_id -> (cubeta_minuto, cubeta_segundo)
+        self._cubetas_bot = {}              # bot_token -> cubeta
+
+        self.stats = {
+            'encoladas': 0, 'enviadas': 0, 'reintentos': 0, 'descartadas': 0,
+            'limitadas': 0, 'agrupadas': 0,
+        }
+
+    # ---------- API pública ----------
+
+    def encolar(self, restaurante_id, tipo, texto):
+        """Programar una notificación para el grupo del restaurante"""
+        self._iniciar()
+        self.stats['encoladas'] += 1
+
+        if tipo in TIPOS_AGRUPABLES and self.ventana_resumen > 0:
+            with self._condicion:
+                textos = self._resumenes.get(restaurante_id)
+                if textos is not None:
+                    textos.append(texto)
+                    self.stats['agrupadas'] += 1
+                    return
+                self._resumenes[restaurante_id] = [texto]
+            # La primera de la ráfaga abre la ventana; al cerrarla se envía el resumen
+            self._programar(_Notificacion(restaurante_id, '_resumen', None), self.ventana_resumen)
+            return
+
+        self._programar(_Notificacion(restaurante_id, tipo, texto), 0)
+
+    def detener(self, timeout=10):
+        """Enviar lo pendiente (incluidos resúmenes abiertos) y detener los hilos"""
+        if self._hilo_agenda is None:
+            return
+
+        with self._condicion:
+            self._detenido = True
+            pendientes = [notificacion for _, _, notificacion in self._agenda]
+            self._agenda.clear()
+            self._condicion.notify()
+        self._hilo_agenda.join(timeout)
+
+        fin = time.monotonic() + timeout
+        for notificacion in pendientes:
+            if time.monotonic() > fin:
+                self.stats['descartadas'] += 1
+                continue
+            # Al cerrar no se reprograma: un intento por notificación
+            notificacion.intentos = self.max_intentos - 1
+            self._executor.submit(self._enviar, notificacion)
+        self._executor.shutdown(wait=True)
+
+    # ---------- Agenda ----------
+
+    def _iniciar(self):
+        if self._hilo_agenda is not None:
+            return
+        with self._condicion:
+            if self._hilo_agenda is not None:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='notificaciones'
+            )
+            self._hilo_agenda = threading.Thread(
+                target=self._bucle_agenda, name='notificaciones-agenda', daemon=True
+            )
+            self._hilo_agenda.start()
+
+    def _programar(self, notificacion, retraso):
+        with self._condicion:
+            if self._detenido:
+                try:
+                    self._executor.submit(self._enviar, notificacion)
+                except RuntimeError:
+                    # El pool ya se cerró
+                    self.stats['descartadas'] += 1
+                return
+            heapq.heappush(
+                self._agenda,
+                (time.monotonic() + retraso, next(self._secuencia), notificacion)
+            )
+            self._condicion.notify()
+
+    def _bucle_agenda(self):
+        """Pasar al pool las notificaciones cuyo momento ya llegó"""
+        while True:
+            with self._condicion:
+                while not self._detenido:
+                    if self._agenda:
+                        espera = self._agenda[0][0] - time.monotonic()
+                        if espera <= 0:
+                            break
+                        self._condicion.wait(espera)
+                    else:
+                        self._condicion.wait()
+                if self._detenido:
+                    return
+                _, _, notificacion = heapq.heappop(self._agenda)
+
+            self._executor.submit(self._enviar, notificacion)
+
+    # ---------- Envío ----------
+
+    def _armar_resumen(self, restaurante_id):
+        """Textos a enviar para el resumen: uno, o varias partes si no cabe en un mensaje"""
+        with self._condicion:
+            textos = self._resumenes.pop(restaurante_id, None) or []
+        if len(textos) <= 1:
+            return _partir_resumen('', textos)
+        return _partir_resumen(
+            f"📨 {len(textos)} mensajes del chat web en {self.ventana_resumen:g} s", textos
+        )
+
+    def _espera_limites(self, chat_id, bot_token):
+        """Reservar un envío; retorna los segundos a esperar si se excede un límite"""
+        ahora = time.monotonic()
+        with self._limites_lock:
+            cubetas = self._cubetas_chat.get(chat_id)
+            if cubetas is None:
+                cubetas = self._cubetas_chat[chat_id] = (
+                    _Cubeta(MENSAJES_POR_MINUTO_GRUPO, MENSAJES_POR_MINUTO_GRUPO / 60),
+                    _Cubeta(1, 1 / SEGUNDOS_ENTRE_MENSAJES_CHAT),
+                )
+            cubeta_bot = self._cubetas_bot.get(bot_token)
+            if cubeta_bot is None:
+                cubeta_bot = self._cubetas_bot[bot_token] = _Cubeta(
+                    MENSAJES_POR_SEGUNDO_BOT, MENSAJES_POR_SEGUNDO_BOT
+                )
+
+            espera = max(cubeta.espera(ahora) for cubeta in (*cubetas, cubeta_bot))
+            if espera == 0:
+                for cubeta in (*cubetas, cubeta_bot):
+                    cubeta.consumir()
+            return espera
+
+    def _enviar(self, notificacion):
+        try:
+            if notificacion.tipo == '_resumen':
+                notificacion.tipo = 'new_message'
+                partes = self._armar_resumen(notificacion.restaurante_id)
+                if not partes:
+                    return
+                notificacion.texto = partes[0]
+                # Cada parte es su propia notificación: respeta los límites y se reintenta sola
+                for orden, parte in enumerate(partes[1:], 1):
+                    self._programar(
+                        _Notificacion(notificacion.restaurante_id, 'new_message', parte),
+                        orden * SEGUNDOS_ENTRE_MENSAJES_CHAT
+                    )
+
+            bot_restaurante, config = self.clientes.get_para_restaurante(notificacion.restaurante_id)
+            if not bot_restaurante:
+                print(f"⚠️ No hay bot_token configurado para restaurante {notificacion.restaurante_id}")
+                return
+
+            target_chat = config.get('telegram_group_id') or config.get('telegram_admin_id')
+            if not target_chat:
+                print(f"⚠️ No hay chat configurado")
+                return
+
+            espera = self._espera_limites(target_chat, config['bot_token'])
+            if espera > 0 and not self._detenido:
+                self.stats['limitadas'] += 1
+                self._programar(notificacion, espera)
+                return
+
+            bot_restaurante.send_message(target_chat, notificacion.texto)
+            self.stats['enviadas'] += 1
+            print(f"✅ Notificación '{notificacion.tipo}' enviada a {target_chat}")
+
+        except telebot.apihelper.ApiTelegramException as e:
+            retraso = None
+            if e.error_code == 429:
+                # Telegram indica cuánto esperar
+                retraso = (e.result_json or {}).get('parameters', {}).get('retry_after')
+            elif e.error_code in (401, 404):
+                # Token revocado o cambiado desde el panel
+                self.clientes.invalidar(notificacion.restaurante_id)
+            elif e.error_code == 400:
+                print(f"❌ Telegram rechazó la notificación '{notificacion.tipo}': {e.description}")
+                self.stats['descartadas'] += 1
+                return
+            self._reintentar(notificacion, e, retraso)
+
+        except Exception as e:
+            self._reintentar(notificacion, e)
+
+    def _reintentar(self, notificacion, error, retraso=None):
+        notificacion.intentos += 1
+        if notificacion.intentos >= self.max_intentos:
+            self.stats['descartadas'] += 1
+            print(f"❌ Notificación '{notificacion.tipo}' descartada tras {notificacion.intentos} intentos: {error}")
+            return
+
+        if retraso is None:
+            # Backoff exponencial con variación aleatoria: 1, 2, 4, 8... s
+            retraso = (2 ** (notificacion.intentos - 1)) * (0.75 + random.random() / 2)
+
+        self.stats['reintentos'] += 1
+        print(f"⚠️ Error enviando notificación '{notificacion.tipo}' (intento {notificacion.intentos}), "
+              f"reintento en {retraso:.1f}s: {error}")
+        self._programar(notificacion, retraso)
+
+
+# Instancia global
+notification_dispatcher = NotificationDispatcher()
+atexit.register(notification_dispatcher.detener)
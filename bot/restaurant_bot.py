@@ -2,6 +2,10 @@
 """
 Bot de Telegram para Restaurante Giants
 Sistema completo de menú, pedidos, reservaciones y atención al cliente
+
+Recibe las actualizaciones por webhook si TELEGRAM_WEBHOOK_URL está
+configurada (ver bot/webhook.py) y por polling si no, o si no se pudo
+registrar el webhook.
 """
 
 import telebot
@@ -11,12 +15,19 @@ import schedule
 from datetime import datetime
 from config import BOT_TOKEN, RESTAURANT_CONFIG, CHAT_IDS
 from bot.restaurant_message_handlers import RestaurantMessageHandlers
+from bot.conversation_store import conversaciones
+from bot.webhook import (receptor_webhook, crear_app, TELEGRAM_WEBHOOK_URL,
+                         TELEGRAM_WEBHOOK_HOST, TELEGRAM_WEBHOOK_PORT)
 
 class RestaurantBot:
     def __init__(self):
         """Inicializar el bot del restaurante"""
         try:
-            self.bot = telebot.TeleBot(BOT_TOKEN)
+            self.modo = 'webhook' if TELEGRAM_WEBHOOK_URL else 'polling'
+            # Con webhook los handlers corren en los hilos del receptor, que
+            # ya reparten por chat; el pool de hilos propio de TeleBot
+            # desordenaría los mensajes de un mismo chat
+            self.bot = telebot.TeleBot(BOT_TOKEN, threaded=self.modo == 'polling')
             self.message_handlers = RestaurantMessageHandlers(self.bot)
             self.is_running = False
             self.stats = {
@@ -54,13 +65,9 @@ class RestaurantBot:
             print("🚀 Bot ejecutándose... Presiona Ctrl+C para detener")
             print("-" * 60)
             
-            # Iniciar el bot con polling mejorado
-            self.bot.infinity_polling(
-                timeout=20,
-                long_polling_timeout=15,
-                none_stop=True,
-                interval=2
-            )
+            if self.modo == 'webhook' and self.start_webhook():
+                return
+            self.start_polling()
             
         except KeyboardInterrupt:
             print("\n⏹️ Bot detenido por el usuario")
@@ -69,6 +76,34 @@ class RestaurantBot:
             print(f"❌ Error crítico en el bot: {e}")
             self.handle_critical_error(e)
     
+    def start_webhook(self):
+        """Registrar el webhook y servir la ruta; False si hay que usar polling"""
+        clave = receptor_webhook.registrar(self.bot, TELEGRAM_WEBHOOK_URL)
+        if clave is None:
+            print("⚠️ Webhook no disponible, usando polling")
+            return False
+        
+        print(f"🌐 Recibiendo actualizaciones por webhook en {TELEGRAM_WEBHOOK_URL} "
+              f"(escuchando en {TELEGRAM_WEBHOOK_HOST}:{TELEGRAM_WEBHOOK_PORT})")
+        crear_app().run(host=TELEGRAM_WEBHOOK_HOST, port=TELEGRAM_WEBHOOK_PORT, threaded=True)
+        return True
+    
+    def start_polling(self):
+        """Recibir actualizaciones con long polling (modo de respaldo)"""
+        # getUpdates falla mientras haya un webhook registrado. Si el bot se
+        # creó para webhook (threaded=False) los handlers corren en este hilo
+        self.bot.remove_webhook()
+        self.modo = 'polling'
+        
+        # La espera la hace el long polling de Telegram: sin pausa extra
+        # entre consultas las respuestas no se retrasan hasta 2 s
+        self.bot.infinity_polling(
+            timeout=20,
+            long_polling_timeout=15,
+            none_stop=True,
+            interval=0
+        )
+    
     def print_startup_info(self, bot_info):
         """Imprimir información de inicio del bot"""
         print("=" * 60)
@@ -293,6 +328,7 @@ Bot desconectado ❌"""
                 pass
             
             self.bot.stop_polling()
+            conversaciones.cerrar()
             print("✅ Bot detenido correctamente")
         else:
             print("ℹ️ El bot ya estaba detenido")
@@ -308,6 +344,7 @@ Bot desconectado ❌"""
         
         status = {
             "running": self.is_running,
+            "mode": self.modo,
             "uptime": str(uptime).split('.')[0],
             "stats": self.stats.copy(),
             "config": RESTAURANT_CONFIG['nombre']
@@ -0,0 +1,120 @@
+"""
+Datos del restaurante para los textos del bot
+Los textos de contacto, horario, bienvenida y confirmación de reservación
+salían de config.RESTAURANT_CONFIG (el restaurante Giants) aunque el bot
+atendiera a otro restaurante del runner multi-restaurante.
+
+Con la fila del restaurante (bot/tenant_runner.py) se usa su versión vigente
+del caché de restaurantes, de modo que un cambio hecho desde el panel se ve
+sin reiniciar el bot. Sin fila (el bot de un solo restaurante,
+bot/restaurant_bot.py) se usa config.RESTAURANT_CONFIG.
+
+Todos los textos se arman con el mismo dict:
+    nombre, descripcion, direccion, telefono, whatsapp, email
+    horario     líneas "Día: horario" (lista vacía si no está configurado)
+"""
+
+import json
+
+from database.restaurant_cache import restaurant_cache
+
+DIAS = (
+    ('lunes', 'Lunes'),
+    ('martes', 'Martes'),
+    ('miercoles', 'Miércoles'),
+    ('jueves', 'Jueves'),
+    ('viernes', 'Viernes'),
+    ('sabado', 'Sábado'),
+    ('domingo', 'Domingo'),
+)
+
+
+def datos_restaurante(restaurante=None):
+    """Datos para los textos del bot (de la fila del restaurante o de config.py)"""
+    if restaurante is None:
+        return _datos_de_config()
+    vigente = restaurant_cache.get_por_id(restaurante['id']) or restaurante
+    return _datos_de_fila(vigente)
+
+
+def _datos_de_config():
+    from config import RESTAURANT_CONFIG
+
+    contacto = RESTAURANT_CONFIG['contacto']
+    horario = RESTAURANT_CONFIG['horario']
+    return {
+        'nombre': RESTAURANT_CONFIG['nombre'],
+        'descripcion': RESTAURANT_CONFIG.get('descripcion'),
+        'direccion': contacto.get('direccion'),
+        'telefono': contacto.get('telefono'),
+        'whatsapp': contacto.get('whatsapp'),
+        'email': contacto.get('email'),
+        'horario': [
+            f"Lun-Vie: {horario['lunes_viernes']}",
+            f"Sábado: {horario['sabado']}",
+            f"Domingo: {horario['domingo']}",
+        ],
+    }
+
+
+def _datos_de_fila(restaurante):
+    direccion = ', '.join(
+        parte for parte in (restaurante.get('direccion'), restaurante.get('ciudad'),
+                            restaurante.get('estado_republica'))
+        if parte
+    )
+    return {
+        'nombre': restaurante['nombre_restaurante'],
+        'descripcion': restaurante.get('descripcion'),
+        'direccion': direccion or None,
+        'telefono': restaurante.get('telefono'),
+        # No hay columna de WhatsApp: se ofrece el teléfono del restaurante
+        'whatsapp': restaurante.get('telefono'),
+        'email': restaurante.get('email'),
+        'horario': _lineas_horario(restaurante.get('horarios')),
+    }
+
+
+def _lineas_horario(horarios):
+    """Líneas de horario desde la columna JSON horarios (mismo formato que el chat web)"""
+    if isinstance(horarios, str):
+        try:
+            horarios = json.loads(horarios)
+        except ValueError:
+            return []
+    if not horarios:
+        return []
+
+    lineas = []
+    for dia, nombre in DIAS:
+        horario = horarios.get(dia)
+        if horario is None:
+            continue
+        if not horario.get('activo', False):
+            lineas.append(f"{nombre}: Cerrado")
+        elif horario.get('24h', False):
+            lineas.append(f"{nombre}: Abierto 24 horas")
+        else:
+            lineas.append(f"{nombre}: {horario.get('apertura', '09:00')} - {horario.get('cierre', '22:00')}")
+    return lineas
+
+
+def texto_contacto(datos):
+    """Mensaje de /contacto y del botón de contacto"""
+    texto = f"📞 **CONTACTO**\n\n🏨 {datos['nombre']}"
+    if datos['direccion']:
+        texto += f"\n\n📍 Dirección:\n{datos['direccion']}"
+
+    medios = []
+    if datos['telefono']:
+        medios.append(f"📱 Teléfono: {datos['telefono']}")
+    if datos['whatsapp']:
+        medios.append(f"💬 WhatsApp: {datos['whatsapp']}")
+    if datos['email']:
+        medios.append(f"📧 Email: {datos['email']}")
+    if medios:
+        texto += "\n\n" + "\n".join(medios)
+
+    if datos['horario']:
+        texto += "\n\n🕐 Horario:\n" + "\n".join(datos['horario'])
+    return texto
@@ -1,30 +1,67 @@
 from telebot import types
 import random
+import sys
+import threading
 from datetime import datetime, timedelta
 from database.database_multirestaurante import DatabaseManager
+from bot.conversation_store import conversaciones as conversaciones_global, VistaConversaciones
+from bot.callback_codec import codificar
+from bot.restaurant_info import datos_restaurante
+
+# Cantidades que ofrecen los botones de un item (1 a CANTIDAD_MAX_BOTON)
+CANTIDAD_MAX_BOTON = 4
+
+
+def tamano_estimado(objeto, _vistos=None):
+    """Bytes aproximados de un objeto y de todo lo que contiene (dicts, listas, tuplas)"""
+    if _vistos is None:
+        _vistos = set()
+    if id(objeto) in _vistos:
+        return 0
+    _vistos.add(id(objeto))
+
+    tamano = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        for clave, valor in objeto.items():
+            tamano += tamano_estimado(clave, _vistos) + tamano_estimado(valor, _vistos)
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        for valor in objeto:
+            tamano += tamano_estimado(valor, _vistos)
+    return tamano
+
 
 class RestaurantMenuSystem:
-    def __init__(self, restaurante_id=1):
+    def __init__(self, restaurante_id=1, conversaciones=None, restaurante=None):
         """
         Inicializar sistema de menú para un restaurante específico
         Args:
             restaurante_id: ID del restaurante en la base de datos
+            conversaciones: almacén de estado por usuario (default: el de bot/conversation_store.py)
+            restaurante: fila de restaurantes para los textos (default: config.RESTAURANT_CONFIG,
+                ver bot/restaurant_info.py)
         """
         self.restaurante_id = restaurante_id  # ← AGREGADO
-        self.user_states = {}
-        self.user_orders = {}  # Ahora guardará el pedido_id temporal
-        self.user_reservations = {}
+        self.restaurante = restaurante
+        # Vistas tipo dict sobre el almacén de conversaciones (expiran y pueden persistir)
+        self.conversaciones = conversaciones if conversaciones is not None else conversaciones_global
+        self.user_states = VistaConversaciones(self.conversaciones, restaurante_id, 'estado')
+        self.user_orders = VistaConversaciones(self.conversaciones, restaurante_id, 'pedido')  # pedido_id temporal
+        self.user_reservations = VistaConversaciones(self.conversaciones, restaurante_id, 'reservacion')
         self.db = DatabaseManager()
         
-        # Cargar menú desde la base de datos
-        self.menu = self._load_menu_from_db()
+        # El menú se carga de la BD la primera vez que se usa (ver la propiedad menu)
+        self._menu = None
+        self._menu_lock = threading.Lock()
+        self._categorias_por_id = {}  # categoria_id -> código de categoría
+        self._items_por_id = {}       # item_id -> (categoría, código de item)
+        self.tamano_menu = 0  # bytes estimados del menú cargado
         
         # Frases motivacionales del AI
         self.sales_phrases = {
             "bienvenida": [
                 "¡Bienvenido a una experiencia culinaria única! 🌟",
-                "¡Qué alegría tenerte aquí! Prepárate para saborear Giants",
-                "¡Perfecto! Estás a punto de vivir la auténtica experiencia italiana 🇮🇹"
+                "¡Qué alegría tenerte aquí! Prepárate para saborear {nombre}",
+                "¡Perfecto! Estás a punto de vivir una experiencia deliciosa 😋"
             ],
             "recomendaciones": [
                 "¡Excelente elección! Este platillo es uno de nuestros favoritos 👨‍🍳",
@@ -38,40 +75,76 @@ class RestaurantMenuSystem:
             ],
             "urgencia": [
                 "¡Solo quedan pocas porciones de este platillo hoy! ⏰",
-                "¡Este es nuestro último Ossobuco del día! 🔥",
+                "¡Este platillo se agota rápido! 🔥",
                 "¡La promoción termina pronto, no te la pierdas! ⚡"
             ]
         }
 
+    @property
+    def menu(self):
+        """Menú del restaurante, cargado de la base de datos al primer acceso"""
+        if self._menu is None:
+            with self._menu_lock:
+                if self._menu is None:
+                    menu = self._load_menu_from_db()
+                    if menu is None:
+                        # Error de BD: no se guarda, el siguiente uso vuelve a intentar
+                        return {}
+                    self._categorias_por_id = {cat['id']: cat_codigo for cat_codigo, cat in menu.items()}
+                    self._items_por_id = {
+                        item['id']: (cat_codigo, item_codigo)
+                        for cat_codigo, cat in menu.items()
+                        for item_codigo, item in cat['items'].items()
+                    }
+                    self.tamano_menu = tamano_estimado(menu)
+                    self._menu = menu
+        return self._menu
+
+    def get_categoria_por_id(self, categoria_id):
+        """Código de la categoría (los botones llevan el id), None si no existe"""
+        self.menu  # carga el menú y sus índices si hace falta
+        return self._categorias_por_id.get(categoria_id)
+
+    def get_item_por_id(self, item_id):
+        """(categoría, código, datos) del item, None si no existe"""
+        self.menu  # carga el menú y sus índices si hace falta
+        ubicacion = self._items_por_id.get(item_id)
+        if ubicacion is None:
+            return None
+        categoria, item = ubicacion
+        return categoria, item, self.menu[categoria]["items"][item]
+
+    @property
+    def menu_cargado(self):
+        return self._menu is not None
+
     def _load_menu_from_db(self):
-        """Cargar menú desde la base de datos"""
+        """Cargar menú desde la base de datos (None si falla la BD)"""
         menu = {}
         
         try:
-            # ← USAR restaurante_id
-            categorias = self.db.get_categorias_menu(self.restaurante_id)
+            # Categorías, items e ingredientes en 3 consultas en total
+            catalogo = self.db.get_catalogo_completo(self.restaurante_id)
+            if catalogo is None:
+                return None
             
-            for categoria in categorias:
+            for cat_data in catalogo:
+                categoria = cat_data['categoria']
                 cat_codigo = categoria['nombre']
                 menu[cat_codigo] = {
+                    "id": categoria['id'],
                     "nombre": categoria['nombre_display'],
                     "items": {}
                 }
                 
-                # ← USAR restaurante_id
-                items = self.db.get_items_por_categoria(self.restaurante_id, categoria['id'])
-                
-                for item in items:
-                    # Cargar ingredientes
-                    ingredientes = self.db.get_ingredientes_item(item['id'])
-                    
+                for item in cat_data['items']:
                     menu[cat_codigo]["items"][item['codigo']] = {
                         "id": item['id'],
                         "nombre": item['nombre'],
                         "precio": float(item['precio']),
                         "descripcion": item['descripcion'],
                         "tiempo": item['tiempo_preparacion'],
-                        "ingredientes": ingredientes,
+                        "ingredientes": item['ingredientes'],
                         "disponible": bool(item['disponible']),
                         "vegano": bool(item['vegano'])
                     }
@@ -83,16 +156,23 @@ class RestaurantMenuSystem:
             print(f"❌ Error cargando menú: {e}")
             import traceback
             traceback.print_exc()
-            return {}
+            return None
 
     def get_user_state(self, user_id):
         return self.user_states.get(user_id, "inicio")
     
     def set_user_state(self, user_id, state):
-        self.user_states[user_id] = state
+        # "inicio" es el estado por omisión: no ocupa lugar en el almacén
+        if state == "inicio":
+            del self.user_states[user_id]
+        else:
+            self.user_states[user_id] = state
     
     def get_random_phrase(self, category):
-        return random.choice(self.sales_phrases.get(category, ["¡Excelente!"]))
+        frase = random.choice(self.sales_phrases.get(category, ["¡Excelente!"]))
+        if '{nombre}' in frase:
+            frase = frase.replace('{nombre}', datos_restaurante(self.restaurante)['nombre'])
+        return frase
     
     # MENÚS DE NAVEGACIÓN
     def get_main_menu(self):
@@ -100,36 +180,36 @@ class RestaurantMenuSystem:
         markup = types.InlineKeyboardMarkup(row_width=2)
         
         markup.add(
-            types.InlineKeyboardButton("🍽️ Ver Menú", callback_data="ver_menu"),
-            types.InlineKeyboardButton("🛒 Hacer Pedido", callback_data="hacer_pedido")
+            types.InlineKeyboardButton("🍽️ Ver Menú", callback_data=codificar('ver_menu')),
+            types.InlineKeyboardButton("🛒 Hacer Pedido", callback_data=codificar('hacer_pedido'))
         )
         markup.add(
-            types.InlineKeyboardButton("🪑 Reservaciones", callback_data="reservaciones"),
-            types.InlineKeyboardButton("💬 Quejas y Sugerencias", callback_data="quejas")
+            types.InlineKeyboardButton("🪑 Reservaciones", callback_data=codificar('reservaciones')),
+            types.InlineKeyboardButton("💬 Quejas y Sugerencias", callback_data=codificar('quejas'))
         )
         markup.add(
-            types.InlineKeyboardButton("📞 Contacto", callback_data="contacto"),
-            types.InlineKeyboardButton("❓ Ayuda", callback_data="ayuda")
+            types.InlineKeyboardButton("📞 Contacto", callback_data=codificar('contacto')),
+            types.InlineKeyboardButton("❓ Ayuda", callback_data=codificar('ayuda'))
         )
         
         return markup
     
-    def get_menu_categories(self, action_prefix="menu"):
-        """Menú de categorías de comida"""
+    def get_menu_categories(self, accion="categoria"):
+        """Menú de categorías de comida (accion: categoria o categoria_pedido)"""
         markup = types.InlineKeyboardMarkup(row_width=2)
         
         for cat_key, cat_info in self.menu.items():
             btn = types.InlineKeyboardButton(
                 cat_info["nombre"], 
-                callback_data=f"{action_prefix}_{cat_key}"
+                callback_data=codificar(accion, cat_info["id"])
             )
             markup.add(btn)
         
-        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal"))
+        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal')))
         return markup
     
-    def get_category_items(self, categoria, action_prefix="item"):
-        """Menú de items de una categoría"""
+    def get_category_items(self, categoria, accion="item"):
+        """Menú de items de una categoría (accion: item o item_pedido)"""
         if categoria not in self.menu:
             return None
             
@@ -143,18 +223,18 @@ class RestaurantMenuSystem:
             
             btn = types.InlineKeyboardButton(
                 btn_text, 
-                callback_data=f"{action_prefix}_{categoria}_{item_key}"
+                callback_data=codificar(accion, item_info["id"])
             )
             markup.add(btn)
         
         markup.add(
-            types.InlineKeyboardButton("⬅️ Categorías", callback_data="ver_menu"),
-            types.InlineKeyboardButton("🏠 Inicio", callback_data="menu_principal")
+            types.InlineKeyboardButton("⬅️ Categorías", callback_data=codificar('ver_menu')),
+            types.InlineKeyboardButton("🏠 Inicio", callback_data=codificar('menu_principal'))
         )
         
         return markup
     
-    def get_item_detail_menu(self, categoria, item, action_prefix="add_to_order"):
+    def get_item_detail_menu(self, categoria, item):
         """Menú de detalles de un item específico"""
         if categoria not in self.menu or item not in self.menu[categoria]["items"]:
             return None
@@ -164,17 +244,17 @@ class RestaurantMenuSystem:
         
         if item_info["disponible"]:
             markup.add(
-                types.InlineKeyboardButton("1️⃣ Cantidad: 1", callback_data=f"{action_prefix}_{categoria}_{item}_1"),
-                types.InlineKeyboardButton("2️⃣ Cantidad: 2", callback_data=f"{action_prefix}_{categoria}_{item}_2")
+                types.InlineKeyboardButton("1️⃣ Cantidad: 1", callback_data=codificar('agregar_item', item_info['id'], 1)),
+                types.InlineKeyboardButton("2️⃣ Cantidad: 2", callback_data=codificar('agregar_item', item_info['id'], 2))
             )
             markup.add(
-                types.InlineKeyboardButton("3️⃣ Cantidad: 3", callback_data=f"{action_prefix}_{categoria}_{item}_3"),
-                types.InlineKeyboardButton("4️⃣ Cantidad: 4", callback_data=f"{action_prefix}_{categoria}_{item}_4")
+                types.InlineKeyboardButton("3️⃣ Cantidad: 3", callback_data=codificar('agregar_item', item_info['id'], 3)),
+                types.InlineKeyboardButton("4️⃣ Cantidad: 4", callback_data=codificar('agregar_item', item_info['id'], 4))
             )
         
         markup.add(
-            types.InlineKeyboardButton("⬅️ Regresar", callback_data=f"menu_{categoria}"),
-            types.InlineKeyboardButton("🏠 Inicio", callback_data="menu_principal")
+            types.InlineKeyboardButton("⬅️ Regresar", callback_data=codificar('categoria', self.menu[categoria]["id"])),
+            types.InlineKeyboardButton("🏠 Inicio", callback_data=codificar('menu_principal'))
         )
         
         return markup
@@ -184,12 +264,12 @@ class RestaurantMenuSystem:
         markup = types.InlineKeyboardMarkup(row_width=1)
         
         markup.add(
-            types.InlineKeyboardButton("🏠 Para Llevar", callback_data="order_type_takeaway"),
-            types.InlineKeyboardButton("🚗 Delivery a Domicilio", callback_data="order_type_delivery"),
-            types.InlineKeyboardButton("🍽️ Consumir en Restaurante", callback_data="order_type_restaurant")
+            types.InlineKeyboardButton("🏠 Para Llevar", callback_data=codificar('tipo_pedido', 'takeaway')),
+            types.InlineKeyboardButton("🚗 Delivery a Domicilio", callback_data=codificar('tipo_pedido', 'delivery')),
+            types.InlineKeyboardButton("🍽️ Consumir en Restaurante", callback_data=codificar('tipo_pedido', 'restaurant'))
         )
         
-        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal"))
+        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal')))
         return markup
     
     def get_reservations_menu(self):
@@ -197,15 +277,13 @@ class RestaurantMenuSystem:
         markup = types.InlineKeyboardMarkup(row_width=2)
         
         markup.add(
-            types.InlineKeyboardButton("📅 Nueva Reservación", callback_data="new_reservation"),
-            types.InlineKeyboardButton("🔍 Consultar Reservación", callback_data="check_reservation")
-        )
-        markup.add(
-            types.InlineKeyboardButton("✏️ Modificar Reservación", callback_data="modify_reservation"),
-            types.InlineKeyboardButton("❌ Cancelar Reservación", callback_data="cancel_reservation")
+            types.InlineKeyboardButton("📅 Nueva Reservación", callback_data=codificar('nueva_reservacion')),
+            types.InlineKeyboardButton("🔍 Consultar Reservación", callback_data=codificar('consultar_reservacion'))
         )
+        # Modificar/cancelar no tienen flujo en el bot (habría que verificar que la
+        # reservación sea del usuario): por ahora se hace por teléfono o desde el panel
         
-        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal"))
+        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal')))
         return markup
     
     def get_complaints_menu(self):
@@ -213,42 +291,42 @@ class RestaurantMenuSystem:
         markup = types.InlineKeyboardMarkup(row_width=2)
         
         markup.add(
-            types.InlineKeyboardButton("🍽️ Calidad de Comida", callback_data="complaint_food"),
-            types.InlineKeyboardButton("👥 Atención al Cliente", callback_data="complaint_service")
+            types.InlineKeyboardButton("🍽️ Calidad de Comida", callback_data=codificar('tipo_queja', 'food')),
+            types.InlineKeyboardButton("👥 Atención al Cliente", callback_data=codificar('tipo_queja', 'service'))
         )
         markup.add(
-            types.InlineKeyboardButton("⏰ Tiempo de Espera", callback_data="complaint_time"),
-            types.InlineKeyboardButton("🧹 Limpieza e Higiene", callback_data="complaint_hygiene")
+            types.InlineKeyboardButton("⏰ Tiempo de Espera", callback_data=codificar('tipo_queja', 'time')),
+            types.InlineKeyboardButton("🧹 Limpieza e Higiene", callback_data=codificar('tipo_queja', 'hygiene'))
         )
         markup.add(
-            types.InlineKeyboardButton("💰 Precios", callback_data="complaint_price"),
-            types.InlineKeyboardButton("🏢 Instalaciones", callback_data="complaint_facilities")
+            types.InlineKeyboardButton("💰 Precios", callback_data=codificar('tipo_queja', 'price')),
+            types.InlineKeyboardButton("🏢 Instalaciones", callback_data=codificar('tipo_queja', 'facilities'))
         )
         markup.add(
-            types.InlineKeyboardButton("💡 Sugerencia General", callback_data="suggestion_general")
+            types.InlineKeyboardButton("💡 Sugerencia General", callback_data=codificar('tipo_queja', 'general'))
         )
         
-        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal"))
+        markup.add(types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal')))
         return markup
     
     # FORMATEO DE MENSAJES
     def format_welcome_message(self):
         """Mensaje de bienvenida principal"""
         bienvenida = self.get_random_phrase("bienvenida")
+        datos = datos_restaurante(self.restaurante)
+        descripcion = f"\n{datos['descripcion']}\n" if datos['descripcion'] else ""
         
         return f"""{bienvenida}
 
-🍽️ **¡Bienvenido a Restaurante Giants!**
-
-Auténtica cocina italiana con ingredientes frescos y recetas tradicionales de la nonna.
-
+🍽️ **¡Bienvenido a {datos['nombre']}!**
+{descripcion}
 ✨ **¿Qué te apetece hoy?**
 • Ver nuestro delicioso menú
 • Realizar un pedido
 • Hacer una reservación
 • O simplemente conocer más sobre nosotros
 
-¡Estamos aquí para ofrecerte la mejor experiencia culinaria! 🇮🇹"""
+¡Estamos aquí para ofrecerte la mejor experiencia culinaria! 🍽️"""
 
     def format_category_message(self, categoria):
         """Mensaje de una categoría específica"""
@@ -358,21 +436,21 @@ Auténtica cocina italiana con ingredientes frescos y recetas tradicionales de l
             return None
     
     def add_to_order(self, user_id, categoria, item, cantidad):
-        """Agregar item al pedido del usuario"""
+        """Agregar item al pedido del usuario; retorna (agregado, mensaje)"""
         if categoria not in self.menu or item not in self.menu[categoria]["items"]:
-            return "Error: Producto no encontrado"
+            return False, "❌ Producto no encontrado"
         
         item_info = self.menu[categoria]["items"][item]
         
         if not item_info["disponible"]:
-            return "❌ Este producto está temporalmente agotado"
+            return False, "❌ Este producto está temporalmente agotado"
         
         cantidad = int(cantidad)
         precio_total = item_info["precio"] * cantidad
         
         # Verificar si hay un pedido activo
         if user_id not in self.user_orders or 'pedido_id' not in self.user_orders[user_id]:
-            return "❌ Error: No hay un pedido activo. Inicia un pedido primero."
+            return False, "❌ Error: No hay un pedido activo. Inicia un pedido primero."
         
         pedido_id = self.user_orders[user_id]['pedido_id']
         
@@ -385,7 +463,7 @@ Auténtica cocina italiana con ingredientes frescos y recetas tradicionales de l
         )
         
         if not success:
-            return "❌ Error al agregar el producto al pedido"
+            return False, "❌ Error al agregar el producto al pedido"
         
         # Agregar también a la lista temporal para mostrar
         order_item = {
@@ -397,7 +475,13 @@ Auténtica cocina italiana con ingredientes frescos y recetas tradicionales de l
             "precio_total": precio_total
         }
         
-        self.user_orders[user_id]['items'].append(order_item)
+        # El pedido leído puede ser una copia y otro mensaje del usuario puede
+        # cambiarlo a la vez: se agrega bajo el lock de su conversación
+        def agregar_item(pedido):
+            if pedido is not None:
+                pedido['items'].append(order_item)
+            return pedido
+        self.user_orders.modificar(user_id, agregar_item)
         
         upsell = self.get_random_phrase("upselling")
         
@@ -414,7 +498,7 @@ Auténtica cocina italiana con ingredientes frescos y recetas tradicionales de l
         
         message += "¿Qué más te gustaría agregar? 🛒"
         
-        return message
+        return True, message
     
     def get_smart_suggestions(self, categoria, item):
         """Sugerencias inteligentes basadas en el item agregado"""
@@ -460,6 +544,10 @@ Auténtica cocina italiana con ingredientes frescos y recetas tradicionales de l
             del self.user_orders[user_id]
     
     # SISTEMA DE RESERVACIONES CON BASE DE DATOS
+    def actualizar_reservacion(self, user_id, **datos):
+        """Agregar datos a la reservación que está capturando el usuario"""
+        self.user_reservations.modificar(user_id, lambda reservacion: {**(reservacion or {}), **datos})
+    
     def crear_reservacion_db(self, user_id, nombre, telefono, fecha, hora, personas, origen="telegram"):
         """Crear reservación en la base de datos"""
         try:
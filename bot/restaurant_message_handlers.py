@@ -3,17 +3,64 @@
 from database.database_multirestaurante import DatabaseManager
 from telebot import types
 from datetime import datetime
-from bot.restaurant_menu_system import RestaurantMenuSystem
+from bot.restaurant_menu_system import RestaurantMenuSystem, CANTIDAD_MAX_BOTON
+from bot.conversation_store import conversaciones, VistaConversaciones
+from bot.callback_codec import codificar, decodificar
+from bot.restaurant_info import datos_restaurante, texto_contacto
 
 
 class RestaurantMessageHandlers:
-    def __init__(self, bot):
+    def __init__(self, bot, restaurante_id=1, chat_ids=None, menu_systems=None, restaurante=None):
         self.bot = bot
-        self.menu_system = RestaurantMenuSystem()
-        self.waiting_for_input = {}
+        self.restaurante_id = restaurante_id
+        # Fila de restaurantes para los textos (nombre, contacto, horario); sin ella,
+        # config.RESTAURANT_CONFIG (bot de un solo restaurante, ver bot/restaurant_info.py)
+        self.restaurante = restaurante
+        # Con un pool (ver bot/menu_system_pool.py) el sistema de menú se pide en
+        # cada uso y puede desalojarse si el restaurante está inactivo
+        self.menu_systems = menu_systems
+        self._menu_system = None if menu_systems is not None else RestaurantMenuSystem(restaurante_id, restaurante=restaurante)
+        # Chats de cocina/admin que reciben las notificaciones (por defecto los de config.py)
+        if chat_ids is None:
+            from config import CHAT_IDS as chat_ids
+        self.chat_ids = chat_ids
+        # Texto que se espera de cada usuario; expira con el resto de su conversación
+        self.waiting_for_input = VistaConversaciones(conversaciones, restaurante_id, 'esperando')
         self.db = DatabaseManager()  # Base de datos
+        # Acción del callback (ver bot/callback_codec.py) -> método que la atiende
+        self.rutas_callback = {
+            'menu_principal': self.process_main_menu,
+            'ver_menu': self.process_view_menu,
+            'categoria': self.process_category_view,
+            'item': self.process_item_detail,
+            'hacer_pedido': self.process_start_order,
+            'tipo_pedido': self.process_order_type_selection,
+            'categoria_pedido': self.process_order_category,
+            'item_pedido': self.process_order_item,
+            'agregar_item': self.process_add_to_order,
+            'ver_pedido': self.process_view_order,
+            'finalizar_pedido': self.finish_order_process,
+            'cancelar_pedido': self.process_cancel_order,
+            'reservaciones': self.process_reservations_menu,
+            'nueva_reservacion': self.process_new_reservation,
+            'consultar_reservacion': self.process_check_reservation,
+            'quejas': self.process_complaints_menu,
+            'tipo_queja': self.process_complaint_type,
+            'contacto': self.process_contact,
+            'ayuda': self.process_help,
+        }
         self.setup_handlers()
 
+    @property
+    def menu_system(self):
+        if self.menu_systems is not None:
+            return self.menu_systems.get(self.restaurante_id, self.restaurante)
+        return self._menu_system
+
+    @property
+    def datos_restaurante(self):
+        return datos_restaurante(self.restaurante)
+
     def setup_handlers(self):
         """Configurar todos los manejadores de mensajes y callbacks del bot"""
         
@@ -103,24 +150,7 @@ Contacta: +52 961 123 4567"""
         @self.bot.message_handler(commands=['contacto'])
         def show_contact(message):
             """Comando /contacto"""
-            from config import RESTAURANT_CONFIG
-            
-            contact_text = f"""📞 **CONTACTO**
-
-🏨 {RESTAURANT_CONFIG['nombre']}
-
-📍 Dirección:
-{RESTAURANT_CONFIG['contacto']['direccion']}
-
-📱 Teléfono: {RESTAURANT_CONFIG['contacto']['telefono']}
-💬 WhatsApp: {RESTAURANT_CONFIG['contacto']['whatsapp']}
-📧 Email: {RESTAURANT_CONFIG['contacto']['email']}
-
-🕐 Horario:
-Lun-Vie: {RESTAURANT_CONFIG['horario']['lunes_viernes']}
-Sábado: {RESTAURANT_CONFIG['horario']['sabado']}
-Domingo: {RESTAURANT_CONFIG['horario']['domingo']}"""
-
+            contact_text = texto_contacto(self.datos_restaurante)
             markup = self.menu_system.get_main_menu()
             self.bot.send_message(
                 message.chat.id,
@@ -135,83 +165,18 @@ Domingo: {RESTAURANT_CONFIG['horario']['domingo']}"""
         def callback_handler(call):
             """Manejador principal de callbacks"""
             try:
-                user_id = call.from_user.id
-                data = call.data
-                
-                # Menú principal
-                if data == "menu_principal":
-                    self.process_main_menu(call)
-                
-                # Ver menú
-                elif data == "ver_menu":
-                    self.process_view_menu(call)
-                
-                # Categorías del menú
-                elif data.startswith("menu_"):
-                    categoria = data.replace("menu_", "")
-                    self.process_category_view(call, categoria)
-                
-                # Items del menú
-                elif data.startswith("item_"):
-                    parts = data.split("_")
-                    categoria = parts[1]
-                    item = parts[2]
-                    self.process_item_detail(call, categoria, item)
-                
-                # Hacer pedido
-                elif data == "hacer_pedido":
-                    self.process_start_order(call)
-                
-                # Tipo de pedido
-                elif data.startswith("order_type_"):
-                    order_type = data.replace("order_type_", "")
-                    self.process_order_type_selection(call, order_type)
-                
-                # Agregar al pedido
-                elif data.startswith("add_to_order_"):
-                    parts = data.split("_")
-                    categoria = parts[3]
-                    item = parts[4]
-                    cantidad = parts[5]
-                    self.process_add_to_order(call, categoria, item, cantidad)
+                decodificado = decodificar(call.data)
+                if decodificado is None:
+                    # Botón de un mensaje anterior al formato actual o de un menú que ya cambió
+                    self.bot.answer_callback_query(call.id, "Este menú ya no está vigente, escribe /start")
+                    return
                 
-                # Categorías para ordenar
-                elif data.startswith("order_"):
-                    categoria = data.replace("order_", "")
-                    self.process_order_category(call, categoria)
-                
-                # Ver resumen del pedido
-                elif data == "ver_pedido":
-                    self.process_view_order(call)
-                
-                # Finalizar pedido
-                elif data == "finalizar_pedido":
-                    self.finish_order_process(call)
-                
-                # Reservaciones
-                elif data == "reservaciones":
-                    self.process_reservations_menu(call)
-                
-                elif data == "new_reservation":
-                    self.process_new_reservation(call)
-                
-                elif data == "check_reservation":
-                    self.process_check_reservation(call)
-                
-                # Quejas y sugerencias
-                elif data == "quejas":
-                    self.process_complaints_menu(call)
-                
-                elif data.startswith("complaint_") or data.startswith("suggestion_"):
-                    self.process_complaint_type(call, data)
-                
-                # Contacto
-                elif data == "contacto":
-                    self.process_contact(call)
-                
-                # Ayuda
-                elif data == "ayuda":
-                    self.process_help(call)
+                accion, args = decodificado
+                ruta = self.rutas_callback.get(accion)
+                if ruta is None:
+                    self.bot.answer_callback_query(call.id, "Opción no disponible por ahora")
+                    return
+                ruta(call, *args)
                 
                 # Responder al callback
                 self.bot.answer_callback_query(call.id)
@@ -310,7 +275,7 @@ Domingo: {RESTAURANT_CONFIG['horario']['domingo']}"""
         message += f"\n\n📋 Pedido #{pedido['numero_pedido']}"
         message += "\n\n🍽️ Ahora selecciona tus platillos favoritos:"
         
-        markup = self.menu_system.get_menu_categories("order")
+        markup = self.menu_system.get_menu_categories("categoria_pedido")
         
         self.bot.edit_message_text(
             message,
@@ -334,6 +299,7 @@ Domingo: {RESTAURANT_CONFIG['horario']['domingo']}"""
         self.db.actualizar_estado_pedido(pedido_id, 'confirmado')
         
         order_text, total = self.menu_system.get_order_summary(user_id)
+        datos = self.datos_restaurante
         
         confirmation_text = f"""✅ ¡Pedido Confirmado!
 
@@ -349,9 +315,9 @@ Próximos pasos:
 3️⃣ Prepararemos tu deliciosa comida
 4️⃣ ¡Te notificaremos cuando esté listo!
 
-📞 Contacto: +52 961 123 4567
+📞 Contacto: {datos['telefono'] or datos['nombre']}
 
-¡Que disfrutes tu experiencia italiana!"""
+¡Que disfrutes tu comida!"""
         
         # Limpiar pedido temporal del usuario
         self.menu_system.limpiar_pedido(user_id)
@@ -371,7 +337,7 @@ Próximos pasos:
     def notify_new_order_db(self, pedido_id, user_info):
         """Notificar nuevo pedido usando datos de la base de datos"""
         try:
-            from config import CHAT_IDS
+            CHAT_IDS = self.chat_ids
             
             # Obtener datos del pedido
             pedido = self.db.get_pedido(pedido_id)
@@ -427,7 +393,7 @@ Próximos pasos:
             return
         
         # Guardar número de personas
-        self.menu_system.user_reservations[user_id]["people"] = people_count
+        self.menu_system.actualizar_reservacion(user_id, people=people_count)
         
         # Crear reservación en la base de datos
         reservacion_data = self.menu_system.user_reservations[user_id]
@@ -446,6 +412,7 @@ Próximos pasos:
             self.bot.reply_to(message, "❌ Error al crear la reservación. Por favor intenta de nuevo.")
             return
         
+        datos = self.datos_restaurante
         confirmation_text = f"""✅ ¡Reservación Confirmada!
 
 🎫 Código: {reservacion['codigo_reservacion']}
@@ -459,14 +426,14 @@ Información importante:
 • Llega 10 minutos antes de tu reservación
 • Presenta este código al llegar
 • Tolerancia máxima: 15 minutos
-• Para cambios, contacta: +52 961 123 4567
+• Para cambios, contacta: {datos['telefono'] or 'el restaurante'}
 
-¡Te esperamos en Giants! 🇮🇹"""
+¡Te esperamos en {datos['nombre']}!"""
         
         markup = types.InlineKeyboardMarkup(row_width=1)
         markup.add(
-            types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal"),
-            types.InlineKeyboardButton("🍽️ Ver Menú", callback_data="ver_menu")
+            types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal')),
+            types.InlineKeyboardButton("🍽️ Ver Menú", callback_data=codificar('ver_menu'))
         )
         
         self.bot.reply_to(message, confirmation_text, reply_markup=markup)
@@ -483,7 +450,7 @@ Información importante:
     def notify_new_reservation_db(self, reservacion):
         """Notificar nueva reservación usando datos de la base de datos"""
         try:
-            from config import CHAT_IDS
+            CHAT_IDS = self.chat_ids
             
             admin_message = f"""🪑 NUEVA RESERVACIÓN
 
@@ -544,8 +511,8 @@ Solo menciona el código: FELIZ15
         
         markup = types.InlineKeyboardMarkup(row_width=1)
         markup.add(
-            types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal"),
-            types.InlineKeyboardButton("🛒 Hacer Pedido", callback_data="hacer_pedido")
+            types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal')),
+            types.InlineKeyboardButton("🛒 Hacer Pedido", callback_data=codificar('hacer_pedido'))
         )
         
         self.bot.reply_to(message, response_text, reply_markup=markup)
@@ -560,7 +527,7 @@ Solo menciona el código: FELIZ15
     def notify_new_complaint_db(self, complaint_id, complaint_type, complaint_text, user_info):
         """Notificar nueva queja"""
         try:
-            from config import CHAT_IDS
+            CHAT_IDS = self.chat_ids
             
             admin_message = f"""💬 NUEVA QUEJA/SUGERENCIA
 
@@ -611,10 +578,15 @@ Descripción:
             parse_mode='Markdown'
         )
 
-    def process_category_view(self, call, categoria):
+    def process_category_view(self, call, categoria_id):
         """Mostrar items de una categoría"""
-        items_text = self.menu_system.format_category_items(categoria)
-        markup = self.menu_system.get_category_items_menu(categoria)
+        categoria = self.menu_system.get_categoria_por_id(categoria_id)
+        if categoria is None:
+            self.bot.answer_callback_query(call.id, "❌ Categoría no encontrada")
+            return
+        
+        items_text = self.menu_system.format_category_message(categoria)
+        markup = self.menu_system.get_category_items(categoria)
         
         self.bot.edit_message_text(
             items_text,
@@ -624,13 +596,14 @@ Descripción:
             parse_mode='Markdown'
         )
 
-    def process_item_detail(self, call, categoria, item):
+    def process_item_detail(self, call, item_id):
         """Mostrar detalle de un item"""
-        item_data = self.menu_system.get_item_data(categoria, item)
+        encontrado = self.menu_system.get_item_por_id(item_id)
         
-        if not item_data:
+        if not encontrado:
             self.bot.answer_callback_query(call.id, "❌ Item no encontrado")
             return
+        categoria, item, item_data = encontrado
         
         detail_text = f"""🍽️ **{item_data['nombre']}**
 
@@ -645,9 +618,9 @@ Descripción:
         markup.add(
             types.InlineKeyboardButton(
                 f"🔙 Volver a {categoria.title()}", 
-                callback_data=f"menu_{categoria}"
+                callback_data=codificar('categoria', self.menu_system.menu[categoria]["id"])
             ),
-            types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal")
+            types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal'))
         )
         
         self.bot.edit_message_text(
@@ -672,12 +645,16 @@ Descripción:
             parse_mode='Markdown'
         )
 
-    def process_order_category(self, call, categoria):
+    def process_order_category(self, call, categoria_id):
         """Mostrar items de una categoría para ordenar"""
         user_id = call.from_user.id
+        categoria = self.menu_system.get_categoria_por_id(categoria_id)
+        if categoria is None:
+            self.bot.answer_callback_query(call.id, "❌ Categoría no encontrada")
+            return
         
-        items_text = self.menu_system.format_category_items(categoria, for_order=True)
-        markup = self.menu_system.get_order_items_menu(categoria)
+        items_text = self.menu_system.format_category_message(categoria)
+        markup = self.menu_system.get_category_items(categoria, "item_pedido")
         
         # Agregar botón para ver pedido actual si hay items
         if user_id in self.menu_system.user_orders and self.menu_system.user_orders[user_id].get('items'):
@@ -692,30 +669,54 @@ Descripción:
             parse_mode='Markdown'
         )
 
-    def process_add_to_order(self, call, categoria, item, cantidad):
+    def process_order_item(self, call, item_id):
+        """Mostrar un item con las cantidades para agregarlo al pedido"""
+        encontrado = self.menu_system.get_item_por_id(item_id)
+        if not encontrado:
+            self.bot.answer_callback_query(call.id, "❌ Item no encontrado")
+            return
+        categoria, item, item_data = encontrado
+        
+        self.bot.edit_message_text(
+            self.menu_system.format_item_detail_message(categoria, item),
+            call.message.chat.id,
+            call.message.message_id,
+            reply_markup=self.menu_system.get_item_detail_menu(categoria, item),
+            parse_mode='Markdown'
+        )
+
+    def process_add_to_order(self, call, item_id, cantidad):
         """Agregar item al pedido"""
         user_id = call.from_user.id
-        cantidad = int(cantidad)
+        
+        # callback_data lo arma el cliente: solo las cantidades que ofrecen los botones
+        if not 1 <= cantidad <= CANTIDAD_MAX_BOTON:
+            self.bot.answer_callback_query(call.id, "❌ Cantidad no válida")
+            return
         
         # Verificar que el usuario tenga un pedido iniciado
         if user_id not in self.menu_system.user_orders or 'pedido_id' not in self.menu_system.user_orders[user_id]:
             self.bot.answer_callback_query(call.id, "❌ Primero selecciona el tipo de pedido")
             return
         
-        # Agregar item al pedido
-        success = self.menu_system.add_item_to_order(user_id, categoria, item, cantidad)
+        encontrado = self.menu_system.get_item_por_id(item_id)
+        if not encontrado:
+            self.bot.answer_callback_query(call.id, "❌ Item no encontrado")
+            return
+        categoria, item, item_data = encontrado
         
-        if success:
-            item_data = self.menu_system.get_item_data(categoria, item)
+        agregado, mensaje = self.menu_system.add_to_order(user_id, categoria, item, cantidad)
+        
+        if agregado:
             self.bot.answer_callback_query(
                 call.id, 
                 f"✅ {cantidad}x {item_data['nombre']} agregado"
             )
             
             # Actualizar vista
-            self.process_order_category(call, categoria)
+            self.process_order_category(call, self.menu_system.menu[categoria]["id"])
         else:
-            self.bot.answer_callback_query(call.id, "❌ Error al agregar item")
+            self.bot.answer_callback_query(call.id, mensaje)
 
     def process_view_order(self, call):
         """Ver resumen del pedido actual"""
@@ -738,10 +739,10 @@ Pedido #{numero_pedido}
         
         markup = types.InlineKeyboardMarkup(row_width=1)
         markup.add(
-            types.InlineKeyboardButton("✅ Finalizar Pedido", callback_data="finalizar_pedido"),
-            types.InlineKeyboardButton("➕ Agregar más items", callback_data="hacer_pedido"),
-            types.InlineKeyboardButton("🗑️ Cancelar Pedido", callback_data="cancelar_pedido"),
-            types.InlineKeyboardButton("🏠 Menú Principal", callback_data="menu_principal")
+            types.InlineKeyboardButton("✅ Finalizar Pedido", callback_data=codificar('finalizar_pedido')),
+            types.InlineKeyboardButton("➕ Agregar más items", callback_data=codificar('hacer_pedido')),
+            types.InlineKeyboardButton("🗑️ Cancelar Pedido", callback_data=codificar('cancelar_pedido')),
+            types.InlineKeyboardButton("🏠 Menú Principal", callback_data=codificar('menu_principal'))
         )
         
         self.bot.edit_message_text(
@@ -752,6 +753,28 @@ Pedido #{numero_pedido}
             parse_mode='Markdown'
         )
 
+    def process_cancel_order(self, call):
+        """Cancelar el pedido en curso (solo si sigue pendiente)"""
+        user_id = call.from_user.id
+        pedido = self.menu_system.user_orders.get(user_id)
+        
+        if not pedido or not pedido.get('pedido_id'):
+            self.bot.answer_callback_query(call.id, "❌ No tienes un pedido en curso")
+            return
+        
+        # Un pedido ya finalizado no está 'pendiente' y no se toca
+        self.db.cancelar_pedido_abandonado(pedido['pedido_id'])
+        self.menu_system.limpiar_pedido(user_id)
+        
+        self.bot.edit_message_text(
+            f"🗑️ **PEDIDO CANCELADO**\n\nEl pedido #{pedido.get('numero_pedido', 'N/A')} fue cancelado.\n"
+            "¿Te podemos ayudar en algo más?",
+            call.message.chat.id,
+            call.message.message_id,
+            reply_markup=self.menu_system.get_main_menu(),
+            parse_mode='Markdown'
+        )
+
     def process_reservations_menu(self, call):
         """Mostrar menú de reservaciones"""
         markup = self.menu_system.get_reservations_menu()
@@ -788,7 +811,7 @@ Pedido #{numero_pedido}
             self.bot.reply_to(message, "❌ Por favor ingresa un nombre válido (mínimo 3 caracteres)")
             return
         
-        self.menu_system.user_reservations[user_id]["name"] = name
+        self.menu_system.actualizar_reservacion(user_id, name=name)
         self.waiting_for_input[user_id] = {"type": "reservation_phone", "step": "phone"}
         
         self.bot.reply_to(message, "📱 Ahora ingresa tu número de teléfono (10 dígitos):")
@@ -803,7 +826,7 @@ Pedido #{numero_pedido}
             self.bot.reply_to(message, "❌ Por favor ingresa un número válido de 10 dígitos")
             return
         
-        self.menu_system.user_reservations[user_id]["phone"] = phone
+        self.menu_system.actualizar_reservacion(user_id, phone=phone)
         self.waiting_for_input[user_id] = {"type": "reservation_date", "step": "date"}
         
         self.bot.reply_to(
@@ -825,7 +848,7 @@ Pedido #{numero_pedido}
                 self.bot.reply_to(message, "❌ La fecha debe ser futura")
                 return
             
-            self.menu_system.user_reservations[user_id]["date"] = date
+            self.menu_system.actualizar_reservacion(user_id, date=date)
             self.waiting_for_input[user_id] = {"type": "reservation_time", "step": "time"}
             
             self.bot.reply_to(
@@ -853,7 +876,7 @@ Pedido #{numero_pedido}
                 )
                 return
             
-            self.menu_system.user_reservations[user_id]["time"] = time_obj
+            self.menu_system.actualizar_reservacion(user_id, time=time_obj)
             self.waiting_for_input[user_id] = {"type": "reservation_people", "step": "people"}
             
             self.bot.reply_to(message, "👥 ¿Para cuántas personas? (1-8)")
@@ -876,10 +899,10 @@ Pedido #{numero_pedido}
         """Mostrar menú de quejas y sugerencias"""
         markup = types.InlineKeyboardMarkup(row_width=1)
         markup.add(
-            types.InlineKeyboardButton("😞 Tengo una queja", callback_data="complaint_queja"),
-            types.InlineKeyboardButton("💡 Tengo una sugerencia", callback_data="suggestion_sugerencia"),
-            types.InlineKeyboardButton("📝 Comentario general", callback_data="complaint_comentario"),
-            types.InlineKeyboardButton("🔙 Menú Principal", callback_data="menu_principal")
+            types.InlineKeyboardButton("😞 Tengo una queja", callback_data=codificar('tipo_queja', 'queja')),
+            types.InlineKeyboardButton("💡 Tengo una sugerencia", callback_data=codificar('tipo_queja', 'sugerencia')),
+            types.InlineKeyboardButton("📝 Comentario general", callback_data=codificar('tipo_queja', 'comentario')),
+            types.InlineKeyboardButton("🔙 Menú Principal", callback_data=codificar('menu_principal'))
         )
         
         self.bot.edit_message_text(
@@ -890,16 +913,10 @@ Pedido #{numero_pedido}
             parse_mode='Markdown'
         )
 
-    def process_complaint_type(self, call, complaint_type):
+    def process_complaint_type(self, call, tipo):
         """Procesar tipo de queja/sugerencia"""
         user_id = call.from_user.id
         
-        # Extraer el tipo
-        if complaint_type.startswith("complaint_"):
-            tipo = complaint_type.replace("complaint_", "")
-        else:
-            tipo = complaint_type.replace("suggestion_", "")
-        
         self.waiting_for_input[user_id] = {
             "type": "complaint_description",
             "complaint_type": tipo
@@ -919,24 +936,7 @@ Pedido #{numero_pedido}
 
     def process_contact(self, call):
         """Mostrar información de contacto"""
-        from config import RESTAURANT_CONFIG
-        
-        contact_text = f"""📞 **CONTACTO**
-
-🏨 {RESTAURANT_CONFIG['nombre']}
-
-📍 Dirección:
-{RESTAURANT_CONFIG['contacto']['direccion']}
-
-📱 Teléfono: {RESTAURANT_CONFIG['contacto']['telefono']}
-💬 WhatsApp: {RESTAURANT_CONFIG['contacto']['whatsapp']}
-📧 Email: {RESTAURANT_CONFIG['contacto']['email']}
-
-🕐 Horario:
-Lun-Vie: {RESTAURANT_CONFIG['horario']['lunes_viernes']}
-Sábado: {RESTAURANT_CONFIG['horario']['sabado']}
-Domingo: {RESTAURANT_CONFIG['horario']['domingo']}"""
-
+        contact_text = texto_contacto(self.datos_restaurante)
         markup = self.menu_system.get_main_menu()
         
         self.bot.edit_message_text(
@@ -0,0 +1,93 @@
+"""
+Pool de clientes de Telegram por restaurante
+Evita leer la configuración de Telegram de MySQL y construir un TeleBot
+nuevo en cada notificación: se guarda un cliente por bot_token y la
+configuración de cada restaurante con un TTL corto.
+
+El panel admin corre en otro proceso y no comparte este pool: un cambio
+de token o de chats desde /configuracion/telegram se toma al vencer el TTL
+(a lo más TELEGRAM_CONFIG_TTL segundos), o de inmediato si Telegram rechaza
+el token anterior (401/404, ver NotificationDispatcher).
+
+Configuración por variables de entorno:
+    TELEGRAM_CONFIG_TTL    segundos que se reutiliza la configuración (default: 60)
+"""
+
+import os
+import threading
+import time
+
+import telebot
+
+from database.database_multirestaurante import DatabaseManager
+
+TELEGRAM_CONFIG_TTL = float(os.getenv('TELEGRAM_CONFIG_TTL', 60))
+
+
+class TelegramClientPool:
+    """Clientes TeleBot por token y configuración de Telegram por restaurante"""
+
+    def __init__(self, ttl=TELEGRAM_CONFIG_TTL):
+        self.ttl = ttl
+        self._clientes = {}   # bot_token -> TeleBot
+        self._configs = {}    # restaurante_id -> (config, expira_en)
+        self._lock = threading.Lock()
+        self.stats = {'clientes_creados': 0, 'config_hits': 0, 'config_lecturas': 0}
+
+    def get_cliente(self, bot_token):
+        """Cliente reutilizable para un token"""
+        with self._lock:
+            cliente = self._clientes.get(bot_token)
+            if cliente is None:
+                # threaded=False: solo se usa para enviar, no hace falta el
+                # pool de hilos que TeleBot crea por instancia. La sesión HTTP
+                # (keep-alive a api.telegram.org) la comparte telebot.apihelper.
+                cliente = telebot.TeleBot(bot_token, threaded=False)
+                self._clientes[bot_token] = cliente
+                self.stats['clientes_creados'] += 1
+            return cliente
+
+    def get_config(self, restaurante_id):
+        """Configuración de Telegram del restaurante (ver DatabaseManager.get_config_telegram)"""
+        ahora = time.monotonic()
+        entrada = self._configs.get(restaurante_id)
+        if entrada is not None and entrada[1] > ahora:
+            self.stats['config_hits'] += 1
+            return entrada[0]
+
+        config = DatabaseManager.get_config_telegram(restaurante_id)
+        self.stats['config_lecturas'] += 1
+
+        with self._lock:
+            anterior = self._configs.get(restaurante_id)
+            if config is not None:
+                self._configs[restaurante_id] = (config, ahora + self.ttl)
+            if anterior and (config is None or anterior[0].get('bot_token') != config.get('bot_token')):
+                self._descartar_token(anterior[0].get('bot_token'))
+        return config
+
+    def get_para_restaurante(self, restaurante_id):
+        """Retorna (cliente, config); cliente es None si no hay bot_token"""
+        config = self.get_config(restaurante_id)
+        if not config or not config.get('bot_token'):
+            return None, config
+        return self.get_cliente(config['bot_token']), config
+
+    def invalidar(self, restaurante_id):
+        """Olvidar la configuración en este proceso (p. ej. si Telegram rechaza el token)"""
+        with self._lock:
+            entrada = self._configs.pop(restaurante_id, None)
+            if entrada:
+                self._descartar_token(entrada[0].get('bot_token'))
+
+    def _descartar_token(self, bot_token):
+        # Solo si ningún otro restaurante usa el mismo token
+        if not bot_token:
+            return
+        en_uso = any(config.get('bot_token') == bot_token for config, _ in self._configs.values())
+        if not en_uso:
+            self._clientes.pop(bot_token, None)
+
+
+# Instancia global
+telegram_clients = TelegramClientPool()
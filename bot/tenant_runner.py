@@ -0,0 +1,223 @@
+"""
+Runner multi-restaurante: todos los bots de Telegram en un solo proceso
+bot/restaurant_bot.py atiende un único bot (BOT_TOKEN de config.py) para el
+restaurante 1. Este runner lee de la BD los restaurantes activos con
+bot_token y crea para cada uno su TeleBot con su propio
+RestaurantMessageHandlers (chats de notificación del restaurante). Los
+menús y conversaciones en curso se piden al pool de bot/menu_system_pool.py,
+que solo mantiene cargados los restaurantes con actividad reciente.
+
+La lista se vuelve a leer cada BOT_TENANTS_SYNC segundos (o al recibir
+SIGHUP): los restaurantes nuevos se agregan, los desactivados o sin token
+se quitan y un cambio de token reinicia solo ese bot, sin reiniciar el
+proceso.
+
+Con TELEGRAM_WEBHOOK_URL todos los bots comparten la app Flask del webhook
+(ver bot/webhook.py); sin ella, o si Telegram rechaza el webhook de un bot,
+ese bot usa long polling en su propio hilo.
+
+Uso:
+    python -m bot.tenant_runner
+
+Configuración por variables de entorno:
+    BOT_TENANTS_SYNC    segundos entre lecturas de la lista de restaurantes (default: 60)
+    (más las TELEGRAM_WEBHOOK_* de bot/webhook.py, las BOT_MENU_* de bot/menu_system_pool.py
+    y las BOT_ESTADO_* de bot/conversation_store.py)
+"""
+
+import os
+import signal
+import sys
+import threading
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telebot
+
+from database.database_multirestaurante import DatabaseManager
+from bot.conversation_store import conversaciones
+from bot.menu_system_pool import pool_menus
+from bot.restaurant_message_handlers import RestaurantMessageHandlers
+from bot.webhook import (receptor_webhook, crear_app, clave_bot, TELEGRAM_WEBHOOK_URL,
+                         TELEGRAM_WEBHOOK_HOST, TELEGRAM_WEBHOOK_PORT)
+
+BOT_TENANTS_SYNC = float(os.getenv('BOT_TENANTS_SYNC', 60))
+
+
+def chat_ids_de(restaurante):
+    """Chats de notificación del restaurante con las claves que usan los handlers"""
+    chat_ids = {}
+    if restaurante.get('telegram_group_id'):
+        chat_ids['cocina'] = restaurante['telegram_group_id']
+    if restaurante.get('telegram_admin_id'):
+        chat_ids['admin'] = restaurante['telegram_admin_id']
+    return chat_ids
+
+
+class _BotRestaurante:
+    """Bot en ejecución de un restaurante"""
+
+    __slots__ = ('restaurante_id', 'nombre', 'bot_token', 'bot', 'handlers', 'modo', 'hilo')
+
+    def __init__(self, restaurante, bot, handlers, modo, hilo=None):
+        self.restaurante_id = restaurante['id']
+        self.nombre = restaurante['nombre_restaurante']
+        self.bot_token = restaurante['bot_token']
+        self.bot = bot
+        self.handlers = handlers
+        self.modo = modo
+        self.hilo = hilo
+
+
+class TenantBotRunner:
+    """Mantiene un bot por restaurante activo y los sincroniza con la BD"""
+
+    def __init__(self, url_webhook=TELEGRAM_WEBHOOK_URL, intervalo_sync=BOT_TENANTS_SYNC):
+        self.url_webhook = url_webhook
+        self.intervalo_sync = intervalo_sync
+        self._bots = {}         # restaurante_id -> _BotRestaurante
+        self._lock = threading.RLock()
+        self._detener = threading.Event()
+        self._sincronizar_ya = threading.Event()
+        self.stats = {'sincronizaciones': 0, 'agregados': 0, 'quitados': 0, 'errores': 0}
+
+    # ---------- Restaurantes ----------
+
+    def sincronizar(self):
+        """Igualar los bots en ejecución con los restaurantes activos de la BD"""
+        restaurantes = DatabaseManager.get_restaurantes_con_bot()
+        self.stats['sincronizaciones'] += 1
+        if restaurantes is None:
+            # Sin BD se siguen atendiendo los bots que ya corren
+            self.stats['errores'] += 1
+            return False
+
+        deseados = {r['id']: r for r in restaurantes}
+        with self._lock:
+            for restaurante_id, actual in list(self._bots.items()):
+                restaurante = deseados.get(restaurante_id)
+                if restaurante is None or restaurante['bot_token'] != actual.bot_token:
+                    self.quitar(restaurante_id)
+                else:
+                    # Los chats de notificación se actualizan sin reiniciar el bot
+                    actual.handlers.chat_ids = chat_ids_de(restaurante)
+
+            for restaurante_id, restaurante in deseados.items():
+                if restaurante_id not in self._bots:
+                    self.agregar(restaurante)
+        return True
+
+    def agregar(self, restaurante):
+        """Arrancar el bot de un restaurante (fila de get_restaurantes_con_bot)"""
+        with self._lock:
+            if restaurante['id'] in self._bots:
+                return self._bots[restaurante['id']]
+            try:
+                ejecucion = self._arrancar(restaurante)
+            except Exception as e:
+                self.stats['errores'] += 1
+                print(f"❌ No se pudo iniciar el bot de {restaurante['nombre_restaurante']}: {e}")
+                return None
+            self._bots[restaurante['id']] = ejecucion
+            self.stats['agregados'] += 1
+            print(f"✅ Bot de {ejecucion.nombre} (restaurante {ejecucion.restaurante_id}) activo por {ejecucion.modo}")
+            return ejecucion
+
+    def _arrancar(self, restaurante):
+        usar_webhook = bool(self.url_webhook)
+        # Con webhook los handlers corren en los hilos del receptor (ver RestaurantBot)
+        bot = telebot.TeleBot(restaurante['bot_token'], threaded=not usar_webhook)
+        handlers = RestaurantMessageHandlers(bot, restaurante['id'], chat_ids_de(restaurante), pool_menus,
+                                             restaurante=restaurante)
+
+        if usar_webhook and receptor_webhook.registrar(bot, self.url_webhook) is not None:
+            return _BotRestaurante(restaurante, bot, handlers, 'webhook')
+
+        # Long polling en un hilo propio; getUpdates falla si hay un webhook registrado
+        bot.remove_webhook()
+        hilo = threading.Thread(
+            target=bot.infinity_polling,
+            kwargs={'timeout': 20, 'long_polling_timeout': 15, 'interval': 0},
+            name=f"bot-{restaurante['id']}",
+            daemon=True
+        )
+        hilo.start()
+        return _BotRestaurante(restaurante, bot, handlers, 'polling', hilo)
+
+    def quitar(self, restaurante_id):
+        """Detener el bot de un restaurante"""
+        with self._lock:
+            ejecucion = self._bots.pop(restaurante_id, None)
+        if ejecucion is None:
+            return False
+
+        if ejecucion.modo == 'webhook':
+            # Sin webhook Telegram guarda las actualizaciones hasta que otro proceso las pida
+            receptor_webhook.quitar(clave_bot(ejecucion.bot_token), borrar_webhook=True)
+        else:
+            ejecucion.bot.stop_polling()
+        self.stats['quitados'] += 1
+        print(f"⏹️ Bot de {ejecucion.nombre} (restaurante {restaurante_id}) detenido")
+        return True
+
+    def get_estado(self):
+        with self._lock:
+            bots = [{'restaurante_id': e.restaurante_id, 'nombre': e.nombre, 'modo': e.modo}
+                    for e in self._bots.values()]
+        return {'bots': bots, 'stats': dict(self.stats), 'menus': pool_menus.get_metricas(),
+                'conversaciones': {**conversaciones.stats, 'registros': len(conversaciones)}}
+
+    # ---------- Ejecución ----------
+
+    def solicitar_sincronizacion(self):
+        """Sincronizar en cuanto sea posible (p. ej. tras dar de alta un restaurante)"""
+        self._sincronizar_ya.set()
+
+    def _bucle_sincronizacion(self):
+        while not self._detener.is_set():
+            self._sincronizar_ya.wait(self.intervalo_sync)
+            self._sincronizar_ya.clear()
+            if self._detener.is_set():
+                break
+            try:
+                self.sincronizar()
+            except Exception as e:
+                self.stats['errores'] += 1
+                print(f"⚠️ Error sincronizando bots: {e}")
+
+    def iniciar(self):
+        """Arrancar todos los bots y mantenerlos sincronizados (bloquea)"""
+        self.sincronizar()
+        threading.Thread(target=self._bucle_sincronizacion, name='bots-sync', daemon=True).start()
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda *_: self.solicitar_sincronizacion())
+
+        print(f"🚀 {len(self._bots)} bot(s) en ejecución. Presiona Ctrl+C para detener")
+        try:
+            if self.url_webhook:
+                crear_app().run(host=TELEGRAM_WEBHOOK_HOST, port=TELEGRAM_WEBHOOK_PORT, threaded=True)
+            else:
+                self._detener.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.detener()
+
+    def detener(self):
+        self._detener.set()
+        self._sincronizar_ya.set()
+        with self._lock:
+            for ejecucion in self._bots.values():
+                if ejecucion.modo == 'polling':
+                    ejecucion.bot.stop_polling()
+        conversaciones.cerrar()
+
+
+def main():
+    print("🍽️ Iniciando bots de todos los restaurantes...")
+    TenantBotRunner().iniciar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Recepción de actualizaciones de Telegram por webhook
+En lugar de que cada bot consulte getUpdates en un bucle (infinity_polling,
+con hasta `interval` segundos de espera entre consultas y un proceso por
+bot), Telegram envía cada actualización a una ruta Flask:
+
+    POST /telegram/webhook/<clave>
+
+- <clave> es el id numérico del bot (la parte pública del token), así la
+  URL no expone el token y varios bots comparten la misma app.
+- Telegram manda en el header X-Telegram-Bot-Api-Secret-Token el secreto
+  que se registró con setWebhook; si no coincide se responde 403.
+- La ruta solo encola la actualización y responde de inmediato. Unos pocos
+  hilos la procesan con los handlers registrados en el TeleBot; las de un
+  mismo chat van siempre al mismo hilo, así que se atienden en orden.
+- Si la cola de ese hilo está llena se responde 503 y Telegram reintenta.
+
+registrar_rutas(app) agrega la ruta a cualquier app Flask; crear_app()
+crea una propia para el proceso del bot (ver bot/restaurant_bot.py, que
+vuelve a polling si no hay URL pública o setWebhook falla).
+
+Configuración por variables de entorno:
+    TELEGRAM_WEBHOOK_URL       URL pública base, p. ej. https://bot.midominio.com (sin ella: polling)
+    TELEGRAM_WEBHOOK_SECRET    clave para derivar el secreto de cada bot (default: solo el token)
+    TELEGRAM_WEBHOOK_HOST      interfaz del servidor Flask del bot (default: 0.0.0.0)
+    TELEGRAM_WEBHOOK_PORT      puerto del servidor Flask del bot (default: $PORT o 8443)
+    TELEGRAM_WEBHOOK_WORKERS   hilos que procesan actualizaciones (default: 4)
+    TELEGRAM_WEBHOOK_COLA      actualizaciones en espera por hilo antes de responder 503 (default: 500)
+"""
+
+import hashlib
+import hmac
+import os
+import queue
+import threading
+from collections import deque
+
+from flask import Flask, request, jsonify
+from telebot import types
+
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+TELEGRAM_WEBHOOK_HOST = os.getenv('TELEGRAM_WEBHOOK_HOST', '0.0.0.0')
+TELEGRAM_WEBHOOK_PORT = int(os.getenv('TELEGRAM_WEBHOOK_PORT', os.getenv('PORT', 8443)))
+TELEGRAM_WEBHOOK_WORKERS = int(os.getenv('TELEGRAM_WEBHOOK_WORKERS', 4))
+TELEGRAM_WEBHOOK_COLA = int(os.getenv('TELEGRAM_WEBHOOK_COLA', 500))
+
+RUTA_WEBHOOK = '/telegram/webhook'
+HEADER_SECRETO = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Telegram reenvía una actualización si no recibió nuestra respuesta: se
+# recuerdan los últimos update_id de cada bot para no procesarla dos veces
+UPDATES_RECORDADOS = 1000
+
+
+def clave_bot(bot_token):
+    """Id público del bot (la parte del token antes de ':')"""
+    return bot_token.split(':', 1)[0]
+
+
+def secreto_bot(bot_token):
+    """Secreto para setWebhook derivado del token (solo caracteres [0-9a-f])"""
+    return hmac.new(TELEGRAM_WEBHOOK_SECRET.encode(), bot_token.encode(), hashlib.sha256).hexdigest()
+
+
+def clave_orden(update):
+    """Chat al que pertenece la actualización (las de un chat se procesan en orden)"""
+    mensaje = update.message or update.edited_message or update.channel_post
+    if mensaje is not None:
+        return mensaje.chat.id
+    if update.callback_query is not None:
+        callback = update.callback_query
+        return callback.message.chat.id if callback.message else callback.from_user.id
+    return update.update_id
+
+
+class _BotRegistrado:
+    """TeleBot atendido por el webhook con su secreto y update_id recientes"""
+
+    __slots__ = ('bot', 'secreto', 'vistos', 'vistos_orden')
+
+    def __init__(self, bot, secreto):
+        self.bot = bot
+        self.secreto = secreto
+        self.vistos = set()
+        self.vistos_orden = deque()
+
+    def es_repetido(self, update_id):
+        if update_id in self.vistos:
+            return True
+        self.vistos.add(update_id)
+        self.vistos_orden.append(update_id)
+        if len(self.vistos_orden) > UPDATES_RECORDADOS:
+            self.vistos.discard(self.vistos_orden.popleft())
+        return False
+
+
+class ReceptorWebhook:
+    """Valida, encola y reparte a hilos las actualizaciones de uno o varios bots"""
+
+    def __init__(self, workers=TELEGRAM_WEBHOOK_WORKERS, tamano_cola=TELEGRAM_WEBHOOK_COLA):
+        self.workers = max(1, workers)
+        self.tamano_cola = tamano_cola
+        self._bots = {}         # clave -> _BotRegistrado
+        self._colas = []
+        self._lock = threading.Lock()
+        self.stats = {'recibidas': 0, 'procesadas': 0, 'rechazadas': 0,
+                      'repetidas': 0, 'cola_llena': 0, 'errores': 0}
+
+    # ---------- Bots ----------
+
+    def registrar(self, bot, url_base=None):
+        """
+        Atender un TeleBot por webhook. Con url_base también se registra la
+        URL en Telegram (setWebhook); retorna la clave o None si eso falla.
+        """
+        clave = clave_bot(bot.token)
+        secreto = secreto_bot(bot.token)
+        with self._lock:
+            self._bots[clave] = _BotRegistrado(bot, secreto)
+        self._iniciar_workers()
+
+        if url_base:
+            try:
+                bot.set_webhook(
+                    url=f"{url_base.rstrip('/')}{RUTA_WEBHOOK}/{clave}",
+                    secret_token=secreto
+                )
+            except Exception as e:
+                print(f"❌ No se pudo registrar el webhook del bot {clave}: {e}")
+                self.quitar(clave)
+                return None
+        return clave
+
+    def quitar(self, clave, borrar_webhook=False):
+        """Dejar de atender un bot (opcionalmente quitando el webhook en Telegram)"""
+        with self._lock:
+            registrado = self._bots.pop(clave, None)
+        if registrado and borrar_webhook:
+            try:
+                registrado.bot.remove_webhook()
+            except Exception as e:
+                print(f"⚠️ No se pudo quitar el webhook del bot {clave}: {e}")
+        return registrado is not None
+
+    def claves(self):
+        with self._lock:
+            return list(self._bots)
+
+    # ---------- Recepción ----------
+
+    def recibir(self, clave, secreto, cuerpo):
+        """Procesar el POST de Telegram; retorna el código HTTP a responder"""
+        registrado = self._bots.get(clave)
+        if registrado is None:
+            return 404
+        if not secreto or not hmac.compare_digest(secreto, registrado.secreto):
+            self.stats['rechazadas'] += 1
+            return 403
+
+        try:
+            update = types.Update.de_json(cuerpo)
+        except Exception:
+            self.stats['errores'] += 1
+            return 400
+        if update is None:
+            return 400
+
+        self.stats['recibidas'] += 1
+        with self._lock:
+            repetido = registrado.es_repetido(update.update_id)
+        if repetido:
+            self.stats['repetidas'] += 1
+            return 200
+
+        cola = self._colas[hash(clave_orden(update)) % len(self._colas)]
+        try:
+            cola.put_nowait((registrado.bot, update))
+        except queue.Full:
+            # Telegram reintenta más tarde; se olvida el id para aceptarlo entonces
+            with self._lock:
+                registrado.vistos.discard(update.update_id)
+            self.stats['cola_llena'] += 1
+            return 503
+        return 200
+
+    def _iniciar_workers(self):
+        with self._lock:
+            if self._colas:
+                return
+            for numero in range(self.workers):
+                cola = queue.Queue(maxsize=self.tamano_cola)
+                self._colas.append(cola)
+                threading.Thread(
+                    target=self._trabajar, args=(cola,), name=f'webhook-{numero}', daemon=True
+                ).start()
+
+    def _trabajar(self, cola):
+        while True:
+            bot, update = cola.get()
+            try:
+                bot.process_new_updates([update])
+                self.stats['procesadas'] += 1
+            except Exception as e:
+                self.stats['errores'] += 1
+                print(f"❌ Error procesando actualización {update.update_id}: {e}")
+
+    def get_metricas(self):
+        metricas = dict(self.stats)
+        metricas.update({
+            'bots': len(self._bots),
+            'en_cola': sum(cola.qsize() for cola in self._colas),
+            'workers': self.workers,
+        })
+        return metricas
+
+
+# Instancia global
+receptor_webhook = ReceptorWebhook()
+
+
+def registrar_rutas(app, receptor=receptor_webhook):
+    """Agregar la ruta del webhook a una app Flask"""
+
+    @app.route(f'{RUTA_WEBHOOK}/<clave>', methods=['POST'])
+    def telegram_webhook(clave):
+        codigo = receptor.recibir(clave, request.headers.get(HEADER_SECRETO), request.get_data(as_text=True))
+        return ('', codigo)
+
+    return app
+
+
+def crear_app(receptor=receptor_webhook):
+    """App Flask mínima para recibir webhooks en el proceso del bot"""
+    app = Flask(__name__)
+    registrar_rutas(app, receptor)
+
+    @app.route('/health')
+    def health():
+        return jsonify({'success': True, 'webhook': receptor.get_metricas()})
+
+    return app
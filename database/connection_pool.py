@@ -0,0 +1,269 @@
+"""
+Pool de conexiones MySQL configurable e instrumentado
+Reemplaza al MySQLConnectionPool fijo de 5 conexiones, que lanza un error
+en cuanto se agota. Aquí:
+
+- Hay pool_size conexiones permanentes y hasta max_overflow extra que se
+  abren en picos y se cierran al devolverse.
+- Si todas están ocupadas, el request espera hasta timeout segundos a que
+  se libere una antes de fallar (PoolError, subclase de mysql Error).
+- Antes de entregar una conexión que estuvo inactiva se verifica con un
+  ping (pre_ping) y las que superan recycle segundos de vida se reabren,
+  para no entregar conexiones que MySQL ya cerró por wait_timeout.
+- Se miden latencia de checkout, tiempo de espera y conexiones en uso
+  (ver get_metricas).
+
+Configuración por variables de entorno:
+    DB_POOL_SIZE            conexiones permanentes (default: 5)
+    DB_POOL_MAX_OVERFLOW    conexiones extra en picos (default: 10)
+    DB_POOL_TIMEOUT         segundos de espera por una conexión (default: 10)
+    DB_POOL_RECYCLE         vida máxima de una conexión en segundos, 0 = sin límite (default: 1800)
+    DB_POOL_PRE_PING        verificar conexiones inactivas antes de usarlas (default: 1)
+    DB_POOL_PING_INACTIVA   segundos de inactividad a partir de los que se hace ping (default: 30)
+    DB_POOL_RESET_SESSION   limpiar la sesión al devolver la conexión (default: 1)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False')
+DB_POOL_PING_INACTIVA = float(os.getenv('DB_POOL_PING_INACTIVA', 30))
+DB_POOL_RESET_SESSION = os.getenv('DB_POOL_RESET_SESSION', '1') not in ('0', 'false', 'False')
+
+# Muestras de latencia que se conservan para los percentiles
+MUESTRAS_LATENCIA = 1000
+
+
+class _Conexion:
+    """Conexión del pool con sus tiempos de creación y último uso"""
+
+    __slots__ = ('conexion', 'creada_en', 'devuelta_en')
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.creada_en = time.monotonic()
+        self.devuelta_en = self.creada_en
+
+
+class ConnectionPool:
+    """Pool con desborde acotado, espera con timeout y verificación de conexiones"""
+
+    def __init__(self, config, pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW,
+                 timeout=DB_POOL_TIMEOUT, recycle=DB_POOL_RECYCLE, pre_ping=DB_POOL_PRE_PING,
+                 ping_inactiva=DB_POOL_PING_INACTIVA, reset_session=DB_POOL_RESET_SESSION):
+        self.config = dict(config)
+        self.pool_size = max(1, pool_size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.ping_inactiva = ping_inactiva
+        self.reset_session = reset_session
+
+        self._libres = deque()      # _Conexion disponibles (LIFO: la más reciente primero)
+        self._en_uso = {}           # id(conexion) -> _Conexion
+        self._abiertas = 0          # libres + en uso + en proceso de abrirse
+        self._condicion = threading.Condition()
+
+        self._latencias = deque(maxlen=MUESTRAS_LATENCIA)
+        self.stats = {
+            'checkouts': 0, 'esperas': 0, 'timeouts': 0,
+            'espera_total_ms': 0.0, 'espera_max_ms': 0.0,
+            'checkout_total_ms': 0.0, 'checkout_max_ms': 0.0,
+            'creadas': 0, 'cerradas': 0, 'recicladas': 0, 'pings_fallidos': 0,
+            'errores_conexion': 0, 'en_uso_max': 0,
+        }
+
+    @property
+    def capacidad(self):
+        return self.pool_size + self.max_overflow
+
+    # ---------- Checkout / devolución ----------
+
+    def get_connection(self, timeout=None):
+        """
+        Obtener una conexión; esperar hasta timeout segundos si el pool está lleno.
+        Devolverla con devolver() (get_db_connection lo hace automáticamente).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.perf_counter()
+        limite = time.monotonic() + timeout
+        espero = False
+
+        while True:
+            entrada = None
+            with self._condicion:
+                while not self._libres and self._abiertas >= self.capacidad:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.stats['timeouts'] += 1
+                        self._registrar_espera(inicio, espero)
+                        raise PoolError(
+                            f"Pool de conexiones agotado: {self._abiertas} abiertas, "
+                            f"sin conexión libre tras {timeout:g}s"
+                        )
+                    espero = True
+                    self._condicion.wait(restante)
+
+                if self._libres:
+                    entrada = self._libres.pop()
+                else:
+                    # Se reserva el lugar antes de abrir, fuera del lock
+                    self._abiertas += 1
+
+            if entrada is None:
+                entrada = self._abrir()
+            else:
+                entrada = self._validar(entrada)
+            if entrada is not None:
+                break
+            # La conexión libre estaba muerta y no se pudo reabrir: intentar de nuevo
+
+        with self._condicion:
+            self._en_uso[id(entrada.conexion)] = entrada
+            if len(self._en_uso) > self.stats['en_uso_max']:
+                self.stats['en_uso_max'] = len(self._en_uso)
+
+        self._registrar_espera(inicio, espero)
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        self.stats['checkouts'] += 1
+        self.stats['checkout_total_ms'] += latencia_ms
+        if latencia_ms > self.stats['checkout_max_ms']:
+            self.stats['checkout_max_ms'] = latencia_ms
+        self._latencias.append(latencia_ms)
+        return entrada.conexion
+
+    def devolver(self, conexion):
+        """Regresar una conexión al pool (o cerrarla si es de desborde o quedó inservible)"""
+        with self._condicion:
+            entrada = self._en_uso.pop(id(conexion), None)
+        if entrada is None:
+            return
+
+        # Si la conexión murió, rollback/reset fallan y se descarta
+        try:
+            if conexion.in_transaction:
+                conexion.rollback()
+            if self.reset_session:
+                conexion.reset_session()
+            reutilizable = True
+        except Error:
+            reutilizable = False
+
+        with self._condicion:
+            if reutilizable and len(self._libres) < self.pool_size:
+                entrada.devuelta_en = time.monotonic()
+                self._libres.append(entrada)
+                entrada = None
+            else:
+                self._abiertas -= 1
+            self._condicion.notify()
+
+        if entrada is not None:
+            self._cerrar(entrada)
+
+    # ---------- Internos ----------
+
+    def _abrir(self):
+        """Abrir una conexión nueva (el lugar ya fue reservado en _abiertas)"""
+        try:
+            conexion = mysql.connector.connect(**self.config)
+        except Error:
+            self.stats['errores_conexion'] += 1
+            with self._condicion:
+                self._abiertas -= 1
+                self._condicion.notify()
+            raise
+        self.stats['creadas'] += 1
+        return _Conexion(conexion)
+
+    def _validar(self, entrada):
+        """Reabrir la conexión si es muy vieja o no responde al ping"""
+        ahora = time.monotonic()
+        motivo = None
+        if self.recycle and ahora - entrada.creada_en > self.recycle:
+            motivo = 'recicladas'
+        elif self.pre_ping and ahora - entrada.devuelta_en > self.ping_inactiva:
+            try:
+                entrada.conexion.ping(reconnect=False)
+            except Error:
+                motivo = 'pings_fallidos'
+
+        if motivo is None:
+            return entrada
+
+        self.stats[motivo] += 1
+        self._cerrar(entrada)
+        # El lugar en _abiertas se reutiliza para la conexión nueva
+        try:
+            return self._abrir()
+        except Error as e:
+            print(f"❌ No se pudo reabrir conexión del pool: {e}")
+            return None
+
+    def _cerrar(self, entrada):
+        self.stats['cerradas'] += 1
+        try:
+            entrada.conexion.close()
+        except Error:
+            pass
+
+    def _registrar_espera(self, inicio, espero):
+        if not espero:
+            return
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        self.stats['esperas'] += 1
+        self.stats['espera_total_ms'] += espera_ms
+        if espera_ms > self.stats['espera_max_ms']:
+            self.stats['espera_max_ms'] = espera_ms
+
+    def cerrar(self):
+        """Cerrar las conexiones libres (las que están en uso se cierran al devolverse)"""
+        with self._condicion:
+            libres = list(self._libres)
+            self._libres.clear()
+            self._abiertas -= len(libres)
+            # Con pool_size 0 las conexiones en uso se cierran al devolverse
+            self.pool_size = 0
+        for entrada in libres:
+            self._cerrar(entrada)
+
+    # ---------- Métricas ----------
+
+    def get_metricas(self):
+        """Estado actual del pool y contadores acumulados"""
+        with self._condicion:
+            en_uso = len(self._en_uso)
+            libres = len(self._libres)
+            abiertas = self._abiertas
+        latencias = sorted(self._latencias)
+
+        def percentil(p):
+            if not latencias:
+                return 0.0
+            return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))], 3)
+
+        metricas = dict(self.stats)
+        metricas.update({
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'en_uso': en_uso,
+            'libres': libres,
+            'abiertas': abiertas,
+            'desborde': max(0, abiertas - self.pool_size),
+            'checkout_p50_ms': percentil(0.50),
+            'checkout_p95_ms': percentil(0.95),
+            'checkout_promedio_ms': round(self.stats['checkout_total_ms'] / self.stats['checkouts'], 3)
+                                    if self.stats['checkouts'] else 0.0,
+        })
+        return metricas
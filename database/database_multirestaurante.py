@@ -1,18 +1,27 @@
 """
 Módulo de conexión y operaciones con la base de datos MySQL
 VERSIÓN MULTI-RESTAURANTE
+
+Requiere el esquema completo: database/sistema_restaurant.sql en una BD
+nueva, o las migraciones de database/migraciones/ aplicadas en orden en una
+existente. Las escrituras de pedidos y reservaciones actualizan
+estadisticas_diarias (migración 003) y agregan su evento a eventos_panel
+(migración 004) en su misma transacción, así que sin esas tablas fallan.
 """
 
 import mysql.connector
-from mysql.connector import Error, pooling
+from mysql.connector import Error, IntegrityError, DataError
 from contextlib import contextmanager
-from datetime import datetime, date, time as dt_time
+from datetime import datetime, date, timedelta, time as dt_time
 import os
 from dotenv import load_dotenv
 import bcrypt
 import random
 import string
 
+from database.connection_pool import ConnectionPool
+from database.query_stats import query_stats, CursorInstrumentado
+
 
 load_dotenv()
 
@@ -27,20 +36,22 @@ DB_CONFIG = {
     'collation': 'utf8mb4_unicode_ci'
 }
 
-# Pool de conexiones
+# Estados que cuentan como cancelación en estadisticas_diarias
+ESTADOS_PEDIDO_CANCELADO = ('cancelado', 'cancelado_pago')
+ESTADOS_RESERVACION_CANCELADA = ('cancelada',)
+
+# Pool de conexiones (configurable por variables de entorno, ver connection_pool.py)
 connection_pool = None
 
 def init_connection_pool():
     """Inicializar el pool de conexiones"""
     global connection_pool
     try:
-        connection_pool = pooling.MySQLConnectionPool(
-            pool_name="restaurant_pool",
-            pool_size=5,
-            pool_reset_session=True,
-            **DB_CONFIG
-        )
-        print("✅ Pool de conexiones inicializado")
+        connection_pool = ConnectionPool(DB_CONFIG)
+        # Abrir una conexión de prueba para detectar errores de configuración al iniciar
+        connection_pool.devolver(connection_pool.get_connection())
+        print(f"✅ Pool de conexiones inicializado ({connection_pool.pool_size} + "
+              f"{connection_pool.max_overflow} de desborde)")
         return True
     except Error as e:
         print(f"❌ Error inicializando pool: {e}")
@@ -60,14 +71,20 @@ def get_db_connection():
         print(f"❌ Error de conexión: {e}")
         raise
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        if connection is not None:
+            connection_pool.devolver(connection)
+
+def get_pool_metricas():
+    """Métricas del pool de conexiones (vacío si no se ha inicializado)"""
+    return connection_pool.get_metricas() if connection_pool is not None else {}
 
 @contextmanager
 def get_db_cursor(dictionary=True):
     """Context manager para obtener cursor"""
     with get_db_connection() as connection:
         cursor = connection.cursor(dictionary=dictionary)
+        if query_stats.activo:
+            cursor = CursorInstrumentado(cursor, query_stats)
         try:
             yield cursor, connection
         finally:
@@ -90,7 +107,7 @@ class DatabaseManager:
                         direccion, ciudad, estado_republica, codigo_postal,
                         logo_url, banner_url, config_delivery, horarios,
                         bot_token, telegram_admin_id, telegram_group_id, config_notificaciones,
-                        plan, limite_productos, estado, fecha_expiracion, created_at
+                        plan, limite_productos, estado, fecha_expiracion, config_version, created_at
                     FROM restaurantes 
                     WHERE slug = %s AND estado = 'activo'
                 """, (slug,))
@@ -99,22 +116,50 @@ class DatabaseManager:
                 if not restaurante:
                     return None
                 
-                # ✅ Parsear JSONs
-                import json
-                if restaurante.get('config_delivery') and isinstance(restaurante['config_delivery'], str):
-                    restaurante['config_delivery'] = json.loads(restaurante['config_delivery'])
-                
-                if restaurante.get('horarios') and isinstance(restaurante['horarios'], str):
-                    restaurante['horarios'] = json.loads(restaurante['horarios'])
+                return DatabaseManager.parsear_jsons_restaurante(restaurante)
+        except Error as e:
+            print(f"❌ Error obteniendo restaurante: {e}")
+            return None
+    
+    @staticmethod
+    def get_restaurante_por_id(restaurante_id):
+        """Obtener información de un restaurante por su id (sin filtrar por estado)"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT 
+                        id, slug, nombre_restaurante, descripcion, telefono, email,
+                        direccion, ciudad, estado_republica, codigo_postal,
+                        logo_url, banner_url, config_delivery, horarios,
+                        bot_token, telegram_admin_id, telegram_group_id, config_notificaciones,
+                        plan, limite_productos, estado, fecha_expiracion, config_version, created_at
+                    FROM restaurantes 
+                    WHERE id = %s
+                """, (restaurante_id,))
+                restaurante = cursor.fetchone()
                 
-                if restaurante.get('config_notificaciones') and isinstance(restaurante['config_notificaciones'], str):
-                    restaurante['config_notificaciones'] = json.loads(restaurante['config_notificaciones'])
+                if not restaurante:
+                    return None
                 
-                return restaurante
+                return DatabaseManager.parsear_jsons_restaurante(restaurante)
         except Error as e:
             print(f"❌ Error obteniendo restaurante: {e}")
             return None
     
+    @staticmethod
+    def parsear_jsons_restaurante(restaurante):
+        """Convertir las columnas JSON (config_delivery, horarios, config_notificaciones) a dict"""
+        import json
+        for campo in ('config_delivery', 'horarios', 'config_notificaciones'):
+            valor = restaurante.get(campo)
+            if valor and isinstance(valor, str):
+                try:
+                    restaurante[campo] = json.loads(valor)
+                except ValueError:
+                    print(f"⚠️ {campo} inválido en restaurante {restaurante.get('id')}")
+                    restaurante[campo] = None
+        return restaurante
+    
     @staticmethod
     def get_restaurante_por_bot_token(bot_token):
         """Obtener restaurante por su token de bot de Telegram"""
@@ -129,6 +174,54 @@ class DatabaseManager:
             print(f"❌ Error obteniendo restaurante por token: {e}")
             return None
     
+    @staticmethod
+    def get_restaurantes_con_bot():
+        """Restaurantes activos con bot de Telegram configurado (para el runner multi-bot)"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT id, slug, nombre_restaurante, bot_token,
+                           telegram_admin_id, telegram_group_id
+                    FROM restaurantes
+                    WHERE estado = 'activo' AND bot_token IS NOT NULL AND bot_token <> ''
+                """)
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error obteniendo restaurantes con bot: {e}")
+            return None
+    
+    @staticmethod
+    def get_config_telegram(restaurante_id):
+        """Obtener token, chats destino y config_notificaciones (ya parseada) de un restaurante"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT bot_token, telegram_admin_id, telegram_group_id, config_notificaciones
+                    FROM restaurantes 
+                    WHERE id = %s
+                """, (restaurante_id,))
+                config = cursor.fetchone()
+            
+            if not config:
+                return None
+            
+            config_notif = {'notificar_pedidos': True, 'notificar_reservaciones': True}
+            if config.get('config_notificaciones'):
+                try:
+                    if isinstance(config['config_notificaciones'], str):
+                        import json
+                        config_notif = json.loads(config['config_notificaciones'])
+                    else:
+                        config_notif = config['config_notificaciones']
+                except Exception as e:
+                    print(f"⚠️ Error parseando config_notificaciones: {e}")
+            config['config_notificaciones'] = config_notif
+            
+            return config
+        except Error as e:
+            print(f"❌ Error obteniendo configuración de Telegram: {e}")
+            return None
+    
     @staticmethod
     def crear_restaurante(data):
         """Crear un nuevo restaurante"""
@@ -176,6 +269,8 @@ class DatabaseManager:
                 if not updates:
                     return True
                 
+                # Avisa a los cachés de otros procesos (ver database/restaurant_cache.py)
+                updates.append("config_version = config_version + 1")
                 params.append(restaurante_id)
                 query = f"UPDATE restaurantes SET {', '.join(updates)} WHERE id = %s"
                 
@@ -489,106 +584,156 @@ class DatabaseManager:
             return []  # ✅ SIEMPRE RETORNAR LISTA
     
     @staticmethod
-    def guardar_ingredientes_item(item_id, ingredientes_lista):
+    def guardar_ingredientes_item(item_id, ingredientes_lista, modo='reemplazar'):
         """
-        Guardar ingredientes de un item - REEMPLAZA todos los existentes
+        Guardar ingredientes de un item
         ingredientes_lista debe ser una lista de strings: ['Tomate', 'Queso', 'Cebolla']
+        
+        modo='reemplazar' borra los existentes e inserta la lista completa;
+        modo='diff' solo toca las filas que cambiaron (ver guardar_ingredientes_lote).
+        """
+        return DatabaseManager.guardar_ingredientes_lote({item_id: ingredientes_lista}, modo)
+    
+    @staticmethod
+    def guardar_ingredientes_lote(ingredientes_por_item, modo='reemplazar'):
+        """
+        Guardar ingredientes de muchos items en una sola transacción
+        ingredientes_por_item: {item_id: ['Tomate', 'Queso', ...]}
+        
+        Usa INSERT de varias filas (executemany) y un solo commit, para
+        importaciones y clonado de menús.
         """
+        if not ingredientes_por_item:
+            return True
         try:
             with get_db_cursor() as (cursor, conn):
-                # 1. Eliminar ingredientes existentes
-                cursor.execute("DELETE FROM ingredientes WHERE item_id = %s", (item_id,))
-                print(f"🗑️ Ingredientes anteriores eliminados para item {item_id}")
+                try:
+                    cambios = DatabaseManager._escribir_ingredientes(cursor, ingredientes_por_item, modo)
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
             
-                # 2. Insertar nuevos ingredientes
-                if ingredientes_lista and len(ingredientes_lista) > 0:
-                    for orden, ingrediente in enumerate(ingredientes_lista):
-                        ingrediente_limpio = ingrediente.strip()
-                    
-                        if ingrediente_limpio:
-                            cursor.execute("""
-                                INSERT INTO ingredientes (item_id, nombre, alergeno, orden)
-                                VALUES (%s, %s, %s, %s)
-                            """, (item_id, ingrediente_limpio, False, orden))
-                        
-                            print(f"  ✅ Ingrediente {orden + 1}: {ingrediente_limpio}")
-            
-                conn.commit()
-                print(f"✅ Total de ingredientes guardados: {len(ingredientes_lista) if ingredientes_lista else 0}")
-                return True
+            print(f"✅ Ingredientes guardados para {len(ingredientes_por_item)} item(s): "
+                  f"{cambios['insertados']} insertados, {cambios['actualizados']} actualizados, "
+                  f"{cambios['eliminados']} eliminados")
+            return True
             
         except Error as e:
             print(f"❌ Error guardando ingredientes: {e}")
             import traceback
             traceback.print_exc()
             return False
-    # ==================== NUEVOS MÉTODOS DINÁMICOS ====================
     
     @staticmethod
-    def buscar_items_por_texto(restaurante_id, texto_busqueda):
-        """Buscar items del menú por palabras clave - Búsqueda flexible sin tildes"""
-        try:
-            import unicodedata
+    def _escribir_ingredientes(cursor, ingredientes_por_item, modo='reemplazar'):
+        """
+        Escribir ingredientes con un cursor abierto, sin commit (para usar
+        dentro de una transacción mayor). Retorna el conteo de cambios.
         
-            # Normalizar texto de búsqueda (eliminar tildes)
-            def normalizar(texto):
-                texto = texto.lower()
-                return ''.join(
-                    c for c in unicodedata.normalize('NFD', texto)
-                    if unicodedata.category(c) != 'Mn'
-                )
+        En modo 'diff' se comparan por nombre con los existentes: se conservan
+        los que siguen (actualizando solo el orden si cambió), se borran los
+        que ya no están y se insertan los nuevos.
+        """
+        nuevos_por_item = {
+            item_id: [nombre.strip() for nombre in (lista or []) if nombre and nombre.strip()]
+            for item_id, lista in ingredientes_por_item.items()
+        }
+        item_ids = list(nuevos_por_item)
+        marcadores = ', '.join(['%s'] * len(item_ids))
+        cambios = {'insertados': 0, 'actualizados': 0, 'eliminados': 0}
         
-            texto_normalizado = normalizar(texto_busqueda)
+        insertar = []
+        actualizar = []
+        eliminar = []
         
-            with get_db_cursor() as (cursor, conn):
-                # Obtener todos los items disponibles del restaurante
-                cursor.execute("""
-                    SELECT i.*, c.nombre as categoria_nombre
-                    FROM items_menu i
-                    INNER JOIN categorias_menu c ON i.categoria_id = c.id
-                    WHERE i.restaurante_id = %s 
-                    AND i.disponible = TRUE
-                """, (restaurante_id,))
-            
-                items = cursor.fetchall()
-            
-                # Buscar manualmente comparando textos normalizados
-                resultados = []
-                for item in items:
-                    nombre_normalizado = normalizar(item['nombre'])
-                    descripcion_normalizada = normalizar(item.get('descripcion', ''))
-                
-                    # Buscar cada palabra del texto en el nombre o descripción
-                    palabras_busqueda = texto_normalizado.split()
-                    coincidencias = sum(
-                        1 for palabra in palabras_busqueda 
-                        if palabra in nombre_normalizado or palabra in descripcion_normalizada
-                    )
-                
-                    # Si encuentra al menos una coincidencia, agregarlo
-                    if coincidencias > 0:
-                        item['score'] = coincidencias
-                        resultados.append(item)
+        if modo == 'diff':
+            cursor.execute(f"""
+                SELECT id, item_id, nombre, orden FROM ingredientes
+                WHERE item_id IN ({marcadores})
+                ORDER BY item_id, orden, id
+            """, item_ids)
+            existentes_por_item = {}
+            for row in cursor.fetchall():
+                existentes_por_item.setdefault(row['item_id'], []).append(row)
             
-                # Ordenar por número de coincidencias (más relevante primero)
-                resultados.sort(key=lambda x: x['score'], reverse=True)
+            for item_id, nuevos in nuevos_por_item.items():
+                disponibles = {}
+                for row in existentes_por_item.get(item_id, []):
+                    disponibles.setdefault(row['nombre'], []).append(row)
+                
+                for orden, nombre in enumerate(nuevos):
+                    filas = disponibles.get(nombre)
+                    if filas:
+                        row = filas.pop(0)
+                        if row['orden'] != orden:
+                            actualizar.append((orden, row['id']))
+                    else:
+                        insertar.append((item_id, nombre, False, orden))
+                
+                for filas in disponibles.values():
+                    eliminar.extend(row['id'] for row in filas)
             
-                return resultados[:5]
-        except Error as e:
-            print(f"❌ Error buscando items: {e}")
-            return []
+            if eliminar:
+                cursor.execute(
+                    f"DELETE FROM ingredientes WHERE id IN ({', '.join(['%s'] * len(eliminar))})",
+                    eliminar
+                )
+            if actualizar:
+                cursor.executemany("UPDATE ingredientes SET orden = %s WHERE id = %s", actualizar)
+        else:
+            cursor.execute(f"DELETE FROM ingredientes WHERE item_id IN ({marcadores})", item_ids)
+            cambios['eliminados'] = max(cursor.rowcount, 0)
+            insertar = [
+                (item_id, nombre, False, orden)
+                for item_id, nuevos in nuevos_por_item.items()
+                for orden, nombre in enumerate(nuevos)
+            ]
+        
+        if insertar:
+            # executemany agrupa las filas en un solo INSERT ... VALUES (...), (...)
+            cursor.executemany("""
+                INSERT INTO ingredientes (item_id, nombre, alergeno, orden)
+                VALUES (%s, %s, %s, %s)
+            """, insertar)
+        
+        cambios['insertados'] = len(insertar)
+        cambios['actualizados'] = len(actualizar)
+        if modo == 'diff':
+            cambios['eliminados'] = len(eliminar)
+        return cambios
+    # ==================== NUEVOS MÉTODOS DINÁMICOS ====================
     
     @staticmethod
-    def get_menu_completo_display(restaurante_id):
-        """Obtener menú completo formateado para mostrar"""
+    def buscar_items_por_texto(restaurante_id, texto_busqueda):
+        """Buscar items del menú por palabras clave - Búsqueda flexible sin tildes
+
+        Usa el índice invertido en memoria (database.menu_search) en lugar de
+        recorrer y normalizar todos los items en cada llamada.
+        """
+        from database.menu_search import buscador_menu
+
+        return buscador_menu.buscar(restaurante_id, texto_busqueda, limite=5)
+    
+    @staticmethod
+    def get_catalogo_completo(restaurante_id, incluir_ingredientes=True):
+        """
+        Cargar categorías, items e ingredientes de un restaurante en un número
+        fijo de consultas (3, o 2 sin ingredientes) sin importar el tamaño del menú.
+
+        Retorna la misma forma que get_menu_completo_display:
+            [{'categoria': {...}, 'items': [{..., 'ingredientes': [...]}]}]
+        o None si falla la BD (distinto de un menú vacío, para no cachear el error)
+        """
         try:
             with get_db_cursor() as (cursor, conn):
+                # 1. Categorías activas
                 cursor.execute("""
-                    SELECT 
-                        c.id as categoria_id,
-                        c.nombre as categoria_codigo,
+                    SELECT
+                        c.id, c.id as categoria_id,
+                        c.nombre, c.nombre as categoria_codigo,
                         c.nombre_display,
-                        c.descripcion as cat_descripcion,
+                        c.descripcion, c.descripcion as cat_descripcion,
                         c.icono,
                         c.orden
                     FROM categorias_menu c
@@ -596,34 +741,102 @@ class DatabaseManager:
                     ORDER BY c.orden
                 """, (restaurante_id,))
                 categorias = cursor.fetchall()
-                
-                menu_display = []
-                for cat in categorias:
+
+                # 2. Todos los items del restaurante de una vez
+                cursor.execute("""
+                    SELECT
+                        id, categoria_id, codigo, nombre, descripcion, precio,
+                        tiempo_preparacion, vegano, vegetariano,
+                        sin_gluten, disponible
+                    FROM items_menu
+                    WHERE restaurante_id = %s
+                    ORDER BY categoria_id, nombre
+                """, (restaurante_id,))
+                items = cursor.fetchall()
+
+                # 3. Todos los ingredientes del restaurante de una vez
+                ingredientes_por_item = {}
+                if incluir_ingredientes and items:
                     cursor.execute("""
-                        SELECT 
-                            id, codigo, nombre, descripcion, precio, 
-                            tiempo_preparacion, vegano, vegetariano,
-                            sin_gluten, disponible
-                        FROM items_menu
-                        WHERE restaurante_id = %s 
-                        AND categoria_id = %s
-                        ORDER BY nombre
-                    """, (restaurante_id, cat['categoria_id']))
-                    
-                    items = cursor.fetchall()
-                    
-                    menu_display.append({
-                        'categoria': cat,
-                        'items': items
-                    })
-                
-                return menu_display
+                        SELECT ing.item_id, ing.nombre
+                        FROM ingredientes ing
+                        INNER JOIN items_menu i ON ing.item_id = i.id
+                        WHERE i.restaurante_id = %s
+                        ORDER BY ing.item_id, ing.orden
+                    """, (restaurante_id,))
+
+                    for row in cursor.fetchall():
+                        ingredientes_por_item.setdefault(row['item_id'], []).append(row['nombre'])
+
+            # Armar la estructura anidada en Python
+            items_por_categoria = {}
+            for item in items:
+                if incluir_ingredientes:
+                    item['ingredientes'] = ingredientes_por_item.get(item['id'], [])
+                items_por_categoria.setdefault(item['categoria_id'], []).append(item)
+
+            return [
+                {
+                    'categoria': cat,
+                    'items': items_por_categoria.get(cat['id'], [])
+                }
+                for cat in categorias
+            ]
         except Error as e:
-            print(f"❌ Error obteniendo menú display: {e}")
+            print(f"❌ Error cargando catálogo completo: {e}")
             import traceback
             traceback.print_exc()
-            return []
-    
+            return None
+
+    @staticmethod
+    def get_menu_completo_display(restaurante_id):
+        """Obtener menú completo formateado para mostrar"""
+        return DatabaseManager.get_catalogo_completo(restaurante_id, incluir_ingredientes=False)
+
+    @staticmethod
+    def get_menu_version(restaurante_id):
+        """Obtener la versión actual del menú de un restaurante (None si no se pudo leer)"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT menu_version FROM restaurantes WHERE id = %s
+                """, (restaurante_id,))
+                result = cursor.fetchone()
+                return result['menu_version'] if result else None
+        except Error as e:
+            print(f"❌ Error obteniendo versión del menú: {e}")
+            return None
+
+    @staticmethod
+    def get_config_version(restaurante_id):
+        """Versión de la configuración de un restaurante (None si no se pudo leer)"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT config_version FROM restaurantes WHERE id = %s
+                """, (restaurante_id,))
+                result = cursor.fetchone()
+                return result['config_version'] if result else None
+        except Error as e:
+            print(f"❌ Error obteniendo versión de la configuración: {e}")
+            return None
+
+    @staticmethod
+    def incrementar_menu_version(restaurante_id):
+        """Marcar el menú de un restaurante como modificado"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    UPDATE restaurantes
+                    SET menu_version = menu_version + 1
+                    WHERE id = %s
+                """, (restaurante_id,))
+                conn.commit()
+                return True
+        except Error as e:
+            print(f"❌ Error incrementando versión del menú: {e}")
+            return False
+
     # ==================== CLIENTES ====================
     
     @staticmethod
@@ -726,6 +939,65 @@ class DatabaseManager:
             print(f"❌ Error registrando interacción: {e}")
             return None
     
+    @staticmethod
+    def registrar_interacciones_lote(filas):
+        """
+        Registrar varias interacciones en un solo INSERT de varias filas.
+        Cada fila: (cliente_id, restaurante_id, mensaje, respuesta, tipo, antiguedad_us)
+        
+        fecha_interaccion se toma del reloj de la BD, igual que en
+        registrar_interaccion: NOW() menos los microsegundos que la fila
+        esperó en cola antes de escribirse.
+        
+        Retorna True si se escribió, None si la BD rechazó los datos
+        (IntegrityError/DataError: reintentar el mismo lote no sirve) y
+        False ante cualquier otro error.
+        """
+        if not filas:
+            return True
+        try:
+            with get_db_cursor() as (cursor, conn):
+                try:
+                    cursor.executemany("""
+                        INSERT INTO interacciones 
+                        (cliente_id, restaurante_id, mensaje, respuesta, tipo, fecha_interaccion)
+                        VALUES (%s, %s, %s, %s, %s, TIMESTAMPADD(MICROSECOND, -%s, NOW()))
+                    """, filas)
+                    
+                    conn.commit()
+                    return True
+                except Error:
+                    conn.rollback()
+                    raise
+        except (IntegrityError, DataError) as e:
+            print(f"❌ Lote de interacciones rechazado por la BD: {e}")
+            return None
+        except Error as e:
+            print(f"❌ Error registrando lote de interacciones: {e}")
+            return False
+    
+    @staticmethod
+    def get_interacciones_cliente(cliente_id, restaurante_id, antes_fecha, antes_id=0, limite=20):
+        """
+        Página de interacciones anteriores a (antes_fecha, antes_id), de la más
+        reciente a la más antigua. Con antes_id=0 se toman las anteriores a antes_fecha.
+        """
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT id, mensaje, respuesta, fecha_interaccion
+                    FROM interacciones
+                    WHERE cliente_id = %s AND restaurante_id = %s
+                    AND (fecha_interaccion < %s
+                         OR (fecha_interaccion = %s AND id < %s))
+                    ORDER BY fecha_interaccion DESC, id DESC
+                    LIMIT %s
+                """, (cliente_id, restaurante_id, antes_fecha, antes_fecha, antes_id, limite))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error obteniendo interacciones: {e}")
+            return []
+    
     # ==================== PEDIDOS ====================
     
     @staticmethod
@@ -741,9 +1013,11 @@ class DatabaseManager:
                     (restaurante_id, cliente_id, numero_pedido, tipo_pedido, origen, estado, total, subtotal)
                     VALUES (%s, %s, %s, %s, %s, 'pendiente', 0, 0)
                 """, (restaurante_id, cliente_id, numero_pedido, tipo_pedido, origen))
+                pedido_id = cursor.lastrowid
                 
+                DatabaseManager._sumar_estadisticas_pedido(cursor, pedido_id, pedidos=1)
+                DatabaseManager.registrar_evento(cursor, restaurante_id, 'pedido_nuevo', pedido_id, 'pendiente')
                 conn.commit()
-                pedido_id = cursor.lastrowid
                 
                 print(f"✅ Pedido insertado - ID: {pedido_id}, Número: {numero_pedido}")
                 
@@ -778,6 +1052,8 @@ class DatabaseManager:
                     WHERE id = %s
                 """, (subtotal, subtotal, pedido_id))
                 
+                DatabaseManager._sumar_estadisticas_pedido(cursor, pedido_id, total=subtotal)
+                DatabaseManager.registrar_evento_pedido(cursor, pedido_id)
                 conn.commit()
                 return True
                 
@@ -785,6 +1061,104 @@ class DatabaseManager:
             print(f"❌ Error agregando item a pedido: {e}")
             return False
     
+    @staticmethod
+    def registrar_pedido_completo(restaurante_id, cliente_id, tipo_pedido, origen, lineas,
+                                  costo_envio=0, estado='confirmado',
+                                  direccion_entrega=None, notas=None):
+        """
+        Registrar encabezado y detalle de un pedido en una sola transacción.
+        
+        lineas: [{'item_id', 'cantidad', 'precio_unitario', 'notas_item'}]
+        
+        Son 3 sentencias (INSERT del pedido, INSERT de varias filas del detalle
+        y SELECT del detalle con nombres) y un solo commit, en lugar de
+        crear_pedido_simple + agregar_item_pedido por línea + UPDATEs.
+        
+        Retorna {'pedido': {...}, 'detalles': [...]} o None si falla (sin dejar
+        un pedido a medias).
+        """
+        if not lineas:
+            return None
+        
+        numero_pedido = f"PED-{datetime.now().strftime('%Y%m%d%H%M%S')}-{random.randint(100, 999)}"
+        
+        filas_detalle = []
+        subtotal = 0
+        for linea in lineas:
+            subtotal_linea = linea['cantidad'] * linea['precio_unitario']
+            subtotal += subtotal_linea
+            filas_detalle.append((
+                linea['item_id'], linea['cantidad'], linea['precio_unitario'],
+                subtotal_linea, linea.get('notas_item')
+            ))
+        total = subtotal + costo_envio
+        
+        try:
+            with get_db_cursor() as (cursor, conn):
+                try:
+                    cursor.execute("""
+                        INSERT INTO pedidos 
+                        (restaurante_id, cliente_id, numero_pedido, tipo_pedido, origen, estado,
+                         subtotal, costo_envio, total, direccion_entrega, notas)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (restaurante_id, cliente_id, numero_pedido, tipo_pedido, origen, estado,
+                          subtotal, costo_envio, total, direccion_entrega, notas))
+                    pedido_id = cursor.lastrowid
+                    
+                    # executemany agrupa las filas en un solo INSERT ... VALUES (...), (...)
+                    cursor.executemany("""
+                        INSERT INTO detalle_pedidos 
+                        (pedido_id, item_id, cantidad, precio_unitario, subtotal, notas_item)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, [(pedido_id,) + fila for fila in filas_detalle])
+                    
+                    cursor.execute("""
+                        SELECT 
+                            dp.*,
+                            i.nombre as item_nombre,
+                            i.codigo as item_codigo
+                        FROM detalle_pedidos dp
+                        INNER JOIN items_menu i ON dp.item_id = i.id
+                        WHERE dp.pedido_id = %s
+                        ORDER BY dp.id
+                    """, (pedido_id,))
+                    detalles = cursor.fetchall()
+                    
+                    DatabaseManager._sumar_estadisticas_pedido(
+                        cursor, pedido_id, pedidos=1, total=total,
+                        cancelados=1 if estado in ESTADOS_PEDIDO_CANCELADO else 0
+                    )
+                    DatabaseManager.registrar_evento(cursor, restaurante_id, 'pedido_nuevo', pedido_id, estado)
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
+            
+            print(f"✅ Pedido registrado - ID: {pedido_id}, Número: {numero_pedido}, {len(detalles)} items")
+            
+            return {
+                'pedido': {
+                    'id': pedido_id,
+                    'restaurante_id': restaurante_id,
+                    'cliente_id': cliente_id,
+                    'numero_pedido': numero_pedido,
+                    'tipo_pedido': tipo_pedido,
+                    'origen': origen,
+                    'estado': estado,
+                    'subtotal': subtotal,
+                    'costo_envio': costo_envio,
+                    'total': total,
+                    'direccion_entrega': direccion_entrega,
+                    'notas': notas
+                },
+                'detalles': detalles
+            }
+        except Error as e:
+            print(f"❌ Error registrando pedido: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
     @staticmethod
     def get_pedido(pedido_id):
         """Obtener información de un pedido"""
@@ -833,17 +1207,65 @@ class DatabaseManager:
         """Actualizar el estado de un pedido"""
         try:
             with get_db_cursor() as (cursor, conn):
-                cursor.execute("""
-                    UPDATE pedidos 
-                    SET estado = %s 
-                    WHERE id = %s
-                """, (nuevo_estado, pedido_id))
-                conn.commit()
+                try:
+                    cursor.execute("""
+                        SELECT restaurante_id, estado FROM pedidos WHERE id = %s FOR UPDATE
+                    """, (pedido_id,))
+                    anterior = cursor.fetchone()
+                    
+                    cursor.execute("""
+                        UPDATE pedidos 
+                        SET estado = %s 
+                        WHERE id = %s
+                    """, (nuevo_estado, pedido_id))
+                    
+                    if anterior:
+                        cambio = ((nuevo_estado in ESTADOS_PEDIDO_CANCELADO)
+                                  - (anterior['estado'] in ESTADOS_PEDIDO_CANCELADO))
+                        if cambio:
+                            DatabaseManager._sumar_estadisticas_pedido(cursor, pedido_id, cancelados=cambio)
+                        DatabaseManager.registrar_evento(
+                            cursor, anterior['restaurante_id'], 'pedido_actualizado', pedido_id, nuevo_estado
+                        )
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
                 return True
         except Error as e:
             print(f"❌ Error actualizando estado: {e}")
             return False
-    
+
+    @staticmethod
+    def cancelar_pedido_abandonado(pedido_id):
+        """Cancelar un pedido solo si sigue 'pendiente' (conversación abandonada o cancelada por el cliente)"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                try:
+                    cursor.execute("""
+                        SELECT restaurante_id FROM pedidos
+                        WHERE id = %s AND estado = 'pendiente'
+                        FOR UPDATE
+                    """, (pedido_id,))
+                    pedido = cursor.fetchone()
+                    if not pedido:
+                        conn.rollback()
+                        return False
+
+                    cursor.execute("UPDATE pedidos SET estado = 'cancelado' WHERE id = %s", (pedido_id,))
+                    DatabaseManager._sumar_estadisticas_pedido(cursor, pedido_id, cancelados=1)
+                    DatabaseManager.registrar_evento(
+                        cursor, pedido['restaurante_id'], 'pedido_actualizado', pedido_id, 'cancelado'
+                    )
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
+                return True
+        except Error as e:
+            print(f"❌ Error cancelando pedido abandonado: {e}")
+            return False
+
     @staticmethod
     def get_pedidos_restaurante(restaurante_id, limit=20):
         """Obtener pedidos recientes de un restaurante"""
@@ -862,6 +1284,71 @@ class DatabaseManager:
             print(f"❌ Error obteniendo pedidos: {e}")
             return []
     
+    @staticmethod
+    def buscar_pedidos(restaurante_id, estado=None, tipo=None, origen=None,
+                       desde=None, hasta=None, antes=None, limite=50):
+        """
+        Página de pedidos filtrados, del más reciente al más antiguo.
+        
+        desde/hasta: fechas (date) inclusivas sobre fecha_pedido
+        antes: (fecha_pedido, id) de la última fila de la página anterior
+        
+        Paginación por clave (fecha_pedido, id) en lugar de OFFSET: cada página
+        lee solo sus filas por el índice, sin importar qué tan atrás esté.
+        Pedir limite + 1 para saber si hay más páginas.
+        """
+        condiciones = ["p.restaurante_id = %s"]
+        params = [restaurante_id]
+        
+        for columna, valor in (('p.estado', estado), ('p.tipo_pedido', tipo), ('p.origen', origen)):
+            if valor:
+                condiciones.append(f"{columna} = %s")
+                params.append(valor)
+        if desde:
+            condiciones.append("p.fecha_pedido >= %s")
+            params.append(DatabaseManager.rango_del_dia(desde)[0])
+        if hasta:
+            condiciones.append("p.fecha_pedido < %s")
+            params.append(DatabaseManager.rango_del_dia(hasta)[1])
+        if antes:
+            antes_fecha, antes_id = antes
+            condiciones.append("(p.fecha_pedido < %s OR (p.fecha_pedido = %s AND p.id < %s))")
+            params.extend([antes_fecha, antes_fecha, antes_id])
+        
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute(f"""
+                    SELECT p.*, c.nombre as nombre_cliente
+                    FROM pedidos p
+                    LEFT JOIN clientes c ON p.cliente_id = c.id
+                    WHERE {' AND '.join(condiciones)}
+                    ORDER BY p.fecha_pedido DESC, p.id DESC
+                    LIMIT %s
+                """, params + [limite])
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error buscando pedidos: {e}")
+            return []
+    
+    @staticmethod
+    def get_pedidos_por_ids(restaurante_id, pedido_ids):
+        """Pedidos del restaurante con esos ids (mismas columnas que get_pedidos_restaurante)"""
+        if not pedido_ids:
+            return []
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute(f"""
+                    SELECT p.*, c.nombre as nombre_cliente
+                    FROM pedidos p
+                    LEFT JOIN clientes c ON p.cliente_id = c.id
+                    WHERE p.restaurante_id = %s AND p.id IN ({', '.join(['%s'] * len(pedido_ids))})
+                    ORDER BY p.fecha_pedido DESC
+                """, [restaurante_id] + list(pedido_ids))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error obteniendo pedidos: {e}")
+            return []
+    
     # ==================== RESERVACIONES ====================
     
     @staticmethod
@@ -880,9 +1367,13 @@ class DatabaseManager:
                      fecha_reservacion, hora_reservacion, numero_personas, origen)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """, (restaurante_id, cliente_id, codigo, nombre, telefono, fecha, hora, personas, origen))
+                reservacion_id = cursor.lastrowid
                 
+                DatabaseManager._sumar_estadisticas(
+                    cursor, restaurante_id, fecha, reservaciones=1, personas_reservadas=personas
+                )
+                DatabaseManager.registrar_evento(cursor, restaurante_id, 'reservacion_nueva', reservacion_id)
                 conn.commit()
-                reservacion_id = cursor.lastrowid
                 
                 # Retornar la reservación creada
                 cursor.execute("""
@@ -910,43 +1401,496 @@ class DatabaseManager:
             print(f"❌ Error obteniendo reservaciones: {e}")
             return []
     
+    @staticmethod
+    def buscar_reservaciones(restaurante_id, estado=None, origen=None,
+                             desde=None, hasta=None, antes=None, limite=50):
+        """
+        Página de reservaciones filtradas, de la creada más recientemente a la
+        más antigua (el mismo orden que get_reservaciones_restaurante).
+        
+        desde/hasta: fechas (date) inclusivas sobre fecha_reservacion
+        antes: (created_at, id) de la última fila de la página anterior
+        
+        Igual que buscar_pedidos: paginación por clave, pedir limite + 1.
+        """
+        condiciones = ["restaurante_id = %s"]
+        params = [restaurante_id]
+        
+        for columna, valor in (('estado', estado), ('origen', origen)):
+            if valor:
+                condiciones.append(f"{columna} = %s")
+                params.append(valor)
+        if desde:
+            condiciones.append("fecha_reservacion >= %s")
+            params.append(desde)
+        if hasta:
+            condiciones.append("fecha_reservacion <= %s")
+            params.append(hasta)
+        if antes:
+            antes_fecha, antes_id = antes
+            condiciones.append("(created_at < %s OR (created_at = %s AND id < %s))")
+            params.extend([antes_fecha, antes_fecha, antes_id])
+        
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute(f"""
+                    SELECT * FROM reservaciones
+                    WHERE {' AND '.join(condiciones)}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                """, params + [limite])
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error buscando reservaciones: {e}")
+            return []
+    
+    @staticmethod
+    def get_resumen_reservaciones(restaurante_id):
+        """
+        Tarjetas de la página de reservaciones: las de hoy (y sus personas) y
+        las pendientes/confirmadas de hoy en adelante. Solo lee las filas
+        desde hoy por el índice (restaurante_id, fecha_reservacion).
+        """
+        hoy = date.today()
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT
+                        COALESCE(SUM(fecha_reservacion = %s), 0) as hoy,
+                        COALESCE(SUM(estado = 'pendiente'), 0) as pendientes,
+                        COALESCE(SUM(estado = 'confirmada'), 0) as confirmadas,
+                        COALESCE(SUM(CASE WHEN fecha_reservacion = %s THEN numero_personas END), 0) as personas_hoy
+                    FROM reservaciones
+                    WHERE restaurante_id = %s AND fecha_reservacion >= %s
+                """, (hoy, hoy, restaurante_id, hoy))
+                fila = cursor.fetchone()
+                return {clave: int(valor) for clave, valor in fila.items()}
+        except Error as e:
+            print(f"❌ Error obteniendo resumen de reservaciones: {e}")
+            return {'hoy': 0, 'pendientes': 0, 'confirmadas': 0, 'personas_hoy': 0}
+    
+    @staticmethod
+    def get_reservaciones_por_ids(restaurante_id, reservacion_ids):
+        """Reservaciones del restaurante con esos ids"""
+        if not reservacion_ids:
+            return []
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute(f"""
+                    SELECT * FROM reservaciones
+                    WHERE restaurante_id = %s AND id IN ({', '.join(['%s'] * len(reservacion_ids))})
+                    ORDER BY created_at DESC
+                """, [restaurante_id] + list(reservacion_ids))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error obteniendo reservaciones: {e}")
+            return []
+    
+    @staticmethod
+    def actualizar_estado_reservacion(reservacion_id, nuevo_estado, restaurante_id=None):
+        """Actualizar el estado de una reservación (opcionalmente validando el restaurante)"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                try:
+                    filtro = "id = %s" + (" AND restaurante_id = %s" if restaurante_id else "")
+                    params = (reservacion_id, restaurante_id) if restaurante_id else (reservacion_id,)
+                    
+                    cursor.execute(f"""
+                        SELECT restaurante_id, fecha_reservacion, estado
+                        FROM reservaciones WHERE {filtro} FOR UPDATE
+                    """, params)
+                    anterior = cursor.fetchone()
+                    if not anterior:
+                        conn.rollback()
+                        return False
+                    
+                    cursor.execute(f"""
+                        UPDATE reservaciones 
+                        SET estado = %s 
+                        WHERE {filtro}
+                    """, (nuevo_estado,) + params)
+                    
+                    cambio = ((nuevo_estado in ESTADOS_RESERVACION_CANCELADA)
+                              - (anterior['estado'] in ESTADOS_RESERVACION_CANCELADA))
+                    if cambio:
+                        DatabaseManager._sumar_estadisticas(
+                            cursor, anterior['restaurante_id'], anterior['fecha_reservacion'],
+                            reservaciones_canceladas=cambio
+                        )
+                    DatabaseManager.registrar_evento(
+                        cursor, anterior['restaurante_id'], 'reservacion_actualizada', reservacion_id, nuevo_estado
+                    )
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
+                return True
+        except Error as e:
+            print(f"❌ Error actualizando estado de reservación: {e}")
+            return False
+    
+    # ==================== EVENTOS DEL PANEL ====================
+    
+    @staticmethod
+    def registrar_evento(cursor, restaurante_id, tipo, entidad_id, estado=None):
+        """
+        Anotar un cambio para el panel de administración (sin commit: va en la
+        transacción de la escritura que lo origina, así no hay eventos de
+        cambios que se revirtieron; sin la tabla de la migración 004 la
+        escritura falla). tipo: pedido_nuevo, pedido_actualizado,
+        reservacion_nueva, reservacion_actualizada, o estadisticas_corregidas
+        (de la reconciliación: entidad_id 0 y estado la fecha corregida)
+        """
+        cursor.execute("""
+            INSERT INTO eventos_panel (restaurante_id, tipo, entidad_id, estado)
+            VALUES (%s, %s, %s, %s)
+        """, (restaurante_id, tipo, entidad_id, estado))
+    
+    @staticmethod
+    def registrar_evento_pedido(cursor, pedido_id, tipo='pedido_actualizado'):
+        """Como registrar_evento, tomando restaurante y estado de la fila del pedido"""
+        cursor.execute("""
+            INSERT INTO eventos_panel (restaurante_id, tipo, entidad_id, estado)
+            SELECT restaurante_id, %s, id, estado FROM pedidos WHERE id = %s
+        """, (tipo, pedido_id))
+    
+    @staticmethod
+    def get_ultimo_evento_id():
+        """Id del evento más reciente (0 si no hay), o None si falla"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("SELECT COALESCE(MAX(id), 0) as ultimo FROM eventos_panel")
+                return cursor.fetchone()['ultimo']
+        except Error as e:
+            print(f"❌ Error obteniendo último evento: {e}")
+            return None
+    
+    @staticmethod
+    def get_eventos_desde(ultimo_id, restaurante_ids, limite=500):
+        """
+        Eventos posteriores a ultimo_id de los restaurantes indicados, en orden.
+        Retorna None si falla (para distinguirlo de "no hay eventos nuevos").
+        """
+        if not restaurante_ids:
+            return []
+        try:
+            with get_db_cursor() as (cursor, conn):
+                marcadores = ', '.join(['%s'] * len(restaurante_ids))
+                cursor.execute(f"""
+                    SELECT id, restaurante_id, tipo, entidad_id, estado, created_at
+                    FROM eventos_panel
+                    WHERE id > %s AND restaurante_id IN ({marcadores})
+                    ORDER BY id
+                    LIMIT %s
+                """, [ultimo_id] + list(restaurante_ids) + [limite])
+                return cursor.fetchall()
+        except Error as e:
+            print(f"❌ Error obteniendo eventos: {e}")
+            return None
+    
+    @staticmethod
+    def get_version_panel(restaurante_id, solape):
+        """
+        Versión de los datos del panel de un restaurante:
+            {'ultimo_id': id de su último evento (0 si no hay),
+             'recientes': sus eventos con id > ultimo_id - solape}
+        Los ids AUTO_INCREMENT se asignan al insertar, no al hacer commit:
+        un evento que confirma tarde con un id menor no cambia ultimo_id,
+        pero sí 'recientes', así que el ETag cambia. ultimo_id es el cursor
+        `since` (ver get_entidades_cambiadas).
+        """
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT v.ultimo_id, (
+                        SELECT COUNT(*) FROM eventos_panel
+                        WHERE restaurante_id = %s AND id > v.ultimo_id - %s
+                    ) as recientes
+                    FROM (
+                        SELECT COALESCE(MAX(id), 0) as ultimo_id
+                        FROM eventos_panel WHERE restaurante_id = %s
+                    ) v
+                """, (restaurante_id, solape, restaurante_id))
+                return cursor.fetchone()
+        except Error as e:
+            print(f"❌ Error obteniendo versión del panel: {e}")
+            return None
+    
+    @staticmethod
+    def get_entidades_cambiadas(restaurante_id, desde_version, tipos, limite=50):
+        """
+        Ids de los pedidos/reservaciones (según tipos de evento) con eventos
+        de id mayor a desde_version. Quien la llama resta el margen de solape
+        al cursor para incluir los eventos que confirmaron tarde. Retorna None
+        si no se puede responder con un delta: error, más de `limite` cambios
+        o eventos ya purgados.
+        """
+        try:
+            with get_db_cursor() as (cursor, conn):
+                # Si el evento más viejo que queda es posterior al cursor, pudo
+                # haberse purgado alguno intermedio
+                cursor.execute("SELECT MIN(id) as minimo FROM eventos_panel")
+                minimo = cursor.fetchone()['minimo']
+                if minimo is None or minimo > desde_version + 1:
+                    return None
+                
+                cursor.execute(f"""
+                    SELECT entidad_id FROM eventos_panel
+                    WHERE restaurante_id = %s AND id > %s
+                      AND tipo IN ({', '.join(['%s'] * len(tipos))})
+                    GROUP BY entidad_id
+                    LIMIT %s
+                """, [restaurante_id, desde_version] + list(tipos) + [limite + 1])
+                ids = [fila['entidad_id'] for fila in cursor.fetchall()]
+                return ids if len(ids) <= limite else None
+        except Error as e:
+            print(f"❌ Error obteniendo cambios del panel: {e}")
+            return None
+    
+    @staticmethod
+    def purgar_eventos(horas, lote=5000):
+        """Borrar eventos con más de `horas` de antigüedad; retorna cuántos se borraron"""
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("""
+                    DELETE FROM eventos_panel
+                    WHERE created_at < NOW() - INTERVAL %s HOUR
+                    LIMIT %s
+                """, (horas, lote))
+                conn.commit()
+                return cursor.rowcount
+        except Error as e:
+            print(f"❌ Error purgando eventos: {e}")
+            return 0
+    
     # ==================== ESTADÍSTICAS ====================
     
+    @staticmethod
+    def rango_del_dia(dia):
+        """
+        Inicio y fin (exclusivo) de un día para filtrar columnas DATETIME
+        Usar "col >= inicio AND col < fin" en lugar de DATE(col) = dia:
+        envolver la columna en una función impide usar el índice.
+        """
+        inicio = datetime.combine(dia, dt_time.min)
+        return inicio, inicio + timedelta(days=1)
+    
+    # Columnas de estadisticas_diarias que se actualizan por incremento
+    CONTADORES_DIARIOS = (
+        'pedidos', 'total_ventas', 'pedidos_cancelados',
+        'reservaciones', 'personas_reservadas', 'reservaciones_canceladas',
+    )
+    
+    @staticmethod
+    def _sumar_estadisticas(cursor, restaurante_id, fecha, **incrementos):
+        """
+        Sumar a los contadores del día (sin commit: va en la transacción de
+        la escritura que lo origina, que falla si no existe la tabla de la
+        migración 003). incrementos: columna=delta
+        """
+        columnas = [c for c in DatabaseManager.CONTADORES_DIARIOS if incrementos.get(c)]
+        if not columnas:
+            return
+        cursor.execute(f"""
+            INSERT INTO estadisticas_diarias (restaurante_id, fecha, {', '.join(columnas)})
+            VALUES (%s, %s, {', '.join(['%s'] * len(columnas))})
+            ON DUPLICATE KEY UPDATE
+                {', '.join(f'{c} = {c} + VALUES({c})' for c in columnas)}
+        """, [restaurante_id, fecha] + [incrementos[c] for c in columnas])
+    
+    @staticmethod
+    def _sumar_estadisticas_pedido(cursor, pedido_id, pedidos=0, total=0, cancelados=0):
+        """Sumar a los contadores del día del pedido (tomando restaurante y fecha de la fila)"""
+        incrementos = {'pedidos': pedidos, 'total_ventas': total, 'pedidos_cancelados': cancelados}
+        columnas = [c for c in ('pedidos', 'total_ventas', 'pedidos_cancelados') if incrementos[c]]
+        if not columnas:
+            return
+        cursor.execute(f"""
+            INSERT INTO estadisticas_diarias (restaurante_id, fecha, {', '.join(columnas)})
+            SELECT restaurante_id, DATE(fecha_pedido), {', '.join(['%s'] * len(columnas))}
+            FROM pedidos WHERE id = %s
+            ON DUPLICATE KEY UPDATE
+                {', '.join(f'{c} = {c} + VALUES({c})' for c in columnas)}
+        """, [incrementos[c] for c in columnas] + [pedido_id])
+    
     @staticmethod
     def get_estadisticas_hoy(restaurante_id):
         """Obtener estadísticas del día actual para un restaurante"""
+        hoy = date.today()
         try:
             with get_db_cursor() as (cursor, conn):
-                hoy = date.today()
-                
-                # Pedidos hoy
+                # Contadores mantenidos por las escrituras: una lectura por clave primaria
                 cursor.execute("""
-                    SELECT COUNT(*) as total, COALESCE(SUM(total), 0) as suma
-                    FROM pedidos
-                    WHERE restaurante_id = %s AND DATE(fecha_pedido) = %s
+                    SELECT pedidos, total_ventas, pedidos_cancelados,
+                           reservaciones, reservaciones_canceladas
+                    FROM estadisticas_diarias
+                    WHERE restaurante_id = %s AND fecha = %s
                 """, (restaurante_id, hoy))
-                pedidos_data = cursor.fetchone()
-                
-                # Reservaciones hoy
-                cursor.execute("""
-                    SELECT COUNT(*) as total
-                    FROM reservaciones
-                    WHERE restaurante_id = %s AND DATE(fecha_reservacion) = %s
-                """, (restaurante_id, hoy))
-                reservaciones_data = cursor.fetchone()
+                fila = cursor.fetchone() or {}
                 
                 return {
-                    'pedidos_hoy': pedidos_data['total'] if pedidos_data else 0,
-                    'total_hoy': float(pedidos_data['suma']) if pedidos_data else 0,
-                    'reservaciones_hoy': reservaciones_data['total'] if reservaciones_data else 0
+                    'pedidos_hoy': fila.get('pedidos', 0),
+                    'total_hoy': float(fila.get('total_ventas', 0)),
+                    'reservaciones_hoy': fila.get('reservaciones', 0),
+                    'pedidos_cancelados_hoy': fila.get('pedidos_cancelados', 0),
+                    'reservaciones_canceladas_hoy': fila.get('reservaciones_canceladas', 0)
                 }
         except Error as e:
             print(f"❌ Error obteniendo estadísticas: {e}")
             return {
                 'pedidos_hoy': 0,
-                'total_hoy': 0, 
-                'reservaciones_hoy': 0
+                'total_hoy': 0,
+                'reservaciones_hoy': 0,
+                'pedidos_cancelados_hoy': 0,
+                'reservaciones_canceladas_hoy': 0
             }
+    
+    # Lock de MySQL (GET_LOCK) para que no corran dos reconciliaciones a la vez
+    LOCK_RECONCILIACION = 'sistema_restaurantes.reconciliar_estadisticas'
+    
+    @staticmethod
+    def reconciliar_estadisticas(desde, hasta, restaurante_id=None):
+        """
+        Recalcular estadisticas_diarias para los días [desde, hasta] a partir de
+        pedidos y reservaciones y corregir las filas que no coinciden.
+        
+        Se procesa un restaurante a la vez (ver _reconciliar_restaurante): los
+        GROUP BY no bloquean nada y la corrección es una transacción corta
+        sobre las filas afectadas. Solo corre una reconciliación a la vez
+        (GET_LOCK); si ya hay otra en curso retorna [].
+        Retorna la lista de filas corregidas o None si falla.
+        """
+        lock = DatabaseManager.LOCK_RECONCILIACION
+        try:
+            with get_db_cursor() as (cursor, conn):
+                cursor.execute("SELECT GET_LOCK(%s, 0) as obtenido", (lock,))
+                if not cursor.fetchone()['obtenido']:
+                    print("⚠️ Otra reconciliación de estadísticas está en curso, se omite esta")
+                    return []
+                
+                try:
+                    if restaurante_id:
+                        restaurante_ids = [restaurante_id]
+                    else:
+                        cursor.execute("SELECT id FROM restaurantes ORDER BY id")
+                        restaurante_ids = [row['id'] for row in cursor.fetchall()]
+                        conn.commit()
+                    
+                    corregidas = []
+                    for r_id in restaurante_ids:
+                        corregidas.extend(
+                            DatabaseManager._reconciliar_restaurante(cursor, conn, r_id, desde, hasta)
+                        )
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (lock,))
+                    cursor.fetchall()
+            
+            if corregidas:
+                print(f"⚠️ Estadísticas diarias: {len(corregidas)} día(s) corregidos entre {desde} y {hasta}")
+            return corregidas
+        except Error as e:
+            print(f"❌ Error reconciliando estadísticas: {e}")
+            return None
+    
+    @staticmethod
+    def _reconciliar_restaurante(cursor, conn, restaurante_id, desde, hasta):
+        """
+        Corregir los contadores de un restaurante en [desde, hasta].
+        
+        Contadores y agregados se leen en una misma lectura consistente, sin
+        FOR UPDATE: las escrituras los actualizan en la misma transacción, así
+        que la diferencia entre ambos es la deriva. Esa diferencia se suma
+        después (c = c + diferencia) en una transacción que solo bloquea las
+        filas corregidas; lo que otras escrituras sumaron entre tanto se conserva.
+        Cada día corregido agrega un evento estadisticas_corregidas para el panel.
+        """
+        columnas = DatabaseManager.CONTADORES_DIARIOS
+        inicio, _ = DatabaseManager.rango_del_dia(desde)
+        _, fin = DatabaseManager.rango_del_dia(hasta)
+        vacia = dict.fromkeys(columnas, 0)
+        
+        try:
+            cursor.execute(f"""
+                SELECT fecha, {', '.join(columnas)}
+                FROM estadisticas_diarias
+                WHERE restaurante_id = %s AND fecha >= %s AND fecha <= %s
+            """, (restaurante_id, desde, hasta))
+            guardadas = {row['fecha']: row for row in cursor.fetchall()}
+            
+            calculadas = {}
+            cursor.execute(f"""
+                SELECT DATE(fecha_pedido) as fecha,
+                       COUNT(*) as pedidos,
+                       COALESCE(SUM(total), 0) as total_ventas,
+                       COALESCE(SUM(estado IN ({', '.join(['%s'] * len(ESTADOS_PEDIDO_CANCELADO))})), 0)
+                           as pedidos_cancelados
+                FROM pedidos
+                WHERE restaurante_id = %s AND fecha_pedido >= %s AND fecha_pedido < %s
+                GROUP BY DATE(fecha_pedido)
+            """, ESTADOS_PEDIDO_CANCELADO + (restaurante_id, inicio, fin))
+            for row in cursor.fetchall():
+                calculadas.setdefault(row['fecha'], dict(vacia)).update(
+                    pedidos=row['pedidos'], total_ventas=row['total_ventas'],
+                    pedidos_cancelados=row['pedidos_cancelados'])
+            
+            cursor.execute(f"""
+                SELECT fecha_reservacion as fecha,
+                       COUNT(*) as reservaciones,
+                       COALESCE(SUM(numero_personas), 0) as personas_reservadas,
+                       COALESCE(SUM(estado IN ({', '.join(['%s'] * len(ESTADOS_RESERVACION_CANCELADA))})), 0)
+                           as reservaciones_canceladas
+                FROM reservaciones
+                WHERE restaurante_id = %s AND fecha_reservacion >= %s AND fecha_reservacion <= %s
+                GROUP BY fecha_reservacion
+            """, ESTADOS_RESERVACION_CANCELADA + (restaurante_id, desde, hasta))
+            for row in cursor.fetchall():
+                calculadas.setdefault(row['fecha'], dict(vacia)).update(
+                    reservaciones=row['reservaciones'],
+                    personas_reservadas=row['personas_reservadas'],
+                    reservaciones_canceladas=row['reservaciones_canceladas'])
+            # Fin de la lectura consistente
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        
+        corregidas = []
+        for fecha in set(guardadas) | set(calculadas):
+            esperado = calculadas.get(fecha, vacia)
+            actual = guardadas.get(fecha)
+            diferencia = {c: esperado[c] - (actual[c] if actual else 0) for c in columnas}
+            if any(diferencia.values()):
+                corregidas.append({
+                    'restaurante_id': restaurante_id, 'fecha': fecha,
+                    'antes': {c: actual[c] for c in columnas} if actual else None,
+                    'despues': {c: esperado[c] for c in columnas},
+                    'diferencia': diferencia,
+                })
+        
+        if not corregidas:
+            return corregidas
+        
+        try:
+            cursor.executemany(f"""
+                INSERT INTO estadisticas_diarias (restaurante_id, fecha, {', '.join(columnas)})
+                VALUES (%s, %s, {', '.join(['%s'] * len(columnas))})
+                ON DUPLICATE KEY UPDATE
+                    {', '.join(f'{c} = {c} + VALUES({c})' for c in columnas)}
+            """, [
+                (restaurante_id, fila['fecha']) + tuple(fila['diferencia'][c] for c in columnas)
+                for fila in corregidas
+            ])
+            # Un evento por día corregido: cambia el ETag del dashboard y las
+            # pantallas abiertas recargan los contadores
+            for fila in corregidas:
+                DatabaseManager.registrar_evento(
+                    cursor, restaurante_id, 'estadisticas_corregidas', 0, fila['fecha'].isoformat()
+                )
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        return corregidas
 
 
 # Inicializar el pool al importar el módulo
@@ -0,0 +1,337 @@
+"""
+Base de los almacenes con expiración por inactividad y límite LRU
+La comparten las sesiones del chat web (web/session_store.py) y las
+conversaciones del bot (bot/conversation_store.py): cada registro expira
+tras ttl segundos sin usarse y, al pasar del máximo, se descarta el usado
+hace más tiempo. Un hilo en segundo plano purga los expirados aunque no
+lleguen mensajes nuevos.
+
+Backends:
+    MemoryExpiringStore   OrderedDict del proceso, del menos al más reciente
+    SQLiteExpiringStore   filas serializadas con pickle en un archivo SQLite
+                          (modo WAL), compartidas entre procesos y persistentes
+
+Cada almacén concreto define su interfaz pública sobre _leer, _escribir y
+_quitar, y en SQLite su tabla (TABLA, COLUMNAS_CLAVE) y su serialización.
+Los valores leídos pueden ser copias (SQLite): un leer-modificar-escribir
+se hace dentro de _lock_clave(clave) para no perder los cambios que otro
+hilo haga a la misma clave entre la lectura y la escritura.
+"""
+
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+# Como mucho cada cuántos segundos revisa expirados el hilo de limpieza
+LIMPIEZA_MAX_SEG = 300
+# Locks para leer-modificar-escribir una clave: cada clave usa uno según su hash
+LOCKS_CLAVE = 64
+
+
+class ExpiringStore(ABC):
+    """
+    Registros por clave con TTL y límite LRU.
+
+    al_descartar(clave, valor), si se indica, se llama por cada registro que
+    expira o se desaloja, fuera de cualquier lock.
+    """
+
+    def __init__(self, ttl, max_registros, al_descartar=None):
+        self.ttl = ttl
+        self.max_registros = max_registros
+        self.al_descartar = al_descartar
+        self.stats = {'hits': 0, 'misses': 0, 'expirados': 0, 'desalojados': 0}
+        self._hilo_limpieza = None
+        self._lock_hilo = threading.Lock()
+        # RLock: quien tiene el de una clave puede tomar el de otra que caiga en el mismo
+        self._locks_clave = [threading.RLock() for _ in range(LOCKS_CLAVE)]
+
+    @abstractmethod
+    def _leer(self, clave):
+        """Valor vigente de la clave (marcándolo como el más reciente), o None"""
+
+    @abstractmethod
+    def _escribir(self, clave, valor):
+        """Guardar (o reemplazar) el valor de la clave como el más reciente"""
+
+    @abstractmethod
+    def _quitar(self, clave):
+        """Borrar la clave, sin avisar a al_descartar"""
+
+    @abstractmethod
+    def purgar_expiradas(self):
+        """Eliminar los registros vencidos; retorna cuántos se eliminaron"""
+
+    @abstractmethod
+    def __len__(self):
+        """Registros en el almacén"""
+
+    def cerrar(self):
+        """Llamar al detener el proceso"""
+
+    def _lock_clave(self, clave):
+        """Lock de la clave para leer, modificar y volver a escribir su valor (entre hilos del proceso)"""
+        return self._locks_clave[hash(clave) % LOCKS_CLAVE]
+
+    def _descartados(self, registros):
+        """Avisar de los registros (clave, valor) expirados o desalojados"""
+        if self.al_descartar is None:
+            return
+        for clave, valor in registros:
+            try:
+                self.al_descartar(clave, valor)
+            except Exception as e:
+                print(f"⚠️ Error descartando el registro {clave}: {e}")
+
+    def _iniciar_limpieza(self):
+        """Sin escrituras nuevas nadie llamaría a purgar_expiradas: un hilo lo hace periódicamente"""
+        if self._hilo_limpieza is not None:
+            return
+        with self._lock_hilo:
+            if self._hilo_limpieza is not None:
+                return
+            self._hilo_limpieza = threading.Thread(target=self._bucle_limpieza,
+                                                   name=f'{type(self).__name__}-limpieza', daemon=True)
+            self._hilo_limpieza.start()
+
+    def _bucle_limpieza(self):
+        intervalo = max(1, min(self.ttl / 4, LIMPIEZA_MAX_SEG))
+        while True:
+            time.sleep(intervalo)
+            try:
+                self.purgar_expiradas()
+            except Exception as e:
+                print(f"⚠️ Error purgando {type(self).__name__}: {e}")
+
+
+class MemoryExpiringStore(ExpiringStore):
+    """Registros en un OrderedDict del proceso, del menos al más reciente"""
+
+    def __init__(self, ttl, max_registros, al_descartar=None):
+        super().__init__(ttl, max_registros, al_descartar)
+        self._registros = OrderedDict()  # clave -> (valor, ultimo_acceso)
+        self._lock = threading.Lock()
+
+    def _leer(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._registros.get(clave)
+            if entrada is None:
+                self.stats['misses'] += 1
+                return None
+
+            valor, ultimo_acceso = entrada
+            if ahora - ultimo_acceso <= self.ttl:
+                self._registros[clave] = (valor, ahora)
+                self._registros.move_to_end(clave)
+                self.stats['hits'] += 1
+                return valor
+
+            del self._registros[clave]
+            self.stats['expirados'] += 1
+            self.stats['misses'] += 1
+
+        self._descartados([(clave, valor)])
+        return None
+
+    def _escribir(self, clave, valor):
+        desalojados = []
+        with self._lock:
+            self._registros[clave] = (valor, time.monotonic())
+            self._registros.move_to_end(clave)
+
+            while len(self._registros) > self.max_registros:
+                vieja, (viejo, _) = self._registros.popitem(last=False)
+                desalojados.append((vieja, viejo))
+            self.stats['desalojados'] += len(desalojados)
+
+        self._descartados(desalojados)
+        self._iniciar_limpieza()
+
+    def _quitar(self, clave):
+        with self._lock:
+            self._registros.pop(clave, None)
+
+    def purgar_expiradas(self):
+        limite = time.monotonic() - self.ttl
+        expirados = []
+        with self._lock:
+            # Ordenados por último acceso: los expirados están al inicio
+            while self._registros:
+                clave, (valor, ultimo_acceso) = next(iter(self._registros.items()))
+                if ultimo_acceso > limite:
+                    break
+                del self._registros[clave]
+                expirados.append((clave, valor))
+            self.stats['expirados'] += len(expirados)
+
+        self._descartados(expirados)
+        return len(expirados)
+
+    def cerrar(self):
+        # Los registros no sobreviven al proceso: se descartan todos
+        with self._lock:
+            registros = [(clave, valor) for clave, (valor, _) in self._registros.items()]
+            self._registros.clear()
+        self._descartados(registros)
+
+    def __len__(self):
+        return len(self._registros)
+
+
+class SQLiteExpiringStore(ExpiringStore):
+    """
+    Registros serializados con pickle en un archivo SQLite en modo WAL, de
+    modo que varios procesos en la misma máquina ven los mismos registros y
+    sobreviven a reinicios.
+    """
+
+    # Definidos por cada almacén: tabla y columnas de la clave como (nombre, tipo)
+    TABLA = None
+    COLUMNAS_CLAVE = ()
+    # Cada cuántas escrituras se revisa el límite de registros
+    INTERVALO_LIMPIEZA = 200
+
+    def __init__(self, ruta, ttl, max_registros, al_descartar=None):
+        super().__init__(ttl, max_registros, al_descartar)
+        self.ruta = ruta
+        self._local = threading.local()
+        self._escrituras = 0
+
+        columnas = [nombre for nombre, _ in self.COLUMNAS_CLAVE]
+        self._columnas = ', '.join(columnas)
+        self._donde_clave = ' AND '.join(f"{nombre} = ?" for nombre in columnas)
+
+        conn = self._conexion()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLA} (
+                {', '.join(f'{nombre} {tipo} NOT NULL' for nombre, tipo in self.COLUMNAS_CLAVE)},
+                datos BLOB NOT NULL,
+                ultimo_acceso REAL NOT NULL,
+                PRIMARY KEY ({self._columnas})
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.TABLA}_ultimo_acceso ON {self.TABLA} (ultimo_acceso)")
+
+    def _conexion(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _serializar(self, valor):
+        return pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _deserializar(self, datos):
+        return pickle.loads(datos)
+
+    def _params_clave(self, clave):
+        return clave if len(self.COLUMNAS_CLAVE) > 1 else (clave,)
+
+    def _clave_de_fila(self, valores):
+        return tuple(valores) if len(self.COLUMNAS_CLAVE) > 1 else valores[0]
+
+    def _leer(self, clave):
+        conn = self._conexion()
+        fila = conn.execute(
+            f"SELECT datos, ultimo_acceso FROM {self.TABLA} WHERE {self._donde_clave}",
+            self._params_clave(clave)
+        ).fetchone()
+
+        if fila is None:
+            self.stats['misses'] += 1
+            return None
+
+        ahora = time.time()
+        expirado = ahora - fila[1] > self.ttl
+        if expirado and self.al_descartar is None:
+            # Nadie necesita el valor: no hace falta leerlo
+            self._quitar(clave)
+            self.stats['expirados'] += 1
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            valor = self._deserializar(fila[0])
+        except Exception as e:
+            print(f"⚠️ Registro de {self.TABLA} ilegible, se descarta: {e}")
+            self._quitar(clave)
+            self.stats['misses'] += 1
+            return None
+
+        if expirado:
+            self._quitar(clave)
+            self.stats['expirados'] += 1
+            self.stats['misses'] += 1
+            self._descartados([(clave, valor)])
+            return None
+
+        conn.execute(
+            f"UPDATE {self.TABLA} SET ultimo_acceso = ? WHERE {self._donde_clave}",
+            (ahora, *self._params_clave(clave))
+        )
+        self.stats['hits'] += 1
+        return valor
+
+    def _escribir(self, clave, valor):
+        marcas = ', '.join('?' * (len(self.COLUMNAS_CLAVE) + 2))
+        self._conexion().execute(
+            f"INSERT OR REPLACE INTO {self.TABLA} ({self._columnas}, datos, ultimo_acceso) VALUES ({marcas})",
+            (*self._params_clave(clave), self._serializar(valor), time.time())
+        )
+
+        self._escrituras += 1
+        if self._escrituras % self.INTERVALO_LIMPIEZA == 0:
+            self._aplicar_limite()
+        self._iniciar_limpieza()
+
+    def _quitar(self, clave):
+        self._conexion().execute(
+            f"DELETE FROM {self.TABLA} WHERE {self._donde_clave}", self._params_clave(clave)
+        )
+
+    def _sacar(self, condicion, params):
+        """Borrar las filas que cumplen la condición; retorna cuántas, avisando a al_descartar"""
+        conn = self._conexion()
+        if self.al_descartar is None:
+            cursor = conn.execute(f"DELETE FROM {self.TABLA} WHERE {condicion}", params)
+            return max(cursor.rowcount, 0)
+
+        n = len(self.COLUMNAS_CLAVE)
+        filas = conn.execute(
+            f"SELECT {self._columnas}, datos FROM {self.TABLA} WHERE {condicion}", params
+        ).fetchall()
+        registros = []
+        for fila in filas:
+            clave = self._clave_de_fila(fila[:n])
+            self._quitar(clave)
+            try:
+                registros.append((clave, self._deserializar(fila[n])))
+            except Exception:
+                pass
+        self._descartados(registros)
+        return len(filas)
+
+    def _aplicar_limite(self):
+        self.stats['desalojados'] += self._sacar(f"""
+            ({self._columnas}) IN (
+                SELECT {self._columnas} FROM {self.TABLA}
+                ORDER BY ultimo_acceso DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (self.max_registros,))
+
+    def purgar_expiradas(self):
+        expirados = self._sacar("ultimo_acceso < ?", (time.time() - self.ttl,))
+        self.stats['expirados'] += expirados
+        return expirados
+
+    def __len__(self):
+        return self._conexion().execute(f"SELECT COUNT(*) FROM {self.TABLA}").fetchone()[0]
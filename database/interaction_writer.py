@@ -0,0 +1,205 @@
+"""
+Escritura diferida (write-behind) de interacciones del chat
+Las interacciones se encolan en memoria y un hilo en segundo plano las
+inserta por lotes (INSERT de varias filas) cuando se junta un lote o pasa
+el intervalo máximo, así el request del chat no paga el INSERT + commit.
+
+fecha_interaccion se toma del reloj de la BD como en registrar_interaccion:
+cada fila guarda cuándo se encoló y al escribirse se resta ese tiempo en
+cola a NOW(), así la hora queda en la zona de la BD y no adelantada por la
+espera del lote.
+
+Si la BD rechaza un lote por sus datos (IntegrityError/DataError, p. ej.
+un cliente_id que ya no existe) el lote se reintenta fila por fila y solo
+se descartan las filas inválidas.
+
+Configuración por variables de entorno:
+    INTERACCIONES_LOTE          filas por INSERT (default: 100)
+    INTERACCIONES_INTERVALO     segundos máximos que una fila espera en cola (default: 1.0)
+    INTERACCIONES_COLA_MAX      tamaño máximo de la cola (default: 10000)
+    INTERACCIONES_ESPERA_MS     cuánto espera el request si la cola está llena
+                                antes de escribir él mismo (default: 50)
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+from database.database_multirestaurante import DatabaseManager
+
+INTERACCIONES_LOTE = int(os.getenv('INTERACCIONES_LOTE', 100))
+INTERACCIONES_INTERVALO = float(os.getenv('INTERACCIONES_INTERVALO', 1.0))
+INTERACCIONES_COLA_MAX = int(os.getenv('INTERACCIONES_COLA_MAX', 10000))
+INTERACCIONES_ESPERA_MS = float(os.getenv('INTERACCIONES_ESPERA_MS', 50))
+
+_FIN = object()
+
+
+class InteractionWriter:
+    """Cola acotada de interacciones con un hilo que las escribe por lotes"""
+
+    # Reintentos de un lote antes de descartarlo
+    MAX_REINTENTOS = 3
+
+    def __init__(self, tamano_lote=INTERACCIONES_LOTE, intervalo=INTERACCIONES_INTERVALO,
+                 cola_max=INTERACCIONES_COLA_MAX, espera_ms=INTERACCIONES_ESPERA_MS):
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.espera = espera_ms / 1000
+        self._cola = queue.Queue(maxsize=cola_max)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._detenido = False
+        self._ultimo_aviso = 0.0
+
+        self.stats = {
+            'encoladas': 0,
+            'escritas': 0,
+            'lotes': 0,
+            'escritas_sincronas': 0,   # cola llena: el request escribió directo
+            'descartadas': 0,          # lote fallido tras reintentos o fila rechazada
+            'errores': 0,
+            'profundidad_max': 0,
+            'espera_total_ms': 0.0,    # tiempo que los requests esperaron por cola llena
+        }
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(
+                    target=self._bucle, name='interaction-writer', daemon=True
+                )
+                self._hilo.start()
+
+    def registrar(self, cliente_id, mensaje, respuesta, tipo='web', restaurante_id=None):
+        """Encolar una interacción (misma firma que DatabaseManager.registrar_interaccion)"""
+        fila = (cliente_id, restaurante_id, mensaje, respuesta, tipo, time.monotonic())
+
+        if self._detenido:
+            return self._escribir_directo(fila)
+
+        if self._hilo is None:
+            self._iniciar()
+
+        inicio = time.perf_counter()
+        try:
+            self._cola.put(fila, timeout=self.espera)
+        except queue.Full:
+            # Contrapresión: si el escritor no da abasto, el request escribe
+            # él mismo en lugar de perder la interacción o crecer sin límite
+            self.stats['espera_total_ms'] += (time.perf_counter() - inicio) * 1000
+            self.stats['escritas_sincronas'] += 1
+            self._avisar_cola_llena()
+            return self._escribir_directo(fila)
+
+        self.stats['espera_total_ms'] += (time.perf_counter() - inicio) * 1000
+        self.stats['encoladas'] += 1
+        profundidad = self._cola.qsize()
+        if profundidad > self.stats['profundidad_max']:
+            self.stats['profundidad_max'] = profundidad
+        return True
+
+    def _avisar_cola_llena(self):
+        ahora = time.monotonic()
+        if ahora - self._ultimo_aviso > 30:
+            self._ultimo_aviso = ahora
+            print(f"⚠️ Cola de interacciones llena ({self._cola.maxsize}), escribiendo de forma síncrona")
+
+    def _bucle(self):
+        while True:
+            fila = self._cola.get()
+            if fila is _FIN:
+                return
+
+            lote = [fila]
+            limite = time.monotonic() + self.intervalo
+            fin = False
+
+            while len(lote) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    fila = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if fila is _FIN:
+                    fin = True
+                    break
+                lote.append(fila)
+
+            self._escribir(lote)
+            if fin:
+                return
+
+    @staticmethod
+    def _filas_bd(lote):
+        """Filas para registrar_interacciones_lote: la hora de encolado pasa a microsegundos en cola"""
+        ahora = time.monotonic()
+        return [fila[:5] + (int((ahora - fila[5]) * 1_000_000),) for fila in lote]
+
+    def _escribir_directo(self, fila):
+        return bool(DatabaseManager.registrar_interacciones_lote(self._filas_bd([fila])))
+
+    def _escribir(self, lote):
+        for intento in range(1, self.MAX_REINTENTOS + 1):
+            resultado = DatabaseManager.registrar_interacciones_lote(self._filas_bd(lote))
+            if resultado:
+                self.stats['escritas'] += len(lote)
+                self.stats['lotes'] += 1
+                return True
+
+            self.stats['errores'] += 1
+            if resultado is None:
+                # Datos rechazados: reintentar el mismo lote fallaría igual.
+                # Fila por fila, solo se pierden las que la BD no acepta
+                if len(lote) > 1:
+                    return all([self._escribir([fila]) for fila in lote])
+                break
+            time.sleep(0.5 * intento)
+
+        self.stats['descartadas'] += len(lote)
+        if len(lote) == 1 and resultado is None:
+            print("❌ Se descartó una interacción rechazada por la BD")
+        else:
+            print(f"❌ Se descartaron {len(lote)} interacciones tras {self.MAX_REINTENTOS} intentos")
+        return False
+
+    def detener(self, timeout=10):
+        """Escribir lo pendiente y detener el hilo (se llama al salir del proceso)"""
+        self._detenido = True
+        if self._hilo is None or not self._hilo.is_alive():
+            return
+
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+
+        # Si el hilo terminó antes de vaciar la cola, escribir el resto aquí
+        pendientes = []
+        while True:
+            try:
+                fila = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if fila is not _FIN:
+                pendientes.append(fila)
+
+        for i in range(0, len(pendientes), self.tamano_lote):
+            self._escribir(pendientes[i:i + self.tamano_lote])
+
+        print(f"✅ Escritor de interacciones detenido: {self.stats['escritas']} escritas, "
+              f"{self.stats['escritas_sincronas']} síncronas, {self.stats['descartadas']} descartadas")
+
+    def get_metricas(self):
+        """Métricas de la cola, incluida la profundidad actual"""
+        metricas = dict(self.stats)
+        metricas['en_cola'] = self._cola.qsize()
+        metricas['capacidad'] = self._cola.maxsize
+        return metricas
+
+
+# Instancia global
+interaction_writer = InteractionWriter()
+atexit.register(interaction_writer.detener)
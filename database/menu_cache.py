@@ -0,0 +1,151 @@
+"""
+Caché en memoria del menú por restaurante
+Mantiene un snapshot inmutable y versionado del catálogo de cada restaurante.
+El snapshot solo se reconstruye cuando el panel de administración modifica
+el menú (columna restaurantes.menu_version).
+"""
+
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from database.database_multirestaurante import DatabaseManager
+
+# Cada cuántos segundos se consulta la versión del menú en la BD.
+# El panel admin corre en otro proceso, así que la invalidación local
+# no le llega al servidor del chat; este chequeo barato la propaga.
+MENU_CACHE_CHECK_SECONDS = float(os.getenv('MENU_CACHE_CHECK_SECONDS', 5))
+
+
+def _congelar_item(item):
+    """Copia de solo lectura de un item (los ingredientes pasan a tupla)"""
+    item = dict(item)
+    if 'ingredientes' in item:
+        item['ingredientes'] = tuple(item['ingredientes'])
+    return MappingProxyType(item)
+
+
+class MenuSnapshot:
+    """Copia inmutable del menú de un restaurante en un momento dado"""
+
+    __slots__ = ('restaurante_id', 'version', 'categorias', 'creado_en', '_items_por_id')
+
+    def __init__(self, restaurante_id, version, menu_display):
+        self.restaurante_id = restaurante_id
+        self.version = version
+        self.creado_en = time.time()
+        # Misma forma que get_menu_completo_display pero de solo lectura
+        self.categorias = tuple(
+            MappingProxyType({
+                'categoria': MappingProxyType(dict(cat_data['categoria'])),
+                'items': tuple(_congelar_item(item) for item in cat_data['items'])
+            })
+            for cat_data in menu_display
+        )
+        self._items_por_id = {
+            item['id']: item
+            for cat_data in self.categorias
+            for item in cat_data['items']
+        }
+
+    def get_item(self, item_id):
+        """Item por id (None si no está en el menú)"""
+        return self._items_por_id.get(item_id)
+
+    def __len__(self):
+        return len(self.categorias)
+
+    def __iter__(self):
+        return iter(self.categorias)
+
+    def __getitem__(self, index):
+        return self.categorias[index]
+
+    def __bool__(self):
+        return bool(self.categorias)
+
+
+class _Entrada:
+    """Snapshot vigente y momento de la última verificación de versión"""
+
+    __slots__ = ('snapshot', 'verificado_en', 'lock')
+
+    def __init__(self):
+        self.snapshot = None
+        self.verificado_en = 0.0
+        self.lock = threading.Lock()
+
+
+class MenuCache:
+    """Caché de snapshots de menú por restaurante_id"""
+
+    def __init__(self, intervalo_verificacion=MENU_CACHE_CHECK_SECONDS):
+        self.intervalo_verificacion = intervalo_verificacion
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'reconstrucciones': 0, 'verificaciones': 0}
+
+    def _get_entrada(self, restaurante_id):
+        with self._lock:
+            entrada = self._entradas.get(restaurante_id)
+            if entrada is None:
+                entrada = _Entrada()
+                self._entradas[restaurante_id] = entrada
+            return entrada
+
+    def get_snapshot(self, restaurante_id):
+        """Obtener el snapshot vigente, reconstruyéndolo solo si cambió la versión"""
+        entrada = self._get_entrada(restaurante_id)
+        snapshot = entrada.snapshot
+
+        if snapshot is not None and time.monotonic() - entrada.verificado_en < self.intervalo_verificacion:
+            self.stats['hits'] += 1
+            return snapshot
+
+        with entrada.lock:
+            # Otro hilo pudo haberlo reconstruido mientras esperábamos
+            snapshot = entrada.snapshot
+            if snapshot is not None and time.monotonic() - entrada.verificado_en < self.intervalo_verificacion:
+                self.stats['hits'] += 1
+                return snapshot
+
+            self.stats['verificaciones'] += 1
+            version = DatabaseManager.get_menu_version(restaurante_id)
+
+            if snapshot is not None and version is not None and version == snapshot.version:
+                entrada.verificado_en = time.monotonic()
+                return snapshot
+
+            menu_display = DatabaseManager.get_catalogo_completo(restaurante_id)
+            if menu_display is None:
+                # Error de BD: nunca se guarda un menú vacío bajo una versión válida.
+                # Se sigue sirviendo el snapshot anterior y se reintenta en el
+                # próximo intervalo; sin snapshot previo se reintenta en la próxima llamada
+                if snapshot is not None:
+                    entrada.verificado_en = time.monotonic()
+                    return snapshot
+                return MenuSnapshot(restaurante_id, None, [])
+
+            snapshot = MenuSnapshot(restaurante_id, version, menu_display)
+            entrada.snapshot = snapshot
+            entrada.verificado_en = time.monotonic()
+            self.stats['reconstrucciones'] += 1
+
+            print(f"🔄 Menú en caché reconstruido para restaurante {restaurante_id} (versión {version})")
+            return snapshot
+
+    def get_menu(self, restaurante_id):
+        """Menú con la misma forma que DatabaseManager.get_menu_completo_display"""
+        return self.get_snapshot(restaurante_id)
+
+    def invalidar(self, restaurante_id):
+        """Marcar el menú como modificado (llamar tras editar categorías o items)"""
+        DatabaseManager.incrementar_menu_version(restaurante_id)
+
+        with self._lock:
+            self._entradas.pop(restaurante_id, None)
+
+
+# Instancia global
+menu_cache = MenuCache()
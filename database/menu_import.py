@@ -0,0 +1,543 @@
+"""
+Importación y exportación masiva del menú (CSV / JSON)
+Para dar de alta el catálogo de un restaurante nuevo sin crear los items
+uno por uno desde el panel: las filas se leen en streaming, se validan y
+se guardan por lotes, cada lote en una sola transacción (categorías
+faltantes, INSERT ... ON DUPLICATE KEY UPDATE de items por código e
+ingredientes con executemany). Cada lote sube menu_version en su misma
+transacción, así los cachés de menú ven los lotes ya guardados aunque la
+importación se interrumpa a la mitad.
+
+Formato de cada fila (una por producto):
+    categoria, categoria_display, codigo, nombre, descripcion, precio,
+    tiempo_preparacion, disponible, destacado, vegano, vegetariano,
+    sin_gluten, picante, orden, ingredientes
+
+Solo categoria, codigo, nombre y precio son obligatorios. Los items se
+identifican por codigo: si ya existe se actualiza con los datos de la
+fila. En CSV los ingredientes van separados por "|"; si la columna no
+viene, los ingredientes del item no se tocan.
+
+Formatos: csv, json (arreglo de filas) y jsonl (una fila JSON por línea).
+
+Uso desde la terminal:
+    python -m database.menu_import importar 1 menu.csv [--lote 200] [--simular]
+    python -m database.menu_import exportar 1 [--formato json] [-o menu.json]
+
+Configuración por variables de entorno:
+    MENU_IMPORT_LOTE    filas por transacción (default: 200)
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mysql.connector import Error
+
+from database.database_multirestaurante import DatabaseManager, get_db_cursor
+
+MENU_IMPORT_LOTE = int(os.getenv('MENU_IMPORT_LOTE', 200))
+
+COLUMNAS = [
+    'categoria', 'categoria_display', 'codigo', 'nombre', 'descripcion', 'precio',
+    'tiempo_preparacion', 'disponible', 'destacado', 'vegano', 'vegetariano',
+    'sin_gluten', 'picante', 'orden', 'ingredientes',
+]
+FORMATOS = ('csv', 'json', 'jsonl')
+
+CAMPOS_BOOLEANOS = ('disponible', 'destacado', 'vegano', 'vegetariano', 'sin_gluten', 'picante')
+SEPARADOR_INGREDIENTES = '|'
+
+# Máximo de errores que se reportan (el conteo sigue completo)
+MAX_ERRORES_REPORTADOS = 100
+
+_VERDADEROS = {'1', 'true', 'si', 'sí', 's', 'yes', 'y', 'x'}
+_FALSOS = {'0', 'false', 'no', 'n', ''}
+
+
+# ==================== LECTURA Y VALIDACIÓN ====================
+
+def leer_filas(flujo, formato='csv'):
+    """
+    Leer filas de un archivo de texto sin cargarlo completo (salvo json)
+    Genera (numero_linea, fila); fila es None si la línea no se pudo leer.
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(flujo)
+        for fila in lector:
+            yield lector.line_num, fila
+
+    elif formato == 'jsonl':
+        for numero, linea in enumerate(flujo, 1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = None
+            yield numero, fila if isinstance(fila, dict) else None
+
+    elif formato == 'json':
+        datos = json.load(flujo)
+        if isinstance(datos, dict):
+            datos = datos.get('items', [])
+        for numero, fila in enumerate(datos, 1):
+            yield numero, fila if isinstance(fila, dict) else None
+
+    else:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+
+def _texto(fila, campo, maximo=None, obligatorio=False):
+    valor = fila.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if obligatorio and not valor:
+        raise ValueError(f"falta '{campo}'")
+    if maximo and len(valor) > maximo:
+        raise ValueError(f"'{campo}' excede {maximo} caracteres")
+    return valor or None
+
+
+def _booleano(valor, default):
+    if valor is None:
+        return default
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in _VERDADEROS:
+        return True
+    if texto in _FALSOS:
+        return default if texto == '' else False
+    raise ValueError(f"valor booleano inválido: {valor!r}")
+
+
+def normalizar_fila(fila):
+    """
+    Validar una fila y llevarla a los tipos de la BD
+    Lanza ValueError con el motivo si la fila no es válida.
+    """
+    normalizada = {
+        'categoria': _texto(fila, 'categoria', 50, obligatorio=True),
+        'categoria_display': _texto(fila, 'categoria_display', 100),
+        'codigo': _texto(fila, 'codigo', 50, obligatorio=True),
+        'nombre': _texto(fila, 'nombre', 150, obligatorio=True),
+        'descripcion': _texto(fila, 'descripcion'),
+        'tiempo_preparacion': _texto(fila, 'tiempo_preparacion', 20),
+    }
+
+    try:
+        precio = Decimal(str(fila.get('precio', '')).strip().replace('$', '').replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"precio inválido: {fila.get('precio')!r}")
+    if not precio.is_finite() or precio < 0:
+        raise ValueError(f"precio inválido: {fila.get('precio')!r}")
+    normalizada['precio'] = precio.quantize(Decimal('0.01'))
+
+    for campo in CAMPOS_BOOLEANOS:
+        normalizada[campo] = _booleano(fila.get(campo), campo == 'disponible')
+
+    orden = fila.get('orden')
+    try:
+        normalizada['orden'] = int(orden) if orden not in (None, '') else 0
+    except (TypeError, ValueError):
+        raise ValueError(f"orden inválido: {orden!r}")
+
+    # None = no tocar los ingredientes existentes
+    ingredientes = fila.get('ingredientes')
+    if ingredientes is not None:
+        if isinstance(ingredientes, str):
+            ingredientes = ingredientes.split(SEPARADOR_INGREDIENTES)
+        ingredientes = [str(nombre).strip() for nombre in ingredientes if str(nombre).strip()]
+        for nombre in ingredientes:
+            if len(nombre) > 100:
+                raise ValueError(f"ingrediente excede 100 caracteres: {nombre[:20]}...")
+    normalizada['ingredientes'] = ingredientes
+
+    return normalizada
+
+
+# ==================== IMPORTACIÓN ====================
+
+class MenuImporter:
+    """Importa filas de menú de un restaurante por lotes transaccionales"""
+
+    def __init__(self, restaurante_id, tamano_lote=MENU_IMPORT_LOTE, simular=False, progreso=None):
+        """
+        Args:
+            restaurante_id: restaurante destino
+            tamano_lote: filas por transacción
+            simular: solo validar, sin escribir
+            progreso: callback(resumen) que se llama después de cada lote
+        """
+        self.restaurante_id = restaurante_id
+        self.tamano_lote = max(1, tamano_lote)
+        self.simular = simular
+        self.progreso = progreso
+
+        self._categorias = {}     # nombre en minúsculas -> (id, activo)
+        self._codigos = set()     # códigos de items que ya existen
+        self._lote = {}           # codigo -> (numero_linea, fila normalizada)
+        self._inicio = None
+
+        self.resumen = {
+            'filas': 0, 'validas': 0, 'insertados': 0, 'actualizados': 0,
+            'categorias_creadas': 0, 'lotes': 0, 'lotes_fallidos': 0,
+            'num_errores': 0, 'errores': [], 'segundos': 0.0, 'terminado': False,
+        }
+
+    def importar(self, filas):
+        """Procesar un iterable de (numero_linea, fila) y retornar el resumen"""
+        for resumen in self.por_lotes(filas):
+            if self.progreso:
+                self.progreso(resumen)
+        return self.resumen
+
+    def por_lotes(self, filas):
+        """
+        Igual que importar, pero como generador: entrega el resumen parcial
+        después de cada lote (el último tiene terminado=True)
+        """
+        self._inicio = time.perf_counter()
+        self._cargar_existentes()
+
+        for numero, fila in filas:
+            self.resumen['filas'] += 1
+            if fila is None:
+                self._error(numero, None, 'fila ilegible')
+                continue
+            try:
+                normalizada = normalizar_fila(fila)
+            except ValueError as e:
+                self._error(numero, fila.get('codigo'), str(e))
+                continue
+
+            self.resumen['validas'] += 1
+            # Si el código se repite dentro del lote gana la última fila
+            self._lote.pop(normalizada['codigo'], None)
+            self._lote[normalizada['codigo']] = (numero, normalizada)
+            if len(self._lote) >= self.tamano_lote:
+                self._vaciar_lote()
+                yield self.resumen
+
+        self._vaciar_lote()
+        self.resumen['terminado'] = True
+        self.resumen['segundos'] = round(time.perf_counter() - self._inicio, 3)
+
+        print(f"✅ Importación de menú (restaurante {self.restaurante_id}): "
+              f"{self.resumen['insertados']} nuevos, {self.resumen['actualizados']} actualizados, "
+              f"{self.resumen['categorias_creadas']} categorías nuevas, "
+              f"{self.resumen['num_errores']} errores en {self.resumen['segundos']}s")
+        yield self.resumen
+
+    def _error(self, numero, codigo, mensaje):
+        self.resumen['num_errores'] += 1
+        if len(self.resumen['errores']) < MAX_ERRORES_REPORTADOS:
+            self.resumen['errores'].append({'linea': numero, 'codigo': codigo, 'error': mensaje})
+
+    def _cargar_existentes(self):
+        with get_db_cursor() as (cursor, conn):
+            cursor.execute("""
+                SELECT id, nombre, activo FROM categorias_menu WHERE restaurante_id = %s
+            """, (self.restaurante_id,))
+            for row in cursor.fetchall():
+                self._categorias.setdefault(row['nombre'].lower(), (row['id'], bool(row['activo'])))
+
+            cursor.execute("""
+                SELECT codigo FROM items_menu WHERE restaurante_id = %s
+            """, (self.restaurante_id,))
+            self._codigos = {row['codigo'] for row in cursor.fetchall()}
+
+    def _vaciar_lote(self):
+        if not self._lote:
+            return
+        lote = list(self._lote.values())
+        self._lote = {}
+        self.resumen['lotes'] += 1
+
+        nuevos = sum(1 for _, fila in lote if fila['codigo'] not in self._codigos)
+        if self.simular:
+            self.resumen['insertados'] += nuevos
+            self.resumen['actualizados'] += len(lote) - nuevos
+        else:
+            try:
+                self._escribir_lote(lote)
+                self.resumen['insertados'] += nuevos
+                self.resumen['actualizados'] += len(lote) - nuevos
+            except Error as e:
+                self.resumen['lotes_fallidos'] += 1
+                print(f"❌ Error importando lote {self.resumen['lotes']}: {e}")
+                for numero, fila in lote:
+                    self._error(numero, fila['codigo'], f"lote revertido: {e}")
+
+        self.resumen['segundos'] = round(time.perf_counter() - self._inicio, 3)
+
+    def _escribir_lote(self, lote):
+        """Categorías, items e ingredientes del lote en una sola transacción"""
+        with get_db_cursor() as (cursor, conn):
+            try:
+                categorias = self._asegurar_categorias(cursor, lote)
+
+                cursor.executemany("""
+                    INSERT INTO items_menu
+                    (restaurante_id, categoria_id, codigo, nombre, descripcion, precio,
+                     tiempo_preparacion, disponible, destacado, vegano, vegetariano,
+                     sin_gluten, picante, orden)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        categoria_id = VALUES(categoria_id), nombre = VALUES(nombre),
+                        descripcion = VALUES(descripcion), precio = VALUES(precio),
+                        tiempo_preparacion = VALUES(tiempo_preparacion),
+                        disponible = VALUES(disponible), destacado = VALUES(destacado),
+                        vegano = VALUES(vegano), vegetariano = VALUES(vegetariano),
+                        sin_gluten = VALUES(sin_gluten), picante = VALUES(picante),
+                        orden = VALUES(orden)
+                """, [
+                    (
+                        self.restaurante_id, categorias[fila['categoria'].lower()][0],
+                        fila['codigo'], fila['nombre'], fila['descripcion'], fila['precio'],
+                        fila['tiempo_preparacion'], fila['disponible'], fila['destacado'],
+                        fila['vegano'], fila['vegetariano'], fila['sin_gluten'],
+                        fila['picante'], fila['orden'],
+                    )
+                    for _, fila in lote
+                ])
+
+                con_ingredientes = {fila['codigo']: fila['ingredientes'] for _, fila in lote
+                                    if fila['ingredientes'] is not None}
+                if con_ingredientes:
+                    codigos = list(con_ingredientes)
+                    cursor.execute(f"""
+                        SELECT id, codigo FROM items_menu
+                        WHERE restaurante_id = %s AND codigo IN ({', '.join(['%s'] * len(codigos))})
+                    """, [self.restaurante_id] + codigos)
+                    DatabaseManager._escribir_ingredientes(cursor, {
+                        row['id']: con_ingredientes[row['codigo']] for row in cursor.fetchall()
+                    }, modo='diff')
+
+                # Igual que DatabaseManager.incrementar_menu_version, pero en la
+                # transacción del lote: la versión sube si y solo si el lote se guarda
+                cursor.execute("""
+                    UPDATE restaurantes
+                    SET menu_version = menu_version + 1
+                    WHERE id = %s
+                """, (self.restaurante_id,))
+
+                conn.commit()
+            except Error:
+                conn.rollback()
+                raise
+
+        # Solo después del commit: si el lote se revierte el estado no cambia
+        self._categorias.update(categorias)
+        self._codigos.update(fila['codigo'] for _, fila in lote)
+
+    def _asegurar_categorias(self, cursor, lote):
+        """Crear las categorías que falten y reactivar las desactivadas"""
+        categorias = {}
+        faltantes = {}
+        for _, fila in lote:
+            clave = fila['categoria'].lower()
+            if clave in categorias or clave in faltantes:
+                continue
+            if clave in self._categorias:
+                categorias[clave] = self._categorias[clave]
+            else:
+                faltantes[clave] = fila
+
+        if faltantes:
+            orden_base = len(self._categorias)
+            cursor.executemany("""
+                INSERT INTO categorias_menu (restaurante_id, nombre, nombre_display, orden)
+                VALUES (%s, %s, %s, %s)
+            """, [
+                (self.restaurante_id, fila['categoria'],
+                 fila['categoria_display'] or fila['categoria'], orden_base + i)
+                for i, fila in enumerate(faltantes.values(), 1)
+            ])
+            nombres = [fila['categoria'] for fila in faltantes.values()]
+            cursor.execute(f"""
+                SELECT id, nombre FROM categorias_menu
+                WHERE restaurante_id = %s AND nombre IN ({', '.join(['%s'] * len(nombres))})
+                ORDER BY id DESC
+            """, [self.restaurante_id] + nombres)
+            for row in cursor.fetchall():
+                categorias.setdefault(row['nombre'].lower(), (row['id'], True))
+            self.resumen['categorias_creadas'] += len(faltantes)
+
+        inactivas = [cat_id for cat_id, activo in categorias.values() if not activo]
+        if inactivas:
+            cursor.execute(f"""
+                UPDATE categorias_menu SET activo = TRUE
+                WHERE id IN ({', '.join(['%s'] * len(inactivas))})
+            """, inactivas)
+            categorias = {clave: (cat_id, True) for clave, (cat_id, _) in categorias.items()}
+
+        return categorias
+
+
+def importar_menu(restaurante_id, flujo, formato='csv', tamano_lote=MENU_IMPORT_LOTE,
+                  simular=False, progreso=None):
+    """Importar un archivo de texto abierto; retorna el resumen"""
+    importador = MenuImporter(restaurante_id, tamano_lote, simular, progreso)
+    return importador.importar(leer_filas(flujo, formato))
+
+
+# ==================== EXPORTACIÓN ====================
+
+def exportar_menu(restaurante_id, formato='csv', filas_por_bloque=500):
+    """
+    Generar el menú como texto, por bloques, en el mismo formato que acepta
+    la importación (sirve como plantilla o respaldo)
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+    try:
+        with get_db_cursor() as (cursor, conn):
+            # Los ingredientes primero: el cursor de items se lee en streaming
+            cursor.execute("""
+                SELECT ing.item_id, ing.nombre
+                FROM ingredientes ing
+                INNER JOIN items_menu i ON ing.item_id = i.id
+                WHERE i.restaurante_id = %s
+                ORDER BY ing.item_id, ing.orden, ing.id
+            """, (restaurante_id,))
+            ingredientes_por_item = {}
+            for row in cursor.fetchall():
+                ingredientes_por_item.setdefault(row['item_id'], []).append(row['nombre'])
+
+            cursor.execute("""
+                SELECT
+                    i.id, c.nombre as categoria, c.nombre_display as categoria_display,
+                    i.codigo, i.nombre, i.descripcion, i.precio, i.tiempo_preparacion,
+                    i.disponible, i.destacado, i.vegano, i.vegetariano,
+                    i.sin_gluten, i.picante, i.orden
+                FROM items_menu i
+                INNER JOIN categorias_menu c ON i.categoria_id = c.id
+                WHERE i.restaurante_id = %s AND c.activo = TRUE
+                ORDER BY c.orden, c.id, i.orden, i.nombre
+            """, (restaurante_id,))
+
+            try:
+                yield from _serializar_bloques(cursor, formato, filas_por_bloque, ingredientes_por_item)
+            finally:
+                # Si quien consume se detiene antes (cliente desconectado),
+                # leer el resto para devolver la conexión limpia al pool
+                if conn.unread_result:
+                    cursor.fetchall()
+
+    except Error as e:
+        print(f"❌ Error exportando menú del restaurante {restaurante_id}: {e}")
+
+
+def _serializar_bloques(cursor, formato, filas_por_bloque, ingredientes_por_item):
+    """Convertir las filas del cursor a texto, un bloque de filas por yield"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    primero = True
+
+    if formato == 'csv':
+        escritor.writerow(COLUMNAS)
+    elif formato == 'json':
+        buffer.write('[')
+
+    while True:
+        bloque = cursor.fetchmany(filas_por_bloque)
+        if not bloque:
+            break
+
+        for row in bloque:
+            row['ingredientes'] = ingredientes_por_item.get(row.pop('id'), [])
+            if formato == 'csv':
+                escritor.writerow([
+                    int(bool(row[columna])) if columna in CAMPOS_BOOLEANOS
+                    else SEPARADOR_INGREDIENTES.join(row[columna]) if columna == 'ingredientes'
+                    else '' if row[columna] is None else row[columna]
+                    for columna in COLUMNAS
+                ])
+            else:
+                row['precio'] = float(row['precio'])
+                for campo in CAMPOS_BOOLEANOS:
+                    row[campo] = bool(row[campo])
+                texto = json.dumps({columna: row[columna] for columna in COLUMNAS},
+                                   ensure_ascii=False)
+                if formato == 'json':
+                    buffer.write(('\n' if primero else ',\n') + texto)
+                else:
+                    buffer.write(texto + '\n')
+            primero = False
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if formato == 'json':
+        buffer.write('\n]\n' if not primero else ']\n')
+    yield buffer.getvalue()
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importar / exportar el menú de un restaurante')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p_importar = subparsers.add_parser('importar', help='Importar items desde CSV/JSON')
+    p_importar.add_argument('restaurante_id', type=int)
+    p_importar.add_argument('archivo', help="Ruta del archivo ('-' para stdin)")
+    p_importar.add_argument('--formato', choices=FORMATOS,
+                            help='Por defecto se deduce de la extensión')
+    p_importar.add_argument('--lote', type=int, default=MENU_IMPORT_LOTE)
+    p_importar.add_argument('--simular', action='store_true', help='Solo validar, sin escribir')
+
+    p_exportar = subparsers.add_parser('exportar', help='Exportar el menú a CSV/JSON')
+    p_exportar.add_argument('restaurante_id', type=int)
+    p_exportar.add_argument('--formato', choices=FORMATOS, default='csv')
+    p_exportar.add_argument('-o', '--salida', help='Archivo de salida (stdout por defecto)')
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'importar':
+        formato = args.formato or os.path.splitext(args.archivo)[1].lstrip('.').lower() or 'csv'
+        if formato not in FORMATOS:
+            parser.error(f"No se pudo deducir el formato de {args.archivo}; usa --formato")
+
+        def mostrar_progreso(resumen):
+            print(f"📦 Lote {resumen['lotes']}: {resumen['filas']} filas leídas, "
+                  f"{resumen['insertados']} nuevos, {resumen['actualizados']} actualizados, "
+                  f"{resumen['num_errores']} errores ({resumen['segundos']}s)")
+
+        if args.archivo == '-':
+            flujo = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+            resumen = importar_menu(args.restaurante_id, flujo, formato, args.lote,
+                                    args.simular, mostrar_progreso)
+        else:
+            with open(args.archivo, encoding='utf-8-sig', newline='') as flujo:
+                resumen = importar_menu(args.restaurante_id, flujo, formato, args.lote,
+                                        args.simular, mostrar_progreso)
+
+        for error in resumen['errores']:
+            print(f"   ⚠️ Línea {error['linea']} ({error['codigo'] or 'sin código'}): {error['error']}")
+        return 1 if resumen['num_errores'] else 0
+
+    salida = open(args.salida, 'w', encoding='utf-8', newline='') if args.salida else sys.stdout
+    try:
+        for bloque in exportar_menu(args.restaurante_id, args.formato):
+            salida.write(bloque)
+    finally:
+        if args.salida:
+            salida.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
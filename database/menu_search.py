@@ -0,0 +1,356 @@
+"""
+Índice invertido para búsqueda de items del menú
+Se construye una vez a partir del snapshot de menu_cache y se actualiza de
+forma incremental (solo los items que cambiaron) cuando sube la versión del
+menú. Una búsqueda cuesta unas cuantas búsquedas en diccionario en lugar de
+leer la tabla items_menu y normalizar cada item en Python.
+
+Las palabras que no aparecen tal cual ("carbonra", "lazaña") se resuelven con
+un índice de trigramas sobre el vocabulario: los trigramas compartidos filtran
+candidatos y solo esos se comparan con distancia de edición.
+
+Un índice publicado no se modifica: la actualización se aplica a una copia
+que luego reemplaza a la anterior, así que las búsquedas no toman ningún
+lock y una búsqueda en curso sigue con el índice que tenía.
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from operator import itemgetter
+
+from database.menu_cache import menu_cache
+
+# Peso de cada campo en el puntaje de un item
+PESO_NOMBRE = 3.0
+PESO_CATEGORIA = 1.5
+PESO_DESCRIPCION = 1.0
+PESO_INGREDIENTE = 0.8
+
+# Un prefijo vale menos que la palabra completa
+FACTOR_PREFIJO = 0.6
+
+# Longitud mínima para buscar por prefijo ("piz" -> "pizza")
+MIN_LONGITUD_PREFIJO = 3
+
+# Coincidencia aproximada: palabras de 4+ letras toleran 1 error,
+# de 8+ letras toleran 2
+MIN_LONGITUD_DIFUSA = 4
+LONGITUD_DOS_ERRORES = 8
+FACTOR_DIFUSO = 0.5
+
+# Palabras que no aportan a la búsqueda
+PALABRAS_VACIAS = frozenset({
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los',
+    'para', 'por', 'que', 'un', 'una', 'unos', 'unas', 'y', 'o', 'sin',
+    'quiero', 'dame', 'pedir', 'ordenar', 'favor', 'me', 'gustaria',
+})
+
+_RE_PALABRA = re.compile(r'[a-z0-9ñ]+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes"""
+    texto = (texto or '').lower()
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', texto)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+def tokenizar(texto):
+    """Palabras normalizadas de un texto"""
+    return _RE_PALABRA.findall(normalizar(texto))
+
+
+def trigramas(palabra):
+    """Trigramas de una palabra con relleno ('$$pan$' -> $$p, $pa, pan, an$)"""
+    palabra = f"$${palabra}$"
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+def distancia_edicion(a, b, maximo):
+    """
+    Distancia de Damerau-Levenshtein (transposiciones adyacentes incluidas).
+    Retorna maximo + 1 en cuanto se sabe que la distancia excede el máximo.
+    """
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        minimo_fila = i
+        for j in range(1, len(b) + 1):
+            costo = 0 if a[i - 1] == b[j - 1] else 1
+            valor = min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + costo
+            )
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2]
+                    and a[i - 2] == b[j - 1]):
+                valor = min(valor, anterior2[j - 2] + 1)
+            actual[j] = valor
+            if valor < minimo_fila:
+                minimo_fila = valor
+        if minimo_fila > maximo:
+            return maximo + 1
+        anterior2, anterior = anterior, actual
+
+    return anterior[len(b)]
+
+
+def errores_permitidos(palabra):
+    if len(palabra) < MIN_LONGITUD_DIFUSA:
+        return 0
+    return 2 if len(palabra) >= LONGITUD_DOS_ERRORES else 1
+
+
+class IndiceMenu:
+    """Índice invertido de los items de un restaurante (inmutable una vez publicado, ver copia)"""
+
+    def __init__(self):
+        self.snapshot = None
+        self.items = {}             # item_id -> dict del item (con categoria_nombre)
+        self._firmas = {}           # item_id -> item del snapshot, para detectar cambios
+        self._tokens_item = {}      # item_id -> {token: peso}
+        self._postings = {}         # token -> {item_id: peso}
+        self._vocabulario = []      # tokens ordenados para búsqueda por prefijo
+        self._vocabulario_sucio = False
+        self._trigramas = {}        # trigrama -> {token}
+        self._no_disponibles = set()
+
+    # ---------- Construcción ----------
+
+    def copia(self):
+        """Índice independiente con el mismo contenido, para actualizarlo sin tocar este"""
+        nuevo = IndiceMenu()
+        nuevo.snapshot = self.snapshot
+        nuevo.items = dict(self.items)
+        nuevo._firmas = dict(self._firmas)
+        nuevo._tokens_item = dict(self._tokens_item)
+        nuevo._postings = {token: dict(posting) for token, posting in self._postings.items()}
+        nuevo._vocabulario = self._vocabulario
+        nuevo._trigramas = {trigrama: set(tokens) for trigrama, tokens in self._trigramas.items()}
+        nuevo._no_disponibles = set(self._no_disponibles)
+        return nuevo
+
+    def actualizar(self, snapshot):
+        """Sincronizar el índice con un snapshot nuevo; retorna cuántos items cambiaron"""
+        vigentes = {}
+        for cat_data in snapshot:
+            categoria = cat_data['categoria']
+            for item in cat_data['items']:
+                vigentes[item['id']] = (item, categoria)
+
+        cambios = 0
+        for item_id in list(self._firmas):
+            if item_id not in vigentes:
+                self._quitar(item_id)
+                cambios += 1
+
+        for item_id, (item, categoria) in vigentes.items():
+            anterior = self._firmas.get(item_id)
+            if anterior is not None and anterior == item and \
+                    self.items[item_id]['categoria_nombre'] == categoria['nombre']:
+                continue
+            if anterior is not None:
+                self._quitar(item_id)
+            self._agregar(item, categoria)
+            cambios += 1
+
+        if self._vocabulario_sucio:
+            # Se ordena aquí y no al buscar: las búsquedas solo leen
+            self._vocabulario = sorted(self._postings)
+            self._vocabulario_sucio = False
+        self.snapshot = snapshot
+        return cambios
+
+    def _agregar(self, item, categoria):
+        item_id = item['id']
+        datos = dict(item)
+        datos['categoria_nombre'] = categoria['nombre']
+        if 'ingredientes' in datos:
+            datos['ingredientes'] = list(datos['ingredientes'])
+
+        pesos = {}
+        campos = (
+            (' '.join(item.get('ingredientes', ())), PESO_INGREDIENTE),
+            (item.get('descripcion'), PESO_DESCRIPCION),
+            (categoria.get('nombre_display') or categoria['nombre'], PESO_CATEGORIA),
+            (item['nombre'], PESO_NOMBRE),
+        )
+        for texto, peso in campos:
+            for token in tokenizar(texto):
+                if peso > pesos.get(token, 0):
+                    pesos[token] = peso
+
+        for token, peso in pesos.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                self._vocabulario_sucio = True
+                for trigrama in trigramas(token):
+                    self._trigramas.setdefault(trigrama, set()).add(token)
+            posting[item_id] = peso
+
+        self.items[item_id] = datos
+        self._firmas[item_id] = item
+        if not datos.get('disponible', True):
+            self._no_disponibles.add(item_id)
+        self._tokens_item[item_id] = pesos
+
+    def _quitar(self, item_id):
+        for token in self._tokens_item.pop(item_id, {}):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(item_id, None)
+            if not posting:
+                del self._postings[token]
+                self._vocabulario_sucio = True
+                for trigrama in trigramas(token):
+                    tokens = self._trigramas.get(trigrama)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._trigramas[trigrama]
+        self.items.pop(item_id, None)
+        self._firmas.pop(item_id, None)
+        self._no_disponibles.discard(item_id)
+
+    # ---------- Consulta ----------
+
+    def _tokens_con_prefijo(self, prefijo):
+        vocabulario = self._vocabulario
+        for i in range(bisect_left(vocabulario, prefijo), len(vocabulario)):
+            if not vocabulario[i].startswith(prefijo):
+                break
+            yield vocabulario[i]
+
+    def tokens_similares(self, palabra):
+        """
+        Tokens del vocabulario a distancia de edición permitida de la palabra.
+        Retorna [(token, distancia)].
+        """
+        maximo = errores_permitidos(palabra)
+        if not maximo:
+            return []
+
+        propios = trigramas(palabra)
+        # Cada error destruye a lo más 4 trigramas (transposición)
+        minimo_comunes = len(propios) - 4 * maximo
+
+        comunes = Counter()
+        for trigrama in propios:
+            tokens = self._trigramas.get(trigrama)
+            if tokens:
+                comunes.update(tokens)
+
+        similares = []
+        for token, compartidos in comunes.items():
+            if compartidos < minimo_comunes or abs(len(token) - len(palabra)) > maximo:
+                continue
+            distancia = distancia_edicion(palabra, token, maximo)
+            if distancia <= maximo:
+                similares.append((token, distancia))
+        return similares
+
+    def puntuar(self, texto):
+        """Retorna {item_id: puntaje} para las palabras del texto"""
+        palabras = [p for p in tokenizar(texto) if p not in PALABRAS_VACIAS]
+        if not palabras:
+            # Solo palabras vacías: usar el texto tal cual
+            palabras = tokenizar(texto)
+
+        puntajes = {}
+        for palabra in dict.fromkeys(palabras):
+            mejores = dict(self._postings.get(palabra, {}))
+
+            if len(palabra) >= MIN_LONGITUD_PREFIJO:
+                for token in self._tokens_con_prefijo(palabra):
+                    if token == palabra:
+                        continue
+                    for item_id, peso in self._postings[token].items():
+                        peso *= FACTOR_PREFIJO
+                        if peso > mejores.get(item_id, 0):
+                            mejores[item_id] = peso
+
+            if not mejores:
+                # Sin coincidencia exacta ni por prefijo: tolerar errores de dedo
+                for token, distancia in self.tokens_similares(palabra):
+                    factor = FACTOR_DIFUSO * (1 - distancia / (len(palabra) + 1))
+                    for item_id, peso in self._postings[token].items():
+                        peso *= factor
+                        if peso > mejores.get(item_id, 0):
+                            mejores[item_id] = peso
+
+            for item_id, peso in mejores.items():
+                puntajes[item_id] = puntajes.get(item_id, 0) + peso
+
+        return puntajes
+
+    def buscar(self, texto, limite=5, solo_disponibles=True):
+        """Items ordenados por relevancia, con 'score' y 'categoria_nombre'"""
+        puntajes = self.puntuar(texto)
+
+        if solo_disponibles:
+            puntajes = {
+                item_id: score for item_id, score in puntajes.items()
+                if item_id not in self._no_disponibles
+            }
+        if limite:
+            candidatos = heapq.nlargest(limite, puntajes.items(), key=itemgetter(1))
+        else:
+            candidatos = sorted(puntajes.items(), key=itemgetter(1), reverse=True)
+
+        # Copiar solo los items que se van a devolver
+        resultados = []
+        for item_id, score in candidatos:
+            resultado = dict(self.items[item_id])
+            resultado['score'] = round(score, 2)
+            resultados.append(resultado)
+        return resultados
+
+
+class BuscadorMenu:
+    """Índices de búsqueda por restaurante_id, sincronizados con menu_cache"""
+
+    def __init__(self, cache=menu_cache):
+        self.cache = cache
+        self._indices = {}
+        self._lock = threading.Lock()
+
+    def get_indice(self, restaurante_id):
+        """
+        Índice vigente; si menu_cache entregó un snapshot nuevo se actualiza una
+        copia y se reemplaza (el lock solo cubre ese reemplazo, no las búsquedas)
+        """
+        snapshot = self.cache.get_snapshot(restaurante_id)
+        indice = self._indices.get(restaurante_id)
+        if indice is not None and indice.snapshot is snapshot:
+            return indice
+
+        with self._lock:
+            indice = self._indices.get(restaurante_id)
+            if indice is None or indice.snapshot is not snapshot:
+                indice = indice.copia() if indice is not None else IndiceMenu()
+                cambios = indice.actualizar(snapshot)
+                self._indices[restaurante_id] = indice
+                print(f"🔎 Índice de búsqueda actualizado para restaurante {restaurante_id} ({cambios} items)")
+
+            return indice
+
+    def buscar(self, restaurante_id, texto, limite=5, solo_disponibles=True):
+        """Buscar items del menú por palabras clave (sin tildes, por prefijo, con errores de dedo)"""
+        indice = self.get_indice(restaurante_id)
+        return indice.buscar(texto, limite=limite, solo_disponibles=solo_disponibles)
+
+
+# Instancia global
+buscador_menu = BuscadorMenu()
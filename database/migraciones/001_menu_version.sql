@@ -0,0 +1,7 @@
+-- MIGRACIÓN 001: versión del menú por restaurante
+-- Permite que el servidor del chat mantenga el menú en caché y solo lo
+-- recargue cuando el panel de administración lo modifica.
+USE sistema_restaurantes;
+
+ALTER TABLE restaurantes
+    ADD COLUMN menu_version INT NOT NULL DEFAULT 0;
@@ -0,0 +1,12 @@
+-- MIGRACIÓN 002: índices compuestos por restaurante y fecha
+-- Las estadísticas del día (get_estadisticas_hoy) filtran por rango de
+-- fecha dentro de un restaurante; con estos índices leen solo las filas
+-- del día en lugar de todo el historial del restaurante. El de pedidos
+-- también sirve al ORDER BY fecha_pedido DESC LIMIT de los pedidos recientes.
+USE sistema_restaurantes;
+
+ALTER TABLE pedidos
+    ADD INDEX idx_restaurante_fecha (restaurante_id, fecha_pedido);
+
+ALTER TABLE reservaciones
+    ADD INDEX idx_restaurante_fecha (restaurante_id, fecha_reservacion);
@@ -0,0 +1,44 @@
+-- MIGRACIÓN 003: contadores diarios por restaurante
+-- El dashboard consulta las estadísticas del día cada pocos segundos; en
+-- lugar de COUNT/SUM sobre pedidos y reservaciones, lee una fila de esta
+-- tabla, que las escrituras de DatabaseManager actualizan por incremento.
+-- database/stats_reconciler.py corrige la deriva periódicamente.
+--
+-- Obligatoria: las escrituras de pedidos y reservaciones actualizan esta
+-- tabla en su misma transacción y fallan si no existe.
+--
+-- Pedidos: por día de fecha_pedido. Reservaciones: por fecha_reservacion
+-- (el día para el que son).
+USE sistema_restaurantes;
+
+CREATE TABLE estadisticas_diarias (
+    restaurante_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    pedidos INT NOT NULL DEFAULT 0,
+    total_ventas DECIMAL(12,2) NOT NULL DEFAULT 0,
+    pedidos_cancelados INT NOT NULL DEFAULT 0,
+    reservaciones INT NOT NULL DEFAULT 0,
+    personas_reservadas INT NOT NULL DEFAULT 0,
+    reservaciones_canceladas INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (restaurante_id, fecha),
+    FOREIGN KEY (restaurante_id) REFERENCES restaurantes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Carga inicial con el historial existente
+INSERT INTO estadisticas_diarias (restaurante_id, fecha, pedidos, total_ventas, pedidos_cancelados)
+SELECT restaurante_id, DATE(fecha_pedido), COUNT(*), COALESCE(SUM(total), 0),
+       SUM(estado IN ('cancelado', 'cancelado_pago'))
+FROM pedidos
+GROUP BY restaurante_id, DATE(fecha_pedido);
+
+INSERT INTO estadisticas_diarias
+    (restaurante_id, fecha, reservaciones, personas_reservadas, reservaciones_canceladas)
+SELECT restaurante_id, fecha_reservacion, COUNT(*), COALESCE(SUM(numero_personas), 0),
+       SUM(estado = 'cancelada')
+FROM reservaciones
+GROUP BY restaurante_id, fecha_reservacion
+ON DUPLICATE KEY UPDATE
+    reservaciones = VALUES(reservaciones),
+    personas_reservadas = VALUES(personas_reservadas),
+    reservaciones_canceladas = VALUES(reservaciones_canceladas);
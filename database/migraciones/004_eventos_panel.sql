@@ -0,0 +1,22 @@
+-- MIGRACIÓN 004: eventos de cambios para el panel de administración
+-- Los pedidos y reservaciones se crean y cambian de estado en el servidor
+-- del chat y en el bot, que son procesos distintos al panel. Cada escritura
+-- de DatabaseManager agrega aquí un evento en su misma transacción; el panel
+-- (web/admin_events.py) lee los nuevos con una sola consulta por id y los
+-- empuja por Server-Sent Events a las pantallas abiertas del restaurante.
+-- Los eventos de más de EVENTOS_RETENCION_HORAS se purgan solos.
+--
+-- Obligatoria: las escrituras de pedidos y reservaciones agregan su evento
+-- en su misma transacción y fallan si la tabla no existe.
+USE sistema_restaurantes;
+
+CREATE TABLE eventos_panel (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    restaurante_id INT NOT NULL,
+    tipo VARCHAR(30) NOT NULL,
+    entidad_id INT NOT NULL,
+    estado VARCHAR(30),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_restaurante_id (restaurante_id, id),
+    INDEX idx_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
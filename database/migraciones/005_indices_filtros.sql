@@ -0,0 +1,16 @@
+-- MIGRACIÓN 005: índices para filtrar y paginar pedidos y reservaciones
+-- Las páginas /pedidos y /reservaciones paginan por clave y filtran en SQL
+-- (buscar_pedidos, buscar_reservaciones). Con estos índices cada página lee
+-- solo sus filas, también con filtro por estado, en lugar de recorrer el
+-- historial del restaurante. InnoDB agrega el id al final de cada índice,
+-- así que cubren el desempate (fecha, id) del cursor.
+--
+-- Pedidos sin filtro de estado ya usan idx_restaurante_fecha (migración 002).
+USE sistema_restaurantes;
+
+ALTER TABLE pedidos
+    ADD INDEX idx_restaurante_estado_fecha (restaurante_id, estado, fecha_pedido);
+
+ALTER TABLE reservaciones
+    ADD INDEX idx_restaurante_creada (restaurante_id, created_at),
+    ADD INDEX idx_restaurante_estado_creada (restaurante_id, estado, created_at);
@@ -0,0 +1,9 @@
+-- MIGRACIÓN 006: versión de la configuración por restaurante
+-- DatabaseManager.actualizar_restaurante la incrementa en cada cambio; el
+-- caché de restaurantes del servidor del chat (database/restaurant_cache.py)
+-- la consulta para ver los cambios hechos desde el panel de administración,
+-- que corre en otro proceso.
+USE sistema_restaurantes;
+
+ALTER TABLE restaurantes
+    ADD COLUMN config_version INT NOT NULL DEFAULT 0;
@@ -0,0 +1,327 @@
+"""
+Instrumentación de consultas SQL
+get_db_cursor envuelve cada cursor en un CursorInstrumentado que mide,
+por sentencia, la latencia (execute + lectura de filas), las filas leídas
+o afectadas, la función que la ejecutó y el endpoint de Flask en curso.
+
+Las sentencias se agrupan por huella (el SQL sin literales ni listas de
+parámetros, p. ej. "... WHERE id IN (...)") con un histograma de latencias
+de los últimos minutos por huella. Las que pasan del umbral se escriben
+en el log de consultas lentas.
+
+Configuración por variables de entorno:
+    DB_INSTRUMENTAR            activar la instrumentación (default: 1)
+    DB_SLOW_QUERY_MS           umbral de consulta lenta en ms (default: 200)
+    DB_SLOW_QUERY_LOG          archivo del log de consultas lentas; vacío = consola
+                               (default: vacío)
+    DB_QUERY_STATS_VENTANA     segundos que abarca el histograma rodante (default: 300)
+"""
+
+import bisect
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    from flask import has_request_context, request as flask_request
+except ImportError:  # el bot puede correr sin Flask
+    has_request_context = None
+
+DB_INSTRUMENTAR = os.getenv('DB_INSTRUMENTAR', '1') not in ('0', 'false', 'False')
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+DB_SLOW_QUERY_LOG = os.getenv('DB_SLOW_QUERY_LOG', '')
+DB_QUERY_STATS_VENTANA = float(os.getenv('DB_QUERY_STATS_VENTANA', 300))
+
+# Límites superiores (ms) de las cubetas del histograma; la última es "más de 5 s"
+CUBETAS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Segmentos en que se divide la ventana rodante
+SEGMENTOS_VENTANA = 5
+
+# Huellas distintas que se conservan (protege contra SQL armado con literales)
+MAX_HUELLAS = 500
+
+_RE_COMENTARIOS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_RE_CADENAS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_RE_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_LISTAS = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)')
+_RE_VALUES = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.I)
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+def huella_sql(sql):
+    """SQL normalizado: sin comentarios ni literales y con las listas colapsadas"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _RE_COMENTARIOS.sub(' ', sql)
+    sql = _RE_CADENAS.sub('?', sql)
+    sql = _RE_NUMEROS.sub('?', sql)
+    sql = _RE_LISTAS.sub('(...)', sql)
+    sql = _RE_VALUES.sub(r'\1', sql)
+    return _RE_ESPACIOS.sub(' ', sql).strip()
+
+
+class _Segmento:
+    __slots__ = ('inicio', 'cubetas', 'total', 'total_ms', 'max_ms', 'filas')
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.cubetas = [0] * (len(CUBETAS_MS) + 1)
+        self.total = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.filas = 0
+
+
+class _EstadisticaHuella:
+    """Totales acumulados y histograma rodante de una huella"""
+
+    __slots__ = ('huella', 'total', 'total_ms', 'max_ms', 'filas', 'lentas',
+                 'llamadores', 'endpoints', 'segmentos')
+
+    def __init__(self, huella):
+        self.huella = huella
+        self.total = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.filas = 0
+        self.lentas = 0
+        self.llamadores = {}    # 'modulo.funcion' -> ejecuciones
+        self.endpoints = {}     # endpoint de Flask -> ms acumulados
+        self.segmentos = deque(maxlen=SEGMENTOS_VENTANA)
+
+    def registrar(self, ms, filas, llamador, endpoint, lenta, ahora, duracion_segmento):
+        self.total += 1
+        self.total_ms += ms
+        self.filas += filas
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if lenta:
+            self.lentas += 1
+        self.llamadores[llamador] = self.llamadores.get(llamador, 0) + 1
+        if endpoint:
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0.0) + ms
+
+        if not self.segmentos or ahora - self.segmentos[-1].inicio >= duracion_segmento:
+            self.segmentos.append(_Segmento(ahora))
+        segmento = self.segmentos[-1]
+        segmento.cubetas[bisect.bisect_left(CUBETAS_MS, ms)] += 1
+        segmento.total += 1
+        segmento.total_ms += ms
+        segmento.filas += filas
+        if ms > segmento.max_ms:
+            segmento.max_ms = ms
+
+    def resumen(self, ahora, ventana):
+        vigentes = [s for s in self.segmentos if ahora - s.inicio < ventana]
+        cubetas = [sum(columna) for columna in zip(*(s.cubetas for s in vigentes))] if vigentes else []
+        recientes = sum(s.total for s in vigentes)
+
+        def percentil(p):
+            # Límite superior de la cubeta donde cae el percentil (None si es la de > 5 s)
+            if not recientes:
+                return None
+            objetivo = recientes * p
+            acumulado = 0
+            for i, cantidad in enumerate(cubetas):
+                acumulado += cantidad
+                if acumulado >= objetivo:
+                    return CUBETAS_MS[i] if i < len(CUBETAS_MS) else None
+            return None
+
+        return {
+            'huella': self.huella,
+            'total': self.total,
+            'total_ms': round(self.total_ms, 3),
+            'promedio_ms': round(self.total_ms / self.total, 3) if self.total else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'filas': self.filas,
+            'lentas': self.lentas,
+            'llamadores': dict(sorted(self.llamadores.items(), key=lambda x: -x[1])[:5]),
+            'endpoints': {k: round(v, 3) for k, v in sorted(self.endpoints.items(), key=lambda x: -x[1])[:5]},
+            'ventana': {
+                'total': recientes,
+                'total_ms': round(sum(s.total_ms for s in vigentes), 3),
+                'max_ms': round(max((s.max_ms for s in vigentes), default=0.0), 3),
+                'p50_ms': percentil(0.50),
+                'p95_ms': percentil(0.95),
+                'p99_ms': percentil(0.99),
+                'histograma': {
+                    (f'<={limite}' if i < len(CUBETAS_MS) else f'>{CUBETAS_MS[-1]}'): cantidad
+                    for i, (limite, cantidad) in enumerate(zip(CUBETAS_MS + (None,), cubetas))
+                    if cantidad
+                },
+            },
+        }
+
+
+class QueryStats:
+    """Registro de estadísticas por huella de consulta y log de consultas lentas"""
+
+    def __init__(self, activo=DB_INSTRUMENTAR, umbral_lenta_ms=DB_SLOW_QUERY_MS,
+                 archivo_lentas=DB_SLOW_QUERY_LOG, ventana=DB_QUERY_STATS_VENTANA):
+        self.activo = activo
+        self.umbral_lenta_ms = umbral_lenta_ms
+        self.archivo_lentas = archivo_lentas
+        self.ventana = ventana
+        self._duracion_segmento = ventana / SEGMENTOS_VENTANA
+        self._huellas = {}          # sql crudo -> huella (el mismo SQL se repite mucho)
+        self._estadisticas = {}     # huella -> _EstadisticaHuella
+        self._por_endpoint = {}     # endpoint -> [consultas, ms]
+        self._lock = threading.Lock()
+        self._lock_log = threading.Lock()
+
+    def registrar(self, sql, ms, filas, llamador):
+        """Registrar una sentencia terminada"""
+        endpoint = None
+        if has_request_context is not None and has_request_context():
+            endpoint = flask_request.endpoint
+
+        huella = self._huellas.get(sql)
+        if huella is None:
+            huella = huella_sql(sql)
+            if len(self._huellas) < MAX_HUELLAS * 4:
+                self._huellas[sql] = huella
+
+        lenta = ms >= self.umbral_lenta_ms
+        ahora = time.monotonic()
+        with self._lock:
+            estadistica = self._estadisticas.get(huella)
+            if estadistica is None:
+                if len(self._estadisticas) >= MAX_HUELLAS:
+                    huella = '(otras)'
+                    estadistica = self._estadisticas.get(huella)
+                if estadistica is None:
+                    estadistica = self._estadisticas[huella] = _EstadisticaHuella(huella)
+            estadistica.registrar(ms, filas, llamador, endpoint, lenta, ahora, self._duracion_segmento)
+
+            if endpoint:
+                acumulado = self._por_endpoint.setdefault(endpoint, [0, 0.0])
+                acumulado[0] += 1
+                acumulado[1] += ms
+
+        if lenta:
+            self._log_lenta(sql, ms, filas, llamador, endpoint)
+
+    def _log_lenta(self, sql, ms, filas, llamador, endpoint):
+        if isinstance(sql, (bytes, bytearray)):
+            sql = sql.decode('utf-8', 'replace')
+        # Solo el SQL con marcadores: los parámetros pueden traer datos de clientes
+        linea = (f"{datetime.now().isoformat(timespec='milliseconds')} {ms:.1f}ms filas={filas} "
+                 f"llamador={llamador} endpoint={endpoint or '-'} "
+                 f"sql={_RE_ESPACIOS.sub(' ', sql).strip()[:1000]}")
+        if not self.archivo_lentas:
+            print(f"🐢 Consulta lenta: {linea}")
+            return
+        try:
+            with self._lock_log, open(self.archivo_lentas, 'a', encoding='utf-8') as archivo:
+                archivo.write(linea + '\n')
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir el log de consultas lentas: {e}")
+
+    def get_metricas(self, top=20):
+        """Las huellas con más tiempo acumulado y el tiempo de BD por endpoint"""
+        ahora = time.monotonic()
+        with self._lock:
+            estadisticas = sorted(self._estadisticas.values(), key=lambda e: -e.total_ms)[:top]
+            consultas = [e.resumen(ahora, self.ventana) for e in estadisticas]
+            por_endpoint = {
+                endpoint: {'consultas': n, 'total_ms': round(ms, 3)}
+                for endpoint, (n, ms) in sorted(self._por_endpoint.items(), key=lambda x: -x[1][1])
+            }
+        return {
+            'activo': self.activo,
+            'umbral_lenta_ms': self.umbral_lenta_ms,
+            'huellas': len(self._estadisticas),
+            'consultas': consultas,
+            'por_endpoint': por_endpoint,
+        }
+
+    def reiniciar(self):
+        with self._lock:
+            self._estadisticas.clear()
+            self._por_endpoint.clear()
+
+
+class CursorInstrumentado:
+    """Envuelve un cursor de mysql-connector y mide cada sentencia"""
+
+    __slots__ = ('_cursor', '_stats', '_sql', '_ms', '_filas', '_llamador')
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+        self._sql = None
+
+    def _iniciar(self, sql):
+        self._terminar()
+        frame = sys._getframe(2)
+        self._llamador = f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+        self._sql = sql
+        self._ms = 0.0
+        self._filas = 0
+
+    def _terminar(self):
+        if self._sql is None:
+            return
+        filas = self._filas or max(self._cursor.rowcount, 0)
+        self._stats.registrar(self._sql, self._ms, filas, self._llamador)
+        self._sql = None
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._iniciar(operation)
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._ms += (time.perf_counter() - inicio) * 1000
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._iniciar(operation)
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._ms += (time.perf_counter() - inicio) * 1000
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(*args)
+        finally:
+            if self._sql is not None:
+                self._ms += (time.perf_counter() - inicio) * 1000
+        if self._sql is not None:
+            if isinstance(resultado, list):
+                self._filas += len(resultado)
+            elif resultado is not None:
+                self._filas += 1
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._leer(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._terminar()
+        return self._cursor.close()
+
+    def __getattr__(self, nombre):
+        # lastrowid, rowcount, description, etc.
+        return getattr(self._cursor, nombre)
+
+
+# Instancia global
+query_stats = QueryStats()
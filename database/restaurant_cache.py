@@ -0,0 +1,141 @@
+"""
+Caché de la configuración de restaurantes
+Una sola lectura de la fila de restaurantes (con los JSON ya parseados)
+sirve para todo un turno del chat y los siguientes mientras no cambie la
+configuración. Se puede buscar por id, slug o bot_token.
+
+El panel admin corre en otro proceso, así que invalidar este caché allá no
+llega al servidor del chat. En su lugar, DatabaseManager.actualizar_restaurante
+incrementa restaurantes.config_version y aquí se consulta esa versión (una
+lectura por clave primaria) a lo más cada RESTAURANTE_CACHE_CHECK_SECONDS;
+la fila completa solo se vuelve a leer si la versión cambió.
+
+Las filas se entregan como copias de solo lectura (MappingProxyType, con
+los JSON anidados también congelados y las listas como tuplas): un
+handler no puede modificar por accidente la configuración que ven los demás.
+
+Configuración por variables de entorno:
+    RESTAURANTE_CACHE_CHECK_SECONDS    segundos entre consultas de la versión (default: 5)
+"""
+
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from database.database_multirestaurante import DatabaseManager
+
+RESTAURANTE_CACHE_CHECK_SECONDS = float(os.getenv('RESTAURANTE_CACHE_CHECK_SECONDS', 5))
+
+
+def _congelar(valor):
+    """Copia de solo lectura: dicts a MappingProxyType y listas a tuplas"""
+    if isinstance(valor, dict):
+        return MappingProxyType({clave: _congelar(v) for clave, v in valor.items()})
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+class _Entrada:
+    """Fila congelada y momento de la última verificación de versión"""
+
+    __slots__ = ('restaurante', 'verificado_en')
+
+    def __init__(self, restaurante):
+        self.restaurante = restaurante
+        self.verificado_en = time.monotonic()
+
+
+class RestaurantCache:
+    """Filas de restaurantes por id, con índices por slug y bot_token"""
+
+    def __init__(self, intervalo_verificacion=RESTAURANTE_CACHE_CHECK_SECONDS):
+        self.intervalo_verificacion = intervalo_verificacion
+        self._por_id = {}       # id -> _Entrada
+        self._por_slug = {}     # slug -> id
+        self._por_token = {}    # bot_token -> id
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'lecturas': 0, 'verificaciones': 0, 'invalidaciones': 0}
+
+    def _vigente(self, restaurante_id):
+        entrada = self._por_id.get(restaurante_id)
+        if entrada is None:
+            return None
+
+        if time.monotonic() - entrada.verificado_en >= self.intervalo_verificacion:
+            self.stats['verificaciones'] += 1
+            version = DatabaseManager.get_config_version(restaurante_id)
+            if version is None or version != entrada.restaurante.get('config_version'):
+                # Cambió desde el panel (o ya no existe): se vuelve a leer la fila
+                return None
+            entrada.verificado_en = time.monotonic()
+
+        self.stats['hits'] += 1
+        return entrada.restaurante
+
+    def _guardar(self, restaurante):
+        restaurante = _congelar(restaurante)
+        with self._lock:
+            self._quitar(restaurante['id'])
+            self._por_id[restaurante['id']] = _Entrada(restaurante)
+            self._por_slug[restaurante['slug']] = restaurante['id']
+            if restaurante.get('bot_token'):
+                self._por_token[restaurante['bot_token']] = restaurante['id']
+        return restaurante
+
+    def _quitar(self, restaurante_id):
+        entrada = self._por_id.pop(restaurante_id, None)
+        if entrada is None:
+            return
+        anterior = entrada.restaurante
+        if self._por_slug.get(anterior['slug']) == restaurante_id:
+            del self._por_slug[anterior['slug']]
+        if anterior.get('bot_token') and self._por_token.get(anterior['bot_token']) == restaurante_id:
+            del self._por_token[anterior['bot_token']]
+
+    def get_por_id(self, restaurante_id):
+        """Restaurante por id, sin importar su estado (como las consultas por id)"""
+        restaurante = self._vigente(restaurante_id)
+        if restaurante is not None:
+            return restaurante
+
+        self.stats['lecturas'] += 1
+        restaurante = DatabaseManager.get_restaurante_por_id(restaurante_id)
+        return self._guardar(restaurante) if restaurante else None
+
+    def get_por_slug(self, slug):
+        """Restaurante activo por slug (misma regla que get_restaurante_por_slug)"""
+        restaurante_id = self._por_slug.get(slug)
+        if restaurante_id is not None:
+            restaurante = self._vigente(restaurante_id)
+            if restaurante is not None:
+                return restaurante if restaurante['estado'] == 'activo' else None
+
+        self.stats['lecturas'] += 1
+        restaurante = DatabaseManager.get_restaurante_por_slug(slug)
+        return self._guardar(restaurante) if restaurante else None
+
+    def get_por_bot_token(self, bot_token):
+        """Restaurante activo por token de bot"""
+        restaurante_id = self._por_token.get(bot_token)
+        if restaurante_id is not None:
+            restaurante = self._vigente(restaurante_id)
+            if restaurante is not None:
+                return restaurante if restaurante['estado'] == 'activo' else None
+
+        self.stats['lecturas'] += 1
+        restaurante = DatabaseManager.get_restaurante_por_bot_token(bot_token)
+        if not restaurante:
+            return None
+        return self._guardar(DatabaseManager.parsear_jsons_restaurante(restaurante))
+
+    def invalidar(self, restaurante_id):
+        """Olvidar la fila de un restaurante en este proceso (los demás lo ven por config_version)"""
+        with self._lock:
+            self._quitar(restaurante_id)
+        self.stats['invalidaciones'] += 1
+
+
+# Instancia global
+restaurant_cache = RestaurantCache()
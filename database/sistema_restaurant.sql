@@ -31,6 +31,8 @@ CREATE TABLE restaurantes (
     fecha_expiracion DATE,
     limite_productos INT DEFAULT 50,
     limite_pedidos_mes INT DEFAULT 100,
+    menu_version INT NOT NULL DEFAULT 0,
+    config_version INT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_slug (slug),
@@ -112,6 +114,33 @@ CREATE TABLE ingredientes (
     INDEX idx_item (item_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- TABLA: estadisticas_diarias (contadores del dashboard, ver migración 003)
+CREATE TABLE estadisticas_diarias (
+    restaurante_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    pedidos INT NOT NULL DEFAULT 0,
+    total_ventas DECIMAL(12,2) NOT NULL DEFAULT 0,
+    pedidos_cancelados INT NOT NULL DEFAULT 0,
+    reservaciones INT NOT NULL DEFAULT 0,
+    personas_reservadas INT NOT NULL DEFAULT 0,
+    reservaciones_canceladas INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (restaurante_id, fecha),
+    FOREIGN KEY (restaurante_id) REFERENCES restaurantes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- TABLA: eventos_panel (cambios de pedidos/reservaciones para el panel, ver migración 004)
+CREATE TABLE eventos_panel (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    restaurante_id INT NOT NULL,
+    tipo VARCHAR(30) NOT NULL,
+    entidad_id INT NOT NULL,
+    estado VARCHAR(30),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_restaurante_id (restaurante_id, id),
+    INDEX idx_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- INSERTAR RESTAURANTE DE EJEMPLO
 INSERT INTO restaurantes (
     slug, nombre_restaurante, descripcion, telefono, email,
@@ -0,0 +1,66 @@
+"""
+Reconciliación de los contadores diarios (tabla estadisticas_diarias)
+Los contadores se actualizan por incremento en las mismas transacciones que
+crean pedidos/reservaciones o cambian su estado, pero una escritura directa
+a la BD (o una ruta que no pase por DatabaseManager) los puede desviar.
+Este job los recalcula para los días recientes y próximos (las
+reservaciones se cuentan por el día para el que son).
+
+Corre en un solo lugar, programado con cron (no dentro de cada worker del
+panel). DatabaseManager.reconciliar_estadisticas toma además un GET_LOCK de
+MySQL, así que dos ejecuciones encimadas no trabajan a la vez.
+
+Uso desde la terminal:
+    # Ventana configurada (para cron, p. ej. cada 30 minutos)
+    */30 * * * *  python -m database.stats_reconciler
+    # Rango explícito (p. ej. tras aplicar la migración o una carga manual)
+    python -m database.stats_reconciler --desde 2025-01-01 --hasta 2025-12-31 [--restaurante 1]
+
+Configuración por variables de entorno:
+    ESTADISTICAS_DIAS_ATRAS          días anteriores a hoy que se revisan (default: 2)
+    ESTADISTICAS_DIAS_ADELANTE       días posteriores a hoy que se revisan (default: 60)
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database_multirestaurante import DatabaseManager
+
+ESTADISTICAS_DIAS_ATRAS = int(os.getenv('ESTADISTICAS_DIAS_ATRAS', 2))
+ESTADISTICAS_DIAS_ADELANTE = int(os.getenv('ESTADISTICAS_DIAS_ADELANTE', 60))
+
+
+def ventana_reconciliacion(hoy=None):
+    """(desde, hasta) de la ventana configurada alrededor de hoy"""
+    hoy = hoy or date.today()
+    return hoy - timedelta(days=ESTADISTICAS_DIAS_ATRAS), hoy + timedelta(days=ESTADISTICAS_DIAS_ADELANTE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recalcular estadisticas_diarias')
+    parser.add_argument('--desde', type=date.fromisoformat,
+                        help='Por defecto hoy - ESTADISTICAS_DIAS_ATRAS')
+    parser.add_argument('--hasta', type=date.fromisoformat,
+                        help='Por defecto hoy + ESTADISTICAS_DIAS_ADELANTE')
+    parser.add_argument('--restaurante', type=int)
+    args = parser.parse_args(argv)
+
+    desde, hasta = ventana_reconciliacion()
+    corregidas = DatabaseManager.reconciliar_estadisticas(
+        args.desde or desde, args.hasta or hasta, args.restaurante
+    )
+    if corregidas is None:
+        return 1
+    for fila in sorted(corregidas, key=lambda f: (f['restaurante_id'], f['fecha'])):
+        print(f"   Restaurante {fila['restaurante_id']} {fila['fecha']}: {fila['antes']} -> {fila['despues']}")
+    print(f"✅ {len(corregidas)} día(s) corregidos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Canal de eventos del panel de administración (Server-Sent Events)
+Las pantallas de pedidos, reservaciones y dashboard recargaban todo cada
+5 segundos aunque no hubiera cambios. Ahora abren una conexión SSE a
+/api/eventos y solo recargan cuando llega un evento de su restaurante.
+
+Los pedidos y reservaciones se escriben en otros procesos (chat web, bot),
+así que los eventos viajan por la tabla eventos_panel (migración 004): las
+escrituras de DatabaseManager insertan el evento en su transacción y un solo
+hilo de este proceso lee los nuevos cada EVENTOS_INTERVALO segundos, para
+todas las conexiones abiertas a la vez, y los reparte por restaurante.
+
+Cada conexión SSE ocupa un hilo del servidor mientras está abierta; con
+gunicorn usar workers gthread o gevent. Al superar EVENTOS_MAX_CONEXIONES
+se responde 503 y la página sigue con el polling de siempre.
+
+Configuración por variables de entorno:
+    EVENTOS_INTERVALO          segundos entre lecturas de eventos_panel (default: 1)
+    EVENTOS_HEARTBEAT          segundos entre comentarios keep-alive (default: 15)
+    EVENTOS_MAX_CONEXIONES     conexiones SSE simultáneas por proceso (default: 100)
+    EVENTOS_RETENCION_HORAS    antigüedad máxima de los eventos guardados (default: 24)
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from database.database_multirestaurante import DatabaseManager
+
+EVENTOS_INTERVALO = float(os.getenv('EVENTOS_INTERVALO', 1))
+EVENTOS_HEARTBEAT = float(os.getenv('EVENTOS_HEARTBEAT', 15))
+EVENTOS_MAX_CONEXIONES = int(os.getenv('EVENTOS_MAX_CONEXIONES', 100))
+EVENTOS_RETENCION_HORAS = int(os.getenv('EVENTOS_RETENCION_HORAS', 24))
+
+# Eventos pendientes por conexión; si un cliente no los consume se le pide recargar
+COLA_MAX = 200
+# Los ids AUTO_INCREMENT se asignan al insertar, no al hacer commit: una
+# transacción lenta puede confirmar un id menor que otro ya leído. Se relee
+# este margen de ids hacia atrás y se descartan los ya entregados.
+SOLAPE_IDS = 200
+# Milisegundos que espera el navegador antes de reconectar
+RECONEXION_MS = 5000
+PURGA_CADA_SEG = 3600
+
+RECARGAR = {'tipo': 'recargar'}
+
+
+class Suscripcion:
+    """Conexión SSE de un restaurante con su cola de eventos"""
+
+    __slots__ = ('restaurante_id', 'cola')
+
+    def __init__(self, restaurante_id):
+        self.restaurante_id = restaurante_id
+        self.cola = queue.Queue(maxsize=COLA_MAX)
+
+    def entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except queue.Full:
+            # Cliente atrasado: se descartan sus eventos y se le pide recargar todo
+            with self.cola.mutex:
+                self.cola.queue.clear()
+            self.cola.put_nowait(RECARGAR)
+
+
+class CanalEventos:
+    """Lee eventos_panel con un solo hilo y los reparte a las conexiones SSE"""
+
+    def __init__(self, intervalo=EVENTOS_INTERVALO, heartbeat=EVENTOS_HEARTBEAT,
+                 max_conexiones=EVENTOS_MAX_CONEXIONES, retencion_horas=EVENTOS_RETENCION_HORAS):
+        self.intervalo = intervalo
+        self.heartbeat = heartbeat
+        self.max_conexiones = max_conexiones
+        self.retencion_horas = retencion_horas
+
+        self._suscripciones = {}    # restaurante_id -> set de Suscripcion
+        self._conexiones = 0
+        self._lock = threading.Lock()
+        self._hay_suscriptores = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+        self._ultimo_id = None
+        self._base_id = 0           # eventos anteriores a la primera lectura
+        self._entregados = set()    # ids dentro de la ventana de solape
+        self._ultima_purga = 0.0
+        self.stats = {'lecturas': 0, 'eventos': 0, 'errores': 0, 'rechazadas': 0, 'purgados': 0}
+
+    # ---------- Conexiones ----------
+
+    def suscribir(self, restaurante_id):
+        """Registrar una conexión; None si ya se alcanzó el máximo"""
+        suscripcion = Suscripcion(restaurante_id)
+        with self._lock:
+            if self._conexiones >= self.max_conexiones:
+                self.stats['rechazadas'] += 1
+                return None
+            self._suscripciones.setdefault(restaurante_id, set()).add(suscripcion)
+            self._conexiones += 1
+        self._iniciar_hilo()
+        self._hay_suscriptores.set()
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            conjunto = self._suscripciones.get(suscripcion.restaurante_id)
+            if conjunto is None or suscripcion not in conjunto:
+                return
+            conjunto.discard(suscripcion)
+            if not conjunto:
+                del self._suscripciones[suscripcion.restaurante_id]
+            self._conexiones -= 1
+            if not self._conexiones:
+                self._hay_suscriptores.clear()
+
+    def flujo(self, suscripcion):
+        """Generador del cuerpo text/event-stream de una conexión"""
+        try:
+            yield f"retry: {RECONEXION_MS}\n\n"
+            # Al (re)conectar la página recarga una vez: cubre lo que pasó sin conexión
+            yield formatear_sse({'tipo': 'conectado'})
+            while True:
+                try:
+                    evento = suscripcion.cola.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Mantiene viva la conexión en proxies y detecta clientes que se fueron
+                    yield ": ping\n\n"
+                    continue
+                yield formatear_sse(evento)
+        finally:
+            self.cancelar(suscripcion)
+
+    # ---------- Lectura de eventos ----------
+
+    def _iniciar_hilo(self):
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._bucle, name='canal-eventos', daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hay_suscriptores.set()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            if not self._hay_suscriptores.is_set():
+                # Sin pantallas abiertas no se lee la tabla, solo se purga; al
+                # abrirse otra se empieza desde el evento más reciente
+                self._ultimo_id = None
+                if not self._hay_suscriptores.wait(PURGA_CADA_SEG):
+                    self._purgar()
+                    continue
+            self.leer()
+            self._purgar()
+            self._detener.wait(self.intervalo)
+
+    def leer(self):
+        """Una lectura de eventos nuevos para los restaurantes con conexiones abiertas"""
+        with self._lock:
+            restaurantes = list(self._suscripciones)
+        if not restaurantes:
+            return 0
+
+        if self._ultimo_id is None:
+            # Solo interesan los eventos a partir de que se abre la primera pantalla
+            self._ultimo_id = DatabaseManager.get_ultimo_evento_id()
+            if self._ultimo_id is None:
+                self.stats['errores'] += 1
+            else:
+                self._base_id = self._ultimo_id
+                self._entregados.clear()
+            return 0
+
+        eventos = DatabaseManager.get_eventos_desde(
+            max(0, self._ultimo_id - SOLAPE_IDS), restaurantes, limite=COLA_MAX + SOLAPE_IDS
+        )
+        self.stats['lecturas'] += 1
+        if eventos is None:
+            self.stats['errores'] += 1
+            return 0
+
+        entregados = 0
+        with self._lock:
+            for evento in eventos:
+                if evento['id'] <= self._base_id or evento['id'] in self._entregados:
+                    continue
+                self._entregados.add(evento['id'])
+                if evento['id'] > self._ultimo_id:
+                    self._ultimo_id = evento['id']
+                if evento.get('created_at'):
+                    evento['created_at'] = evento['created_at'].isoformat()
+                for suscripcion in self._suscripciones.get(evento['restaurante_id'], ()):
+                    suscripcion.entregar(evento)
+                entregados += 1
+
+            limite = self._ultimo_id - SOLAPE_IDS
+            self._entregados = {i for i in self._entregados if i > limite}
+
+        self.stats['eventos'] += entregados
+        return entregados
+
+    def _purgar(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_purga < PURGA_CADA_SEG:
+            return
+        self._ultima_purga = ahora
+        self.stats['purgados'] += DatabaseManager.purgar_eventos(self.retencion_horas)
+
+    def get_metricas(self):
+        with self._lock:
+            conexiones = self._conexiones
+            restaurantes = len(self._suscripciones)
+        metricas = dict(self.stats)
+        metricas.update({
+            'conexiones': conexiones,
+            'restaurantes': restaurantes,
+            'max_conexiones': self.max_conexiones,
+            'ultimo_id': self._ultimo_id,
+        })
+        return metricas
+
+
+def formatear_sse(evento):
+    """Mensaje SSE; el tipo va dentro de los datos para que la página use un solo onmessage"""
+    lineas = []
+    if evento.get('id'):
+        lineas.append(f"id: {evento['id']}")
+    lineas.append(f"data: {json.dumps(evento, default=str)}")
+    return '\n'.join(lineas) + '\n\n'
+
+
+# Instancia global
+canal_eventos = CanalEventos()
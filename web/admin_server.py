@@ -9,14 +9,18 @@ import os
 # ✅ AGREGAR ESTO AL INICIO - Agregar la carpeta raíz del proyecto al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, Response, stream_with_context
 from flask_cors import CORS
 from functools import wraps
 from datetime import datetime, timedelta
 import json
+import io
 
 # Importar el nuevo DatabaseManager
 from database.database_multirestaurante import DatabaseManager
+from database.menu_cache import menu_cache
+from database.menu_import import MenuImporter, leer_filas, exportar_menu, FORMATOS, MENU_IMPORT_LOTE
+from web.admin_events import canal_eventos, SOLAPE_IDS
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'tu_clave_secreta_super_segura_cambiar_en_produccion')
@@ -395,17 +399,8 @@ def menu():
     user = get_current_user()
     restaurante_id = user['restaurante_id']
     
-    # Obtener categorías
-    categorias = db.get_categorias_menu(restaurante_id)
-    
-    # Obtener items agrupados por categoría
-    menu_completo = []
-    for categoria in categorias:
-        items = db.get_items_por_categoria(restaurante_id, categoria['id'])
-        menu_completo.append({
-            'categoria': categoria,
-            'items': items
-        })
+    # Categorías con sus items en 2 consultas
+    menu_completo = db.get_catalogo_completo(restaurante_id, incluir_ingredientes=False) or []
     
     return render_template('admin/menu.html',
                          user=user,
@@ -433,18 +428,21 @@ def gestionar_categorias():
             )
             
             if categoria_id:
+                menu_cache.invalidar(restaurante_id)
                 return jsonify({'success': True, 'message': 'Categoría creada', 'id': categoria_id})
             return jsonify({'success': False, 'message': 'Error al crear categoría'}), 500
         
         elif action == 'actualizar':
             success = db.actualizar_categoria(data['id'], data)
             if success:
+                menu_cache.invalidar(restaurante_id)
                 return jsonify({'success': True, 'message': 'Categoría actualizada'})
             return jsonify({'success': False, 'message': 'Error al actualizar'}), 500
         
         elif action == 'eliminar':
             success = db.eliminar_categoria(data['id'])
             if success:
+                menu_cache.invalidar(restaurante_id)
                 return jsonify({'success': True, 'message': 'Categoría eliminada'})
             return jsonify({'success': False, 'message': 'Error al eliminar'}), 500
     
@@ -484,6 +482,7 @@ def gestionar_items():
             else:
                 print("   ℹ️ Sin ingredientes para guardar")
             
+            menu_cache.invalidar(restaurante_id)
             print("=" * 60)
             return jsonify({'success': True, 'message': 'Item creado', 'id': item_id})
         
@@ -509,13 +508,15 @@ def gestionar_items():
             # Actualizar ingredientes si se proporcionaron
             if ingredientes is not None:  # Puede ser lista vacía []
                 print(f"   Actualizando {len(ingredientes)} ingredientes...")
-                ing_success = db.guardar_ingredientes_item(item_id, ingredientes)
+                # Solo tocar las filas que cambiaron
+                ing_success = db.guardar_ingredientes_item(item_id, ingredientes, modo='diff')
                 
                 if not ing_success:
                     print("   ⚠️ Error actualizando ingredientes")
             else:
                 print("   ℹ️ Sin cambios en ingredientes")
             
+            menu_cache.invalidar(restaurante_id)
             print("=" * 60)
             return jsonify({'success': True, 'message': 'Item actualizado'})
         
@@ -526,6 +527,7 @@ def gestionar_items():
         item_id = request.args.get('id')
         success = db.eliminar_item_menu(item_id)
         if success:
+            menu_cache.invalidar(restaurante_id)
             return jsonify({'success': True, 'message': 'Item eliminado'})
         return jsonify({'success': False, 'message': 'Error al eliminar'}), 500
     
@@ -541,6 +543,59 @@ def gestionar_items():
     
     return jsonify({'success': True, 'items': items})
 
+@app.route('/menu/importar', methods=['POST'])
+@login_required
+def importar_menu():
+    """
+    Importar items, categorías e ingredientes desde CSV/JSON
+    El archivo llega como 'archivo' (multipart) o en el cuerpo; la respuesta
+    es NDJSON: una línea con el progreso por cada lote y la última con el
+    resumen final (terminado=true).
+    """
+    user = get_current_user()
+    restaurante_id = user['restaurante_id']
+    
+    archivo = request.files.get('archivo')
+    nombre = archivo.filename if archivo else ''
+    formato = (request.args.get('formato') or os.path.splitext(nombre)[1].lstrip('.') or 'csv').lower()
+    if formato not in FORMATOS:
+        return jsonify({'success': False, 'message': f'Formato no soportado: {formato}'}), 400
+    
+    simular = request.args.get('simular') in ('1', 'true')
+    tamano_lote = request.args.get('lote', MENU_IMPORT_LOTE, type=int)
+    flujo = io.TextIOWrapper(archivo.stream if archivo else request.stream, encoding='utf-8-sig', newline='')
+    
+    importador = MenuImporter(restaurante_id, tamano_lote, simular)
+    
+    def generar():
+        try:
+            for resumen in importador.por_lotes(leer_filas(flujo, formato)):
+                yield json.dumps(resumen, ensure_ascii=False) + '\n'
+        except Exception as e:
+            # Archivo mal formado (JSON inválido, codificación...) o BD caída
+            print(f"❌ Error importando menú: {e}")
+            yield json.dumps({'terminado': True, 'error': str(e)}, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+@app.route('/menu/exportar')
+@login_required
+def exportar_menu_archivo():
+    """Descargar el menú en CSV/JSON (mismo formato que la importación)"""
+    user = get_current_user()
+    restaurante_id = user['restaurante_id']
+    
+    formato = request.args.get('formato', 'csv').lower()
+    if formato not in FORMATOS:
+        return jsonify({'success': False, 'message': f'Formato no soportado: {formato}'}), 400
+    
+    tipos = {'csv': 'text/csv', 'json': 'application/json', 'jsonl': 'application/x-ndjson'}
+    return Response(
+        stream_with_context(exportar_menu(restaurante_id, formato)),
+        mimetype=tipos[formato],
+        headers={'Content-Disposition': f'attachment; filename=menu_{restaurante_id}.{formato}'}
+    )
+
 @app.route('/api/categoria/<int:categoria_id>', methods=['GET'])
 @login_required
 def get_categoria(categoria_id):
@@ -566,6 +621,59 @@ def get_item(item_id):
 
 # ==================== GESTIÓN DE PEDIDOS ====================
 
+# ---------- Filtros y paginación por clave ----------
+# /pedidos y /reservaciones (y sus APIs de polling) filtran en SQL con los
+# parámetros estado, tipo, origen, desde y hasta (YYYY-MM-DD; `fecha` es
+# desde = hasta). La página siguiente se pide con ?antes=<cursor> de la
+# última fila, sin OFFSET. Valores inválidos se ignoran.
+
+POR_PAGINA = 50
+
+def _fecha_arg(nombre):
+    try:
+        return datetime.strptime(request.args.get(nombre, ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _filtros_listado(campos):
+    """Filtros de la query string presentes en `campos`, listos para buscar_*"""
+    filtros = {campo: request.args.get(campo) for campo in campos
+               if campo not in ('desde', 'hasta') and request.args.get(campo)}
+    fecha = _fecha_arg('fecha')
+    for campo in ('desde', 'hasta'):
+        valor = _fecha_arg(campo) or fecha
+        if valor:
+            filtros[campo] = valor
+    return filtros
+
+def _filtros_url(filtros):
+    """Filtros como parámetros de url_for (para los enlaces de paginación)"""
+    return {campo: valor.isoformat() if hasattr(valor, 'isoformat') else valor
+            for campo, valor in filtros.items()}
+
+def _cursor_antes():
+    """Cursor ?antes=<timestamp>_<id> como (datetime, id), o None"""
+    try:
+        antes_ts, antes_id = (int(parte) for parte in request.args.get('antes', '').split('_'))
+        return datetime.fromtimestamp(antes_ts), antes_id
+    except (ValueError, OverflowError, OSError):
+        # OverflowError/OSError: timestamp fuera del rango que acepta fromtimestamp
+        return None
+
+def _cursor_de(fila, columna_fecha):
+    return f"{int(fila[columna_fecha].timestamp())}_{fila['id']}"
+
+def _paginar(filas, columna_fecha):
+    """Recortar la fila extra pedida y calcular el cursor de la página siguiente"""
+    siguiente = None
+    if len(filas) > POR_PAGINA:
+        filas = filas[:POR_PAGINA]
+        siguiente = _cursor_de(filas[-1], columna_fecha)
+    return filas, siguiente
+
+FILTROS_PEDIDOS = ('estado', 'tipo', 'origen', 'desde', 'hasta')
+FILTROS_RESERVACIONES = ('estado', 'origen', 'desde', 'hasta')
+
 @app.route('/pedidos')
 @login_required
 def pedidos():
@@ -573,27 +681,25 @@ def pedidos():
     user = get_current_user()
     restaurante_id = user['restaurante_id']
     
-    # Filtros
-    estado = request.args.get('estado')
-    fecha = request.args.get('fecha')
+    # Filtros y página
+    filtros = _filtros_listado(FILTROS_PEDIDOS)
+    antes = _cursor_antes()
     
-    # Obtener pedidos (por ahora todos los recientes)
-    pedidos_lista = db.get_pedidos_restaurante(restaurante_id, limit=50)
+    pedidos_lista, siguiente = _paginar(
+        db.buscar_pedidos(restaurante_id, antes=antes, limite=POR_PAGINA + 1, **filtros),
+        'fecha_pedido'
+    )
     
     # Obtener estadísticas desde la base de datos
     stats = db.get_estadisticas_hoy(restaurante_id)
     
-    # Asegurar que stats tenga los campos necesarios para pedidos
-    if 'pendientes' not in stats:
-        stats['pendientes'] = sum(1 for p in pedidos_lista if p.get('estado') in ['pendiente', 'confirmado'])
-        stats['en_proceso'] = sum(1 for p in pedidos_lista if p.get('estado') in ['preparando', 'en_camino'])
-        stats['completados'] = sum(1 for p in pedidos_lista if p.get('estado') in ['entregado', 'listo'])
-        stats['total'] = len(pedidos_lista)
-    
     return render_template('admin/pedidos.html',
                          user=user,
                          pedidos=pedidos_lista,
-                         stats=stats)
+                         stats=stats,
+                         filtros=_filtros_url(filtros),
+                         pagina_anterior=antes is not None,
+                         siguiente=siguiente)
 
 @app.route('/pedidos/<int:pedido_id>')
 @login_required
@@ -653,24 +759,25 @@ def reservaciones():
             return jsonify({'success': True, 'message': 'Reservación creada', 'id': reservacion['id']})
         return jsonify({'success': False, 'message': 'Error al crear reservación'}), 500
     
-    # GET - Obtener reservaciones
-    reservaciones_lista = db.get_reservaciones_restaurante(restaurante_id, limit=50)
+    # GET - Obtener reservaciones (filtradas y paginadas en SQL)
+    filtros = _filtros_listado(FILTROS_RESERVACIONES)
+    antes = _cursor_antes()
     
-    # Calcular estadísticas de reservaciones
-    from datetime import date
-    hoy = date.today()
+    reservaciones_lista, siguiente = _paginar(
+        db.buscar_reservaciones(restaurante_id, antes=antes, limite=POR_PAGINA + 1, **filtros),
+        'created_at'
+    )
     
-    stats = {
-        'hoy': sum(1 for r in reservaciones_lista if r.get('fecha_reservacion') == hoy),
-        'pendientes': sum(1 for r in reservaciones_lista if r.get('estado') == 'pendiente'),
-        'confirmadas': sum(1 for r in reservaciones_lista if r.get('estado') == 'confirmada'),
-        'personas_hoy': sum(r.get('numero_personas', 0) for r in reservaciones_lista if r.get('fecha_reservacion') == hoy)
-    }
+    # Estadísticas de reservaciones (calculadas en la BD, no sobre la página)
+    stats = db.get_resumen_reservaciones(restaurante_id)
     
     return render_template('admin/reservaciones.html',
                          user=user,
                          reservaciones=reservaciones_lista,
-                         stats=stats)
+                         stats=stats,
+                         filtros=_filtros_url(filtros),
+                         pagina_anterior=antes is not None,
+                         siguiente=siguiente)
 
 @app.route('/reservaciones/<int:reservacion_id>', methods=['GET'])
 @login_required
@@ -714,15 +821,10 @@ def actualizar_estado_reservacion(reservacion_id):
     data = request.get_json()
     nuevo_estado = data.get('estado')
     
-    # Actualizar estado
-    from database.database_multirestaurante import get_db_cursor
-    with get_db_cursor() as (cursor, conn):
-        cursor.execute("""
-            UPDATE reservaciones 
-            SET estado = %s 
-            WHERE id = %s AND restaurante_id = %s
-        """, (nuevo_estado, reservacion_id, user['restaurante_id']))
-        conn.commit()
+    # Actualizar estado (y los contadores del dashboard)
+    success = db.actualizar_estado_reservacion(reservacion_id, nuevo_estado, user['restaurante_id'])
+    if not success:
+        return jsonify({'success': False, 'message': 'Error al actualizar estado'}), 500
     
     return jsonify({'success': True, 'message': 'Estado actualizado'})
 
@@ -1134,6 +1236,121 @@ def api_stats():
         'stats': stats
     })
 
+@app.route('/api/metricas')
+def api_metricas():
+    """API: Métricas internas del panel (requiere METRICAS_TOKEN, como el servidor del chat)"""
+    from database.database_multirestaurante import get_pool_metricas
+    from database.query_stats import query_stats
+
+    # Son de todos los restaurantes (SQL de las consultas incluido): no basta con una sesión
+    token = os.getenv('METRICAS_TOKEN')
+    if not token or request.headers.get('X-Metricas-Token') != token:
+        return jsonify({'success': False, 'error': 'No autorizado'}), 404
+
+    return jsonify({
+        'success': True,
+        'pool': get_pool_metricas(),
+        'consultas': query_stats.get_metricas(request.args.get('top', 20, type=int)),
+        'eventos': canal_eventos.get_metricas()
+    })
+
+@app.route('/api/eventos')
+@login_required
+def api_eventos():
+    """API: Cambios de pedidos y reservaciones en vivo (Server-Sent Events)"""
+    user = get_current_user()
+    suscripcion = canal_eventos.suscribir(user['restaurante_id'])
+    if suscripcion is None:
+        # La página sigue con el polling y reintenta más tarde
+        return jsonify({
+            'success': False,
+            'message': 'Demasiadas conexiones de eventos abiertas'
+        }), 503
+    
+    response = Response(
+        canal_eventos.flujo(suscripcion),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Evita que nginx acumule el flujo en su búfer
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    # Libera el lugar aunque el cliente se vaya antes de empezar el flujo
+    response.call_on_close(lambda: canal_eventos.cancelar(suscripcion))
+    return response
+
+# ---------- Polling condicional (ETag / since) ----------
+# La versión del panel es el id del último evento del restaurante (ver
+# web/admin_events.py): si no cambió se responde 304 sin consultar nada más,
+# y con ?since=<version> solo se devuelven los pedidos/reservaciones que
+# cambiaron desde entonces (completo: false). Si el delta no se puede
+# calcular se devuelve la lista completa (completo: true).
+#
+# Como en el canal SSE, un evento puede confirmar tarde con un id menor al
+# último ya visto: el delta se calcula desde since - SOLAPE_IDS (las páginas
+# combinan por id, repetir filas no importa) y el ETag incluye cuántos
+# eventos hay en ese margen, así que cambia cuando aparece uno tardío.
+
+TIPOS_EVENTO_PEDIDO = ('pedido_nuevo', 'pedido_actualizado')
+TIPOS_EVENTO_RESERVACION = ('reservacion_nueva', 'reservacion_actualizada')
+
+def _version_panel(restaurante_id):
+    """Versión del panel (get_version_panel) o None si no se pudo leer"""
+    return db.get_version_panel(restaurante_id, SOLAPE_IDS)
+
+def _etag_panel(recurso, restaurante_id, version, *extra):
+    """ETag de una API de polling; None si no se pudo leer la versión"""
+    if version is None:
+        return None
+    partes = (recurso, restaurante_id, f"{version['ultimo_id']}.{version['recientes']}") + extra
+    return '-'.join(str(parte) for parte in partes)
+
+def _respuesta_no_modificada(etag):
+    """Respuesta 304 si el cliente ya tiene esa versión, si no None"""
+    if etag and request.if_none_match.contains_weak(etag):
+        return _con_etag(Response(status=304), etag)
+    return None
+
+def _con_etag(respuesta, etag):
+    if etag:
+        respuesta.set_etag(etag)
+        # El navegador puede guardarla pero debe revalidar en cada poll
+        respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
+
+def _cambios_desde(restaurante_id, version, tipos, limite):
+    """Ids cambiados desde ?since=, o None si hay que devolver todo"""
+    since = request.args.get('since', type=int)
+    if since is None or version is None or since > version['ultimo_id']:
+        return None
+    # Aunque since sea el último id, dentro del margen pudo confirmar uno tardío
+    return db.get_entidades_cambiadas(restaurante_id, max(0, since - SOLAPE_IDS), tipos, limite)
+
+def _serializar_pedidos(pedidos):
+    # Convertir datetime a string para JSON
+    for pedido in pedidos:
+        if pedido.get('fecha_pedido'):
+            pedido['fecha_pedido'] = pedido['fecha_pedido'].isoformat()
+    return pedidos
+
+def _serializar_reservaciones(reservaciones):
+    # Convertir timedelta y date a string
+    from datetime import date
+    for reservacion in reservaciones:
+        if reservacion.get('hora_reservacion'):
+            if isinstance(reservacion['hora_reservacion'], timedelta):
+                td = reservacion['hora_reservacion']
+                total_seconds = int(td.total_seconds())
+                hours = total_seconds // 3600
+                minutes = (total_seconds % 3600) // 60
+                reservacion['hora_reservacion'] = f"{hours:02d}:{minutes:02d}"
+        
+        if reservacion.get('fecha_reservacion'):
+            if isinstance(reservacion['fecha_reservacion'], date):
+                reservacion['fecha_reservacion'] = reservacion['fecha_reservacion'].strftime('%Y-%m-%d')
+    return reservaciones
+
 @app.route('/api/pedidos/recientes')
 @login_required
 def api_pedidos_recientes():
@@ -1142,17 +1359,27 @@ def api_pedidos_recientes():
         user = get_current_user()
         restaurante_id = user['restaurante_id']
         
-        pedidos = db.get_pedidos_restaurante(restaurante_id, limit=50)
-        
-        # Convertir datetime a string para JSON
-        for pedido in pedidos:
-            if pedido.get('fecha_pedido'):
-                pedido['fecha_pedido'] = pedido['fecha_pedido'].isoformat()
+        version = _version_panel(restaurante_id)
+        etag = _etag_panel('pedidos', restaurante_id, version)
+        no_modificada = _respuesta_no_modificada(etag)
+        if no_modificada:
+            return no_modificada
+        
+        # Con filtros siempre se devuelve la primera página completa: un pedido
+        # que cambió de estado puede haber salido del filtro
+        filtros = _filtros_listado(FILTROS_PEDIDOS)
+        cambiados = None if filtros else _cambios_desde(restaurante_id, version, TIPOS_EVENTO_PEDIDO, POR_PAGINA)
+        if cambiados is None:
+            pedidos = db.buscar_pedidos(restaurante_id, limite=POR_PAGINA, **filtros)
+        else:
+            pedidos = db.get_pedidos_por_ids(restaurante_id, cambiados)
         
-        return jsonify({
+        return _con_etag(jsonify({
             'success': True,
-            'pedidos': pedidos
-        })
+            'version': version['ultimo_id'] if version else None,
+            'completo': cambiados is None,
+            'pedidos': _serializar_pedidos(pedidos)
+        }), etag)
     except Exception as e:
         print(f"❌ Error obteniendo pedidos: {e}")
         return jsonify({
@@ -1168,37 +1395,36 @@ def api_dashboard_datos():
         user = get_current_user()
         restaurante_id = user['restaurante_id']
         
-        # Obtener estadísticas
-        stats = db.get_estadisticas_hoy(restaurante_id)
-        
-        # Pedidos recientes
-        pedidos = db.get_pedidos_restaurante(restaurante_id, limit=10)
+        # Las estadísticas son del día: la fecha también forma parte del ETag
+        version = _version_panel(restaurante_id)
+        etag = _etag_panel('dashboard', restaurante_id, version, datetime.now().date())
+        no_modificada = _respuesta_no_modificada(etag)
+        if no_modificada:
+            return no_modificada
         
-        # Convertir datetime a string
-        for pedido in pedidos:
-            if pedido.get('fecha_pedido'):
-                pedido['fecha_pedido'] = pedido['fecha_pedido'].isoformat()
+        # Obtener estadísticas (una lectura por clave primaria, siempre completas)
+        stats = db.get_estadisticas_hoy(restaurante_id)
         
-        # Reservaciones recientes
-        reservaciones = db.get_reservaciones_restaurante(restaurante_id, limit=10)
+        # Pedidos y reservaciones recientes, o solo los que cambiaron
+        pedidos_cambiados = _cambios_desde(restaurante_id, version, TIPOS_EVENTO_PEDIDO, 10)
+        reservaciones_cambiadas = _cambios_desde(restaurante_id, version, TIPOS_EVENTO_RESERVACION, 10)
+        completo = pedidos_cambiados is None or reservaciones_cambiadas is None
         
-        # Convertir hora_reservacion (timedelta) a string
-        from datetime import timedelta
-        for reservacion in reservaciones:
-            if reservacion.get('hora_reservacion'):
-                if isinstance(reservacion['hora_reservacion'], timedelta):
-                    td = reservacion['hora_reservacion']
-                    total_seconds = int(td.total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    reservacion['hora_reservacion'] = f"{hours:02d}:{minutes:02d}"
+        if completo:
+            pedidos = db.get_pedidos_restaurante(restaurante_id, limit=10)
+            reservaciones = db.get_reservaciones_restaurante(restaurante_id, limit=10)
+        else:
+            pedidos = db.get_pedidos_por_ids(restaurante_id, pedidos_cambiados)
+            reservaciones = db.get_reservaciones_por_ids(restaurante_id, reservaciones_cambiadas)
         
-        return jsonify({
+        return _con_etag(jsonify({
             'success': True,
+            'version': version['ultimo_id'] if version else None,
+            'completo': completo,
             'stats': stats,
-            'pedidos': pedidos,
-            'reservaciones': reservaciones
-        })
+            'pedidos': _serializar_pedidos(pedidos),
+            'reservaciones': _serializar_reservaciones(reservaciones)
+        }), etag)
     except Exception as e:
         print(f"❌ Error obteniendo datos dashboard: {e}")
         import traceback
@@ -1217,39 +1443,33 @@ def api_reservaciones_recientes():
         user = get_current_user()
         restaurante_id = user['restaurante_id']
         
-        reservaciones = db.get_reservaciones_restaurante(restaurante_id, limit=50)
-        
-        # Convertir timedelta y datetime a string
-        from datetime import timedelta, date
-        for reservacion in reservaciones:
-            if reservacion.get('hora_reservacion'):
-                if isinstance(reservacion['hora_reservacion'], timedelta):
-                    td = reservacion['hora_reservacion']
-                    total_seconds = int(td.total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    reservacion['hora_reservacion'] = f"{hours:02d}:{minutes:02d}"
-            
-            if reservacion.get('fecha_reservacion'):
-                if isinstance(reservacion['fecha_reservacion'], date):
-                    reservacion['fecha_reservacion'] = reservacion['fecha_reservacion'].strftime('%Y-%m-%d')
-        
-        # Calcular estadísticas
         from datetime import date
         hoy = date.today()
         
-        stats = {
-            'hoy': sum(1 for r in reservaciones if str(r.get('fecha_reservacion')) == str(hoy)),
-            'pendientes': sum(1 for r in reservaciones if r.get('estado') == 'pendiente'),
-            'confirmadas': sum(1 for r in reservaciones if r.get('estado') == 'confirmada'),
-            'personas_hoy': sum(r.get('numero_personas', 0) for r in reservaciones if str(r.get('fecha_reservacion')) == str(hoy))
-        }
+        # Las estadísticas dependen del día: la fecha también forma parte del ETag
+        version = _version_panel(restaurante_id)
+        etag = _etag_panel('reservaciones', restaurante_id, version, hoy)
+        no_modificada = _respuesta_no_modificada(etag)
+        if no_modificada:
+            return no_modificada
+        
+        # Con filtros siempre se devuelve la primera página completa (ver pedidos)
+        filtros = _filtros_listado(FILTROS_RESERVACIONES)
+        cambiadas = None if filtros else _cambios_desde(
+            restaurante_id, version, TIPOS_EVENTO_RESERVACION, POR_PAGINA
+        )
+        if cambiadas is None:
+            reservaciones = db.buscar_reservaciones(restaurante_id, limite=POR_PAGINA, **filtros)
+        else:
+            reservaciones = db.get_reservaciones_por_ids(restaurante_id, cambiadas)
         
-        return jsonify({
+        return _con_etag(jsonify({
             'success': True,
-            'reservaciones': reservaciones,
-            'stats': stats
-        })
+            'version': version['ultimo_id'] if version else None,
+            'completo': cambiadas is None,
+            'reservaciones': _serializar_reservaciones(reservaciones),
+            'stats': db.get_resumen_reservaciones(restaurante_id)
+        }), etag)
     except Exception as e:
         print(f"❌ Error obteniendo reservaciones: {e}")
         import traceback
@@ -0,0 +1,115 @@
+"""
+Sesión de chat web
+Representación compacta con __slots__ y un historial de tamaño fijo: solo
+se guardan los últimos mensajes en memoria; los anteriores se consultan
+en la tabla interacciones cuando el cliente los pide.
+
+Configuración por variables de entorno:
+    CHAT_HISTORIAL_MAX     mensajes que se conservan por sesión (default: 40)
+"""
+
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+CHAT_HISTORIAL_MAX = int(os.getenv('CHAT_HISTORIAL_MAX', 40))
+
+
+def formatear_mensaje(texto, is_user, timestamp):
+    """Mensaje con la forma que espera el chat web"""
+    return {
+        "text": texto,
+        "is_user": is_user,
+        "timestamp": datetime.fromtimestamp(timestamp).strftime("%H:%M")
+    }
+
+
+class WebChatSession:
+    """Simular una sesión de chat para usuarios web"""
+
+    __slots__ = (
+        'session_id', 'restaurante_id', 'user_id', 'created_at',
+        '_historial', 'mensajes_descartados',
+        'cart', 'pedido_id', 'cliente_id', 'payment_id',
+        'customer_name', 'customer_phone', 'customer_address', 'customer_email',
+        'registration_step', 'is_registered',
+        'tipo_pedido_seleccionado', 'numero_mesa', 'numero_comensales',
+        'en_menu_informacion',
+        'reservation_step', 'reservation_date', 'reservation_time',
+        'reservation_people', 'reservation_occasion', 'reservation_notes',
+        'item_pendiente', 'esperando_cantidad', 'esperando_ingredientes',
+    )
+
+    def __init__(self, session_id, restaurante_id, historial_max=CHAT_HISTORIAL_MAX):
+        self.session_id = session_id
+        self.restaurante_id = restaurante_id
+        self.user_id = hash(session_id) % 1000000
+        self.created_at = datetime.now()
+
+        # Historial circular: (texto, is_user, timestamp)
+        self._historial = deque(maxlen=historial_max)
+        self.mensajes_descartados = 0
+
+        self.cart = []
+        self.pedido_id = None
+        self.cliente_id = None
+        self.payment_id = None
+        self.customer_name = None
+        self.customer_phone = None
+        self.customer_address = None
+        self.customer_email = None
+        self.registration_step = "needs_initial_selection"
+        self.is_registered = False
+
+        self.tipo_pedido_seleccionado = None  # 'restaurant', 'takeaway', 'delivery'
+        self.numero_mesa = None
+        self.numero_comensales = None
+        self.en_menu_informacion = False
+
+        # Reservaciones
+        self.reservation_step = None
+        self.reservation_date = None
+        self.reservation_time = None
+        self.reservation_people = None
+        self.reservation_occasion = None
+        self.reservation_notes = None
+
+        # Sistema de cantidades e ingredientes
+        self.item_pendiente = None  # Item que está siendo agregado
+        self.esperando_cantidad = False
+        self.esperando_ingredientes = False
+
+    def add_message(self, text, is_user=True):
+        if len(self._historial) == self._historial.maxlen:
+            self.mensajes_descartados += 1
+
+        entrada = (text, is_user, time.time())
+        self._historial.append(entrada)
+        return formatear_mensaje(*entrada)
+
+    @property
+    def messages(self):
+        """Mensajes en el historial, del más antiguo al más reciente"""
+        return [formatear_mensaje(*entrada) for entrada in self._historial]
+
+    @messages.setter
+    def messages(self, mensajes):
+        # Solo se usa para limpiar el historial
+        self._historial.clear()
+        self.mensajes_descartados = 0
+        for mensaje in mensajes:
+            self.add_message(mensaje['text'], mensaje.get('is_user', True))
+
+    @property
+    def hay_mensajes_anteriores(self):
+        """Si hay mensajes fuera del historial que pueden estar en interacciones"""
+        return self.mensajes_descartados > 0 and self.cliente_id is not None
+
+    @property
+    def inicio_historial(self):
+        """Timestamp del mensaje más antiguo del historial (None si está vacío)"""
+        return self._historial[0][2] if self._historial else None
+
+    def add_to_cart(self, item):
+        self.cart.append(item)
@@ -0,0 +1,96 @@
+"""
+Almacén de sesiones del chat web
+Reemplaza el diccionario global chat_sessions por un almacén acotado:
+las sesiones expiran por inactividad (TTL) y, al llegar al máximo, se
+descarta la usada hace más tiempo (LRU).
+
+Backends:
+    memoria - dentro del proceso (un solo worker)
+    sqlite  - archivo compartido entre workers de gunicorn / réplicas con volumen
+
+Configuración por variables de entorno:
+    CHAT_SESSION_BACKEND   memoria | sqlite   (default: memoria)
+    CHAT_SESSION_TTL       segundos de inactividad antes de expirar (default: 7200)
+    CHAT_SESSION_MAX       sesiones máximas en el almacén (default: 5000)
+    CHAT_SESSION_DB        ruta del archivo SQLite (default: web/chat_sessions.sqlite3)
+"""
+
+import os
+
+from database.expiring_store import ExpiringStore, MemoryExpiringStore, SQLiteExpiringStore
+
+CHAT_SESSION_BACKEND = os.getenv('CHAT_SESSION_BACKEND', 'memoria')
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', 7200))
+CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', 5000))
+CHAT_SESSION_DB = os.getenv(
+    'CHAT_SESSION_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat_sessions.sqlite3')
+)
+
+
+class SessionStore(ExpiringStore):
+    """
+    Interfaz común con la forma de un diccionario (get, [], in, pop).
+    El TTL, el LRU y la limpieza vienen de database/expiring_store.py.
+
+    Las sesiones que se leen del almacén pueden ser copias (backend SQLite),
+    así que después de modificar una sesión hay que llamar a guardar().
+    """
+
+    def get(self, session_id, default=None):
+        session = self._leer(session_id)
+        return default if session is None else session
+
+    def guardar(self, session_id, session):
+        self._escribir(session_id, session)
+
+    def pop(self, session_id, default=None):
+        session = self.get(session_id, default)
+        self._quitar(session_id)
+        return session
+
+    def __getitem__(self, session_id):
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id, session):
+        self.guardar(session_id, session)
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def __delitem__(self, session_id):
+        self.pop(session_id)
+
+
+class MemorySessionStore(MemoryExpiringStore, SessionStore):
+    """Sesiones en un OrderedDict del proceso, de la menos a la más reciente"""
+
+    def __init__(self, ttl=CHAT_SESSION_TTL, max_sesiones=CHAT_SESSION_MAX):
+        super().__init__(ttl, max_sesiones)
+
+
+class SQLiteSessionStore(SQLiteExpiringStore, SessionStore):
+    """
+    Sesiones serializadas con pickle en un archivo SQLite (modo WAL), de modo
+    que varios workers en la misma máquina ven las mismas sesiones.
+    """
+
+    TABLA = 'chat_sesiones'
+    COLUMNAS_CLAVE = (('session_id', 'TEXT'),)
+
+    def __init__(self, ruta=CHAT_SESSION_DB, ttl=CHAT_SESSION_TTL, max_sesiones=CHAT_SESSION_MAX):
+        super().__init__(ruta, ttl, max_sesiones)
+
+
+def crear_session_store(backend=CHAT_SESSION_BACKEND):
+    """Crear el almacén configurado por CHAT_SESSION_BACKEND"""
+    if backend == 'sqlite':
+        print(f"💾 Sesiones de chat en SQLite: {CHAT_SESSION_DB}")
+        return SQLiteSessionStore()
+
+    if backend != 'memoria':
+        print(f"⚠️ CHAT_SESSION_BACKEND '{backend}' desconocido, usando memoria")
+    return MemorySessionStore()
@@ -29,6 +29,14 @@ import telebot
 from config import RESTAURANT_CONFIG
 from bot.restaurant_message_handlers import RestaurantMessageHandlers
 from database.database_multirestaurante import DatabaseManager
+from database.menu_cache import menu_cache
+from database.menu_search import buscador_menu
+from database.restaurant_cache import restaurant_cache
+from database.interaction_writer import interaction_writer
+from web.session_store import crear_session_store
+from bot.telegram_client_pool import telegram_clients
+from bot.notification_dispatcher import notification_dispatcher
+from web.chat_session import WebChatSession, formatear_mensaje
 import threading
 import time
 import random
@@ -42,7 +50,8 @@ CORS(app)
 # ✅ NO crear bot global aquí - se creará dinámicamente por restaurante
 db = DatabaseManager()
 
-chat_sessions = {}
+# Sesiones acotadas por TTL y LRU (ver web/session_store.py)
+chat_sessions = crear_session_store()
 
 # ==================== AGREGAR FUNCIÓN DE VERIFICACIÓN DE TIEMPOS ====================
 
@@ -68,12 +77,8 @@ def verificar_tiempos_bd(restaurante_id):
 # ==================== AGREGAR ESTAS FUNCIONES AL INICIO (después de los imports) ====================
 
 def obtener_info_horarios(restaurante_id):
-    """Obtener horarios dinámicos desde la BD"""
-    from database.database_multirestaurante import get_db_cursor
-    
-    with get_db_cursor() as (cursor, conn):
-        cursor.execute("SELECT horarios FROM restaurantes WHERE id = %s", (restaurante_id,))
-        result = cursor.fetchone()
+    """Obtener horarios dinámicos desde la BD (vía caché de restaurantes)"""
+    result = restaurant_cache.get_por_id(restaurante_id)
     
     if not result or not result['horarios']:
         # Fallback a config.py si no hay horarios configurados
@@ -162,12 +167,8 @@ def generar_texto_horarios(restaurante_id):
 
 
 def obtener_info_delivery(restaurante_id):
-    """Obtener configuración de delivery desde la BD"""
-    from database.database_multirestaurante import get_db_cursor
-    
-    with get_db_cursor() as (cursor, conn):
-        cursor.execute("SELECT config_delivery FROM restaurantes WHERE id = %s", (restaurante_id,))
-        result = cursor.fetchone()
+    """Obtener configuración de delivery desde la BD (vía caché de restaurantes)"""
+    result = restaurant_cache.get_por_id(restaurante_id)
     
     if not result or not result['config_delivery']:
         return None
@@ -249,15 +250,8 @@ def calcular_costo_envio_dinamico(restaurante_id, subtotal):
 
 
 def obtener_info_contacto(restaurante_id):
-    """Obtener información de contacto desde la BD"""
-    from database.database_multirestaurante import get_db_cursor
-    
-    with get_db_cursor() as (cursor, conn):
-        cursor.execute("""
-            SELECT nombre_restaurante, telefono, email, direccion, ciudad, estado_republica
-            FROM restaurantes WHERE id = %s
-        """, (restaurante_id,))
-        return cursor.fetchone()
+    """Obtener información de contacto desde la BD (vía caché de restaurantes)"""
+    return restaurant_cache.get_por_id(restaurante_id)
 
 
 # ==================== NUEVAS FUNCIONES PARA MENÚ PRINCIPAL ====================
@@ -403,21 +397,10 @@ Por favor, escribe el número correcto:
 # ==================== CORRECCIÓN 1: MEJORAR BÚSQUEDA DE ITEMS ====================
 
 def buscar_items_mejorada(restaurante_id, texto_busqueda):
-    """Búsqueda mejorada de items con múltiples estrategias"""
-    import unicodedata
-    
-    def normalizar(texto):
-        texto = texto.lower()
-        return ''.join(
-            c for c in unicodedata.normalize('NFD', texto)
-            if unicodedata.category(c) != 'Mn'
-        )
-    
-    # Normalizar texto de búsqueda
-    texto_normalizado = normalizar(texto_busqueda)
-    
-    # Buscar en la base de datos
-    items_encontrados = db.buscar_items_por_texto(restaurante_id, texto_normalizado)
+    """Búsqueda de items en el índice invertido del menú (sin tildes, por prefijo)"""
+    # Una sola consulta al índice: los items que coinciden con cualquier
+    # palabra ya vienen ordenados por puntaje, no hace falta reintentar por palabra
+    items_encontrados = buscador_menu.buscar(restaurante_id, texto_busqueda)
     
     # Debug mejorado
     if items_encontrados:
@@ -427,20 +410,7 @@ def buscar_items_mejorada(restaurante_id, texto_busqueda):
     else:
         print(f"❌ Búsqueda '{texto_busqueda}' sin resultados")
     
-    if items_encontrados:
-        return items_encontrados
-    
-    # Si no encuentra, intentar búsqueda por palabras clave
-    palabras_clave = texto_normalizado.split()
-    
-    # Buscar por cada palabra clave
-    for palabra in palabras_clave:
-        if len(palabra) > 2:  # Solo palabras de más de 2 letras
-            items_parciales = db.buscar_items_por_texto(restaurante_id, palabra)
-            if items_parciales:
-                return items_parciales
-    
-    return []
+    return items_encontrados
 
 
 def procesar_agregado_item_con_cantidad(session, texto_busqueda, restaurante_id):
@@ -496,9 +466,8 @@ def procesar_agregado_item_con_cantidad(session, texto_busqueda, restaurante_id)
     
     session.esperando_cantidad = True
     
-    # Obtener ingredientes si existen
-    ingredientes = db.get_ingredientes_item(item['id'])
-    session.item_pendiente['ingredientes'] = ingredientes
+    # Los ingredientes ya vienen en el item del índice
+    session.item_pendiente['ingredientes'] = list(item.get('ingredientes', []))
     
     # Mensaje de cantidad
     vegano_emoji = " 🌱" if item.get('vegano') else ""
@@ -826,12 +795,9 @@ Escribe 'menú' para agregar más items."""
     total = subtotal + costo_envio
 
     # ==================== ✅ AGREGAR ESTO AQUÍ ====================
-    # Calcular tiempo estimado desde BD
-    detalles_temp = []
-    for item_cart in session.cart:
-        item_bd = db.get_item_by_id(item_cart['id'])
-        if item_bd:
-            detalles_temp.append(item_bd)
+    # Calcular tiempo estimado con los items del menú en caché
+    menu_snapshot = menu_cache.get_snapshot(restaurante_id)
+    detalles_temp = [menu_snapshot.get_item(item_cart['id']) for item_cart in session.cart]
 
     tiempos = []
     for item_bd in detalles_temp:
@@ -860,93 +826,50 @@ Escribe 'menú' para agregar más items."""
 
     # ==================== CREAR PEDIDO EN BD ====================
     try:
-        resultado_pedido = db.crear_pedido_simple(
-            restaurante_id, 
-            session.cliente_id, 
-            tipo_pedido,  # ✅ Ahora usamos el tipo correcto
-            'web'
-        )
-        
-        if not resultado_pedido or 'pedido_id' not in resultado_pedido:
-            return "❌ Error al crear el pedido. Por favor intenta de nuevo."
-        
-        pedido_id = resultado_pedido['pedido_id']
-        numero_pedido = resultado_pedido['numero_pedido']
-        session.pedido_id = pedido_id
-        
-        print(f"✅ Pedido creado - ID: {pedido_id}, Número: {numero_pedido}, Tipo: {tipo_pedido}")
-        
-        # Agregar items con detalles
-        items_agregados = 0
+        lineas = []
         for item in session.cart:
             # Agregar notas sobre ingredientes quitados
             notas_item = None
             if item.get('sin_ingredientes'):
                 notas_item = f"Sin: {', '.join(item['sin_ingredientes'])}"
             
-            success = db.agregar_item_pedido(
-                pedido_id, 
-                item['id'], 
-                item.get('cantidad', 1), 
-                float(item['precio'])
-            )
-            
-            # Si hay notas, actualizar
-            if success and notas_item:
-                from database.database_multirestaurante import get_db_cursor
-                with get_db_cursor() as (cursor, conn):
-                    cursor.execute("""
-                        UPDATE detalle_pedidos 
-                        SET notas_item = %s 
-                        WHERE pedido_id = %s AND item_id = %s
-                        ORDER BY id DESC LIMIT 1
-                    """, (notas_item, pedido_id, item['id']))
-                    conn.commit()
-            
-            if success:
-                items_agregados += 1
-                print(f"✅ Item agregado: {item['nombre']} x{item.get('cantidad', 1)}")
-        
-        if items_agregados == 0:
-            return "❌ No se pudieron agregar los items. Intenta de nuevo."
-        
-        # Actualizar totales en BD
-        from database.database_multirestaurante import get_db_cursor
-        with get_db_cursor() as (cursor, conn):
-            # Guardar datos específicos según tipo
-            if tipo_pedido == 'restaurant':
-                cursor.execute("""
-                    UPDATE pedidos 
-                    SET total = %s, 
-                        subtotal = %s,
-                        costo_envio = 0,
-                        direccion_entrega = %s,
-                        notas = %s
-                    WHERE id = %s
-                """, (
-                    total, 
-                    subtotal, 
-                    f"Mesa {session.numero_mesa}",
-                    f"Comensales: {session.numero_comensales or 'No especificado'}",
-                    pedido_id
-                ))
-            else:
-                cursor.execute("""
-                    UPDATE pedidos 
-                    SET total = %s, 
-                        subtotal = %s,
-                        costo_envio = %s
-                    WHERE id = %s
-                """, (total, subtotal, costo_envio, pedido_id))
-            
-            conn.commit()
+            lineas.append({
+                'item_id': item['id'],
+                'cantidad': item.get('cantidad', 1),
+                'precio_unitario': float(item['precio']),
+                'notas_item': notas_item
+            })
+        
+        # Datos específicos según tipo
+        direccion_entrega = None
+        notas_pedido = None
+        if tipo_pedido == 'restaurant':
+            direccion_entrega = f"Mesa {session.numero_mesa}"
+            notas_pedido = f"Comensales: {session.numero_comensales or 'No especificado'}"
+        
+        # Encabezado + detalle en una sola transacción
+        resultado_pedido = db.registrar_pedido_completo(
+            restaurante_id,
+            session.cliente_id,
+            tipo_pedido,
+            'web',
+            lineas,
+            costo_envio=costo_envio,
+            estado='confirmado',
+            direccion_entrega=direccion_entrega,
+            notas=notas_pedido
+        )
+        
+        if not resultado_pedido:
+            return "❌ Error al crear el pedido. Por favor intenta de nuevo."
         
-        # Actualizar estado
-        db.actualizar_estado_pedido(pedido_id, 'confirmado')
+        pedido_id = resultado_pedido['pedido']['id']
+        numero_pedido = resultado_pedido['pedido']['numero_pedido']
+        total = resultado_pedido['pedido']['total']
+        detalles = resultado_pedido['detalles']
+        session.pedido_id = pedido_id
         
-        # Obtener detalles finales
-        pedido_final = db.get_pedido(pedido_id)
-        detalles = db.get_detalle_pedido(pedido_id)
+        print(f"✅ Pedido creado - ID: {pedido_id}, Número: {numero_pedido}, Tipo: {tipo_pedido}")
         
         # Generar resumen de items
         if detalles:
@@ -1097,32 +1020,14 @@ def send_notification_to_group(notification_type, data, session):
     Enviar notificación al grupo de Telegram - DINÁMICO Y DIFERENCIADO POR TIPO
     """
     try:
-        # Obtener configuración de Telegram del restaurante
-        from database.database_multirestaurante import get_db_cursor
-        
-        with get_db_cursor() as (cursor, conn):
-            cursor.execute("""
-                SELECT bot_token, telegram_admin_id, telegram_group_id, config_notificaciones
-                FROM restaurantes 
-                WHERE id = %s
-            """, (session.restaurante_id,))
-            config = cursor.fetchone()
-        
-        if not config or not config.get('bot_token'):
+        # Cliente y configuración de Telegram del restaurante (en caché)
+        bot_restaurante, config = telegram_clients.get_para_restaurante(session.restaurante_id)
+        
+        if not bot_restaurante:
             print(f"⚠️ No hay bot_token configurado para restaurante {session.restaurante_id}")
             return
         
-        # Parsear config_notificaciones
-        config_notif = {'notificar_pedidos': True, 'notificar_reservaciones': True}
-        
-        if config.get('config_notificaciones'):
-            try:
-                if isinstance(config['config_notificaciones'], str):
-                    config_notif = json.loads(config['config_notificaciones'])
-                else:
-                    config_notif = config['config_notificaciones']
-            except Exception as e:
-                print(f"⚠️ Error parseando config_notificaciones: {e}")
+        config_notif = config['config_notificaciones']
         
         # Verificar si está activo
         if notification_type == "new_order" and not config_notif.get('notificar_pedidos', True):
@@ -1140,10 +1045,6 @@ def send_notification_to_group(notification_type, data, session):
             print(f"⚠️ No hay chat configurado")
             return
         
-        # Crear bot dinámico
-        import telebot
-        bot_restaurante = telebot.TeleBot(config['bot_token'])
-        
         # ==================== CONSTRUIR MENSAJE SEGÚN TIPO ====================
         message = ""
         
@@ -1314,9 +1215,8 @@ def send_notification_to_group(notification_type, data, session):
             print(f"⚠️ Tipo de notificación no reconocido: {notification_type}")
             return
         
-        # Enviar mensaje
-        bot_restaurante.send_message(target_chat, message)
-        print(f"✅ Notificación '{notification_type}' enviada a {target_chat}")
+        # Enviar en segundo plano: el request no espera a Telegram
+        notification_dispatcher.encolar(session.restaurante_id, notification_type, message)
         
     except Exception as e:
         print(f"❌ Error enviando notificación: {e}")
@@ -1324,57 +1224,6 @@ def send_notification_to_group(notification_type, data, session):
         traceback.print_exc()
 
 
-# ==================== MODIFICAR CLASE WebChatSession ====================
-
-class WebChatSession:
-    """Simular una sesión de chat para usuarios web - ACTUALIZADA"""
-    def __init__(self, session_id, restaurante_id):
-        self.session_id = session_id
-        self.restaurante_id = restaurante_id
-        self.messages = []
-        self.user_id = hash(session_id) % 1000000
-        self.created_at = datetime.now()
-        self.cart = []
-        self.customer_name = None
-        self.customer_phone = None
-        self.customer_address = None
-        self.customer_email = None
-        self.pedido_id = None
-        self.cliente_id = None
-        self.registration_step = "needs_initial_selection"  # ✅ CAMBIO AQUÍ
-        self.is_registered = False
-        
-        # ✅ NUEVOS ATRIBUTOS
-        self.tipo_pedido_seleccionado = None  # 'restaurant', 'takeaway', 'delivery'
-        self.numero_mesa = None
-        self.numero_comensales = None
-        self.en_menu_informacion = False
-        
-        # Reservaciones
-        self.reservation_step = None
-        self.reservation_date = None
-        self.reservation_time = None
-        self.reservation_people = None
-        self.reservation_occasion = None
-        self.reservation_notes = None
-        
-        # ✅ NUEVO: Sistema de cantidades e ingredientes
-        self.item_pendiente = None  # Item que está siendo agregado
-        self.esperando_cantidad = False
-        self.esperando_ingredientes = False
-    
-    def add_message(self, text, is_user=True):
-        message = {
-            "text": text,
-            "is_user": is_user,
-            "timestamp": datetime.now().strftime("%H:%M")
-        }
-        self.messages.append(message)
-        return message
-    
-    def add_to_cart(self, item):
-        self.cart.append(item)
-
 class MockMessage:
     def __init__(self, text, chat_id, user_id):
         self.text = text
@@ -1556,6 +1405,10 @@ Escribe 'no' si no tienes notas especiales."""
                                 SET ocasion_especial = %s, notas_especiales = %s
                                 WHERE id = %s
                             """, (ocasion_guardada, notas_guardadas, reservacion['id']))
+                            DatabaseManager.registrar_evento(
+                                cursor, reservacion['restaurante_id'], 'reservacion_actualizada',
+                                reservacion['id'], reservacion.get('estado')
+                            )
                             conn.commit()
             
                     send_notification_to_group("new_reservation", {
@@ -1650,7 +1503,7 @@ def home():
 @app.route('/<slug>/')
 def index(slug):
     """Chat del restaurante según su slug"""
-    restaurante = db.get_restaurante_por_slug(slug)
+    restaurante = restaurant_cache.get_por_slug(slug)
     
     if not restaurante:
         return """
@@ -1675,7 +1528,7 @@ def send_message():
             return jsonify({"error": "Falta restaurante_slug"}), 400
         
         # Obtener restaurante por slug
-        restaurante = db.get_restaurante_por_slug(restaurante_slug)
+        restaurante = restaurant_cache.get_por_slug(restaurante_slug)
         
         if not restaurante:
             return jsonify({"error": "Restaurante no encontrado"}), 404
@@ -1686,10 +1539,10 @@ def send_message():
             return jsonify({"error": "Mensaje vacío"}), 400
         
         # Crear o recuperar sesión con restaurante_id
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = WebChatSession(session_id, restaurante_id)
+        session = chat_sessions.get(session_id)
+        if session is None:
+            session = WebChatSession(session_id, restaurante_id)
         
-        session = chat_sessions[session_id]
         session.add_message(message_text, is_user=True)
         
         mock_message = MockMessage(
@@ -1701,10 +1554,12 @@ def send_message():
         # Obtener respuesta del bot (PASAR restaurante_id)
         bot_response = process_bot_message(mock_message, session, restaurante_id)
         session.add_message(bot_response, is_user=False)
+        chat_sessions.guardar(session_id, session)
         
         # Registrar interacción
         if session.cliente_id:
-            db.registrar_interaccion(
+            # Se escribe en segundo plano por lotes (database/interaction_writer.py)
+            interaction_writer.registrar(
                 cliente_id=session.cliente_id,
                 mensaje=message_text,
                 respuesta=bot_response,
@@ -1732,17 +1587,70 @@ def send_message():
 
 @app.route('/api/get_history', methods=['GET'])
 def get_history():
+    """
+    Historial del chat. Sin 'antes' se responde desde el historial en memoria;
+    con 'antes' (cursor de la respuesta anterior) se pagina desde interacciones.
+    """
     session_id = request.args.get('session_id', 'default')
+    session = chat_sessions.get(session_id)
+    
+    if session is None:
+        return jsonify({
+            "success": True,
+            "messages": [],
+            "hay_anteriores": False,
+            "cursor_anteriores": None
+        })
     
-    if session_id in chat_sessions:
+    antes = request.args.get('antes')
+    if not antes:
+        cursor_anteriores = None
+        if session.hay_mensajes_anteriores:
+            # Interacciones registradas antes del mensaje más antiguo en memoria
+            cursor_anteriores = f"{int(session.inicio_historial)}_0"
+        
         return jsonify({
             "success": True,
-            "messages": chat_sessions[session_id].messages
+            "messages": session.messages,
+            "hay_anteriores": cursor_anteriores is not None,
+            "cursor_anteriores": cursor_anteriores
         })
     
+    if not session.cliente_id:
+        return jsonify({"success": True, "messages": [], "hay_anteriores": False, "cursor_anteriores": None})
+    
+    try:
+        antes_ts, antes_id = (int(parte) for parte in antes.split('_'))
+        limite = max(1, min(int(request.args.get('limite', 20)), 100))
+        antes_fecha = datetime.fromtimestamp(antes_ts)
+    except (ValueError, OverflowError, OSError):
+        # OverflowError/OSError: timestamp fuera del rango que acepta fromtimestamp
+        return jsonify({"success": False, "error": "Cursor inválido"}), 400
+    
+    # Pedir uno de más para saber si quedan páginas
+    interacciones = db.get_interacciones_cliente(
+        session.cliente_id, session.restaurante_id,
+        antes_fecha, antes_id, limite + 1
+    )
+    hay_anteriores = len(interacciones) > limite
+    interacciones = interacciones[:limite]
+    
+    messages = []
+    for interaccion in reversed(interacciones):
+        ts = interaccion['fecha_interaccion'].timestamp()
+        messages.append(formatear_mensaje(interaccion['mensaje'], True, ts))
+        messages.append(formatear_mensaje(interaccion['respuesta'], False, ts))
+    
+    cursor_anteriores = None
+    if hay_anteriores:
+        ultima = interacciones[-1]
+        cursor_anteriores = f"{int(ultima['fecha_interaccion'].timestamp())}_{ultima['id']}"
+    
     return jsonify({
         "success": True,
-        "messages": []
+        "messages": messages,
+        "hay_anteriores": hay_anteriores,
+        "cursor_anteriores": cursor_anteriores
     })
 
 @app.route('/api/clear_history', methods=['POST'])
@@ -1750,23 +1658,42 @@ def clear_history():
     data = request.json
     session_id = data.get('session_id', 'default')
     
-    if session_id in chat_sessions:
-        chat_sessions[session_id].messages = []
-        chat_sessions[session_id].cart = []
-        chat_sessions[session_id].pedido_id = None
+    session = chat_sessions.get(session_id)
+    if session is not None:
+        session.messages = []
+        session.cart = []
+        session.pedido_id = None
+        chat_sessions.guardar(session_id, session)
     
     return jsonify({"success": True})
 
+@app.route('/api/metricas', methods=['GET'])
+def metricas():
+    """Métricas internas del servidor del chat (requiere METRICAS_TOKEN)"""
+    from database.database_multirestaurante import get_pool_metricas
+    from database.query_stats import query_stats
+    
+    token = os.getenv('METRICAS_TOKEN')
+    if not token or request.headers.get('X-Metricas-Token') != token:
+        return jsonify({"success": False, "error": "No autorizado"}), 404
+    
+    return jsonify({
+        "success": True,
+        "pool": get_pool_metricas(),
+        "consultas": query_stats.get_metricas(request.args.get('top', 20, type=int)),
+        "interacciones": interaction_writer.get_metricas()
+    })
+
 def generar_respuesta_dinamica(session, text_lower, restaurante_id):
     """Generar respuestas dinámicas desde la base de datos"""
     
     if any(word in text_lower for word in ['menu', 'menú', 'carta', 'comida', 'platillos']):
-        menu_completo = db.get_menu_completo_display(restaurante_id)
+        menu_completo = menu_cache.get_menu(restaurante_id)
         
         if not menu_completo:
             return "❌ Lo siento, no hay menú disponible en este momento."
         
-        restaurante = db.get_restaurante_por_slug(session.restaurante_id) if hasattr(session, 'restaurante_id') else None
+        restaurante = restaurant_cache.get_por_id(restaurante_id)
         nombre_restaurante = restaurante['nombre_restaurante'] if restaurante else "Nuestro Restaurante"
         
         respuesta = f"🍽 ¡Bienvenido a {nombre_restaurante}!\n\nEstas son nuestras categorías disponibles:\n\n"
@@ -1792,7 +1719,7 @@ def generar_respuesta_dinamica(session, text_lower, restaurante_id):
     
     if text_lower.isdigit():
         num = int(text_lower)
-        menu_completo = db.get_menu_completo_display(restaurante_id)
+        menu_completo = menu_cache.get_menu(restaurante_id)
         
         if 0 < num <= len(menu_completo):
             cat_data = menu_completo[num - 1]
@@ -1820,7 +1747,7 @@ def generar_respuesta_dinamica(session, text_lower, restaurante_id):
         return procesar_agregado_item_con_cantidad(session, text_lower, restaurante_id)
     
     if any(word in text_lower for word in ['precio', 'precios', 'costo', 'cuanto', 'cuánto', 'barato', 'caro']):
-        menu_completo = db.get_menu_completo_display(restaurante_id)
+        menu_completo = menu_cache.get_menu(restaurante_id)
         
         if not menu_completo:
             return "❌ No puedo consultar los precios en este momento."
@@ -2284,11 +2211,10 @@ def create_payment():
         data = request.json
         session_id = data.get('session_id')
         
-        if session_id not in chat_sessions:
+        session = chat_sessions.get(session_id)
+        if session is None:
             return jsonify({'success': False, 'error': 'Sesión no encontrada'}), 404
         
-        session = chat_sessions[session_id]
-        
         # Verificar que haya un pedido
         if not session.pedido_id:
             return jsonify({'success': False, 'error': 'No hay pedido activo'}), 400
@@ -2331,6 +2257,7 @@ def create_payment():
         if resultado['success']:
             # Guardar payment_id en la sesión y en la BD
             session.payment_id = resultado['payment_id']
+            chat_sessions.guardar(session_id, session)
             
             from database.database_multirestaurante import get_db_cursor
             with get_db_cursor() as (cursor, conn):
@@ -2339,6 +2266,7 @@ def create_payment():
                     SET payment_id = %s, estado = 'pendiente_pago'
                     WHERE id = %s
                 """, (resultado['payment_id'], session.pedido_id))
+                DatabaseManager.registrar_evento_pedido(cursor, session.pedido_id)
                 conn.commit()
             
             return jsonify({
@@ -2388,6 +2316,7 @@ def payment_success(slug):
                         fecha_pago = NOW()
                     WHERE id = %s
                 """, (resultado['transaction_id'], session_obj.pedido_id))
+                DatabaseManager.registrar_evento_pedido(cursor, session_obj.pedido_id)
                 conn.commit()
             
             # Obtener datos del pedido para la notificación
@@ -2433,6 +2362,7 @@ def payment_success(slug):
             session_obj.cart = []
             session_obj.pedido_id = None
             session_obj.payment_id = None
+            chat_sessions.guardar(session_id, session_obj)
             
             # Generar factura (opcional)
             cliente_data = {
@@ -2489,19 +2419,11 @@ def payment_cancel(slug):
     """Página de cancelación del pago"""
     session_id = request.args.get('session_id')
     
-    if session_id and session_id in chat_sessions:
-        session = chat_sessions[session_id]
-        
+    session = chat_sessions.get(session_id) if session_id else None
+    if session is not None:
         # Actualizar estado del pedido
         if session.pedido_id:
-            from database.database_multirestaurante import get_db_cursor
-            with get_db_cursor() as (cursor, conn):
-                cursor.execute("""
-                    UPDATE pedidos 
-                    SET estado = 'cancelado_pago'
-                    WHERE id = %s
-                """, (session.pedido_id,))
-                conn.commit()
+            DatabaseManager.actualizar_estado_pedido(session.pedido_id, 'cancelado_pago')
     
     return render_template('public/payment_cancel.html')
 